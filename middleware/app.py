@@ -1,17 +1,42 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import re
+import time
+import uuid
 from contextlib import asynccontextmanager
 from json import JSONDecodeError
 from pathlib import Path
+from time import perf_counter
+from typing import Mapping
 
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from pydantic import ValidationError
 
-from middleware.config import load_config
-from middleware.logging_config import configure_logging, redact_text
+from middleware.config import AppConfig, load_config
+from middleware.dispatch import (
+    DISPATCH_QUEUE_FULL,
+    STATUS_CANCELLED,
+    DispatchQueueFull,
+    DispatchRecord,
+    DispatchScheduler,
+)
+from middleware.json_backend import FastJSONResponse
+from middleware.json_backend import loads as json_loads
+from middleware.logging_config import (
+    CORRELATION_HEADER,
+    bind_correlation_id,
+    configure_logging,
+    log_fields,
+    logging_queue_stats,
+    redact_text,
+    reset_correlation_id,
+    shutdown_logging,
+)
+from middleware.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from middleware.metrics import SERVER_TIMING_HEADER, EventMetrics, format_server_timing
 from middleware.models import GameEvent
 from middleware.pishock import (
     OP_BEEP,
@@ -21,9 +46,16 @@ from middleware.pishock import (
     build_pishock_client,
     pishock_runtime_status,
 )
-from middleware.policy import PolicyEngine
+from middleware.policy import CompiledMapping, Decision, PolicyEngine, compile_policy_table
 from middleware.runtime_mode import RuntimeMode, choose_runtime_mode
-from middleware.security import verify_signature
+from middleware.security import (
+    ReplayCache,
+    open_websocket_frame,
+    verify_signature,
+    websocket_auth_message,
+    websocket_session_key,
+)
+from middleware.ttl_store import CooldownStore
 
 _log_path = configure_logging()
 logger = logging.getLogger(__name__)
@@ -33,6 +65,12 @@ logger = logging.getLogger(__name__)
 async def lifespan(_app: FastAPI):
     _log_startup_info()
     yield
+    logger.info("app stopping")
+    await _scheduler.shutdown()
+    close_client = getattr(_real_client(), "close", None)
+    if callable(close_client):
+        close_client()
+    shutdown_logging()
 
 
 app = FastAPI(title="Cyberpunk -> PiShock Middleware", lifespan=lifespan)
@@ -41,7 +79,7 @@ _runtime_config = Path(__file__).with_name("config.yaml")
 _example_config = Path(__file__).with_name("config.example.yaml")
 _config_source = _runtime_config if _runtime_config.exists() else _example_config
 if not _runtime_config.exists():
-    logger.warning("config.yaml missing; using example config source=%s", _example_config)
+    logger.warning(log_fields("config.yaml missing; using example config", source=str(_example_config)))
 _config = load_config(_config_source)
 _runtime_mode = choose_runtime_mode(interactive=False)
 _policy = PolicyEngine(_config)
@@ -60,18 +98,33 @@ class _UnavailablePiShockClient:
 try:
     _client = build_pishock_client(_config.pishock, _runtime_mode)
 except Exception as exc:
-    logger.error("pishock client unavailable error_type=%s", type(exc).__name__)
+    logger.error(log_fields("pishock client unavailable", error_type=type(exc).__name__))
     _client = _UnavailablePiShockClient(exc)
 _dry_run_client = DryRunPiShockClient()
+_scheduler = DispatchScheduler()
 
 _sessions_armed: dict[str, bool] = {}
 _emergency_stop = False
+_ws_connections: set[str] = set()
+# Handshake nonces seen within the auth window; a repeat is a replayed handshake.
+_ws_nonces = CooldownStore()
+# (session_id, event_type, ts_ms) keys of dispatched events; a repeat is a retried or resent event.
+_replay_cache = ReplayCache(max_entries=_config.dedup_max_entries)
+_metrics = EventMetrics()
+WS_AUTH_TIMEOUT_S = 5.0
+WS_POLICY_VIOLATION = 1008
+_CORRELATION_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,64}")
 PYTHON_PISHOCK_NOT_INSTALLED = "python_pishock_not_installed"
+# Settings read once at startup; a reload keeps the running values and reports a restart.
+RESTART_ONLY_SETTINGS = ("pishock", "dedup_max_entries")
+_reload_lock = asyncio.Lock()
 
 
 def _pishock_error_code(exc: Exception) -> str:
     if str(exc) == PYTHON_PISHOCK_NOT_INSTALLED:
         return PYTHON_PISHOCK_NOT_INSTALLED
+    if isinstance(exc, DispatchQueueFull):
+        return DISPATCH_QUEUE_FULL
     return "pishock_operate_failed"
 
 
@@ -90,6 +143,20 @@ def _pishock_client_mode() -> str:
     return status.pishock_client_mode
 
 
+def _real_client():
+    return getattr(_client, "real_client", _client)
+
+
+def _pishock_cache_stats() -> dict | None:
+    cache_stats = getattr(_real_client(), "cache_stats", None)
+    return cache_stats() if callable(cache_stats) else None
+
+
+def _pishock_dispatch_stats() -> dict | None:
+    dispatch_stats = getattr(_real_client(), "dispatch_stats", None)
+    return dispatch_stats() if callable(dispatch_stats) else None
+
+
 def _operation_client():
     if _dry_run_enabled():
         return _dry_run_client
@@ -100,38 +167,82 @@ async def _operate_for_event(event_type: str, session_id: str, op: int, intensit
     op_name = OP_NAMES.get(op, f"unknown:{op}")
     if _runtime_mode == RuntimeMode.BEEP and op != OP_BEEP:
         logger.warning(
-            "runtime mode block mode=beep event_type=%s session_id=%s op=%s reason=runtime_mode_beep_blocks_non_beep_operation",
-            event_type,
-            session_id,
-            op_name,
+            log_fields(
+                "runtime mode block",
+                mode="beep",
+                event_type=event_type,
+                session_id=session_id,
+                op=op_name,
+                reason="runtime_mode_beep_blocks_non_beep_operation",
+            )
         )
         raise RuntimeModeOperationBlocked("runtime_mode_beep_blocks_non_beep_operation")
 
     if _dry_run_enabled():
         logger.info(
-            "pishock dry-run dispatch event_type=%s session_id=%s op=%s intensity=%s duration_s=%s no_real_api=true",
-            event_type,
-            session_id,
-            op_name,
-            intensity,
-            duration_s,
+            log_fields(
+                "pishock dry-run dispatch",
+                event_type=event_type,
+                session_id=session_id,
+                op=op_name,
+                intensity=intensity,
+                duration_s=duration_s,
+                no_real_api=True,
+            )
         )
 
     status, text = await _operation_client().operate(op, intensity, duration_s)
     return status, redact_text(text)
 
 
+def _event_type_label(event_type: str) -> str:
+    # Unmapped types share one label so clients cannot grow the metric series.
+    return event_type if event_type in _config.event_mappings else "unmapped"
+
+
+def _request_correlation_id(request: Request) -> str:
+    # A caller-supplied id is kept so client and server logs line up; anything
+    # that could break a log line is replaced.
+    provided = request.headers.get(CORRELATION_HEADER, "")
+    return provided if _CORRELATION_ID_PATTERN.fullmatch(provided) else uuid.uuid4().hex
+
+
+async def _correlated(request: Request, handle) -> Response:
+    """Run ``handle()`` with a correlation id bound for its log records.
+
+    Dispatch tasks started inside inherit the id, and it is echoed back in the
+    X-Correlation-Id header, error responses included.
+    """
+    correlation_id = _request_correlation_id(request)
+    token = bind_correlation_id(correlation_id)
+    try:
+        response = await handle()
+    except HTTPException as exc:
+        exc.headers = {**(exc.headers or {}), CORRELATION_HEADER: correlation_id}
+        raise
+    finally:
+        reset_correlation_id(token)
+    response.headers[CORRELATION_HEADER] = correlation_id
+    return response
+
+
+def _elapsed_ms(start: float, end: float) -> float:
+    return round((end - start) * 1000, 3)
+
+
 def _log_startup_info() -> None:
     status = pishock_runtime_status(_config.pishock, _runtime_mode)
     logger.info(
-        "app started runtime_mode=%s config_source=%s dry_run_config=%s dry_run_effective=%s real_pishock_enabled=%s pishock_client_mode=%s log_file=%s",
-        _runtime_mode.value,
-        _config_source,
-        status.dry_run_config,
-        status.dry_run_effective,
-        _real_pishock_client_enabled(),
-        _pishock_client_mode(),
-        _log_path,
+        log_fields(
+            "app started",
+            runtime_mode=_runtime_mode.value,
+            config_source=str(_config_source),
+            dry_run_config=status.dry_run_config,
+            dry_run_effective=status.dry_run_effective,
+            real_pishock_enabled=_real_pishock_client_enabled(),
+            pishock_client_mode=_pishock_client_mode(),
+            log_file=str(_log_path),
+        )
     )
 
 
@@ -149,29 +260,108 @@ def health() -> dict:
         "real_pishock_client_enabled": _real_pishock_client_enabled(),
         "armed_sessions": sum(1 for v in _sessions_armed.values() if v),
         "emergency_stop": _emergency_stop,
+        "websocket_connections": len(_ws_connections),
+        "dispatch_scheduler": _scheduler.stats(),
+        "cooldown_store": _policy.cooldown_stats(),
+        "replay_cache": _replay_cache.stats(),
+        "log_queue": logging_queue_stats(),
+        "pishock_shocker_cache": _pishock_cache_stats(),
+        "pishock_dispatch": _pishock_dispatch_stats(),
     }
 
 
+@app.get("/metrics")
+async def metrics() -> Response:
+    # Async on purpose: rendering on the event loop means it never runs while a
+    # handler is updating the counters.
+    cooldowns = _policy.cooldown_stats()
+    replay = _replay_cache.stats()
+    gauges = [
+        (
+            "pishock_armed_sessions",
+            "Sessions currently armed.",
+            (),
+            [((), sum(1 for armed in _sessions_armed.values() if armed))],
+        ),
+        (
+            "pishock_cooldown_store_entries",
+            "Live cooldown deadlines, by store.",
+            ("store",),
+            [((store,), stats["size"]) for store, stats in sorted(cooldowns.items())],
+        ),
+        (
+            "pishock_hard_mode_sessions",
+            "Sessions with hard-mode state.",
+            (),
+            [((), _policy.hard_mode_snapshot()["count"])],
+        ),
+        ("pishock_replay_cache_entries", "Event keys remembered for duplicate suppression.", (), [((), replay["size"])]),
+        (
+            "pishock_replay_cache_evictions",
+            "Keys dropped from the replay cache, expired or over capacity, since start.",
+            (),
+            [((), replay["evictions"])],
+        ),
+        ("pishock_dispatch_pending", "Dispatches still running.", (), [((), _scheduler.pending_count())]),
+        ("pishock_websocket_connections", "Authenticated /ws connections.", (), [((), len(_ws_connections))]),
+        ("pishock_emergency_stop", "1 while the emergency stop is engaged.", (), [((), int(_emergency_stop))]),
+    ]
+    return PlainTextResponse(_metrics.render(gauges), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/hard-mode/sessions")
+def hard_mode_sessions() -> dict:
+    return _policy.hard_mode_snapshot()
+
+
 @app.post("/arm/{session_id}")
 def arm(session_id: str) -> dict:
     _sessions_armed[session_id] = True
-    logger.info("session armed session_id=%s", session_id)
+    logger.info(log_fields("session armed", session_id=session_id))
     return {"session_id": session_id, "armed": True}
 
 
 @app.post("/disarm/{session_id}")
-def disarm(session_id: str) -> dict:
+async def disarm(session_id: str) -> dict:
+    # Async so cancellation happens on the event loop without a threadpool hop.
     _sessions_armed[session_id] = False
-    logger.info("session disarmed session_id=%s", session_id)
-    return {"session_id": session_id, "armed": False}
+    cancelled = await _scheduler.cancel_session(session_id)
+    logger.info(
+        log_fields(
+            "session disarmed",
+            session_id=session_id,
+            cancelled_dispatches=cancelled.dispatches,
+            cancelled_operations=cancelled.operations,
+            cancel_latency_ms=cancelled.latency_ms,
+        )
+    )
+    return {
+        "session_id": session_id,
+        "armed": False,
+        "cancelled_dispatches": cancelled.dispatches,
+        "cancelled_operations": cancelled.operations,
+    }
 
 
 @app.post("/stop")
-def stop() -> dict:
+async def stop() -> dict:
     global _emergency_stop
     _emergency_stop = True
-    logger.warning("emergency stop enabled")
-    return {"emergency_stop": True}
+    cancelled = await _scheduler.cancel_all()
+    logger.warning(
+        log_fields(
+            "emergency stop enabled",
+            cancelled_dispatches=cancelled.dispatches,
+            cancelled_operations=cancelled.operations,
+            cancel_latency_ms=cancelled.latency_ms,
+        )
+    )
+    return {
+        "emergency_stop": True,
+        "cancelled_dispatches": cancelled.dispatches,
+        "cancelled_operations": cancelled.operations,
+        "stop_latency_ms": cancelled.latency_ms,
+    }
 
 
 @app.post("/resume")
@@ -182,104 +372,550 @@ def resume() -> dict:
     return {"emergency_stop": False}
 
 
+@app.post("/admin/reload")
+async def admin_reload() -> dict:
+    """Re-read config.yaml and swap it in without dropping session state."""
+    global _config, _config_source
+    async with _reload_lock:
+        started = perf_counter()
+        source = _runtime_config if _runtime_config.exists() else _example_config
+        try:
+            # YAML parsing and policy compilation stay off the event loop.
+            config, table = await asyncio.to_thread(_load_policy_config, source)
+        except (RuntimeError, ValueError) as exc:
+            logger.error(
+                log_fields(
+                    "config reload failed",
+                    config_source=str(source),
+                    error_type=type(exc).__name__,
+                    error_detail=redact_text(str(exc)),
+                )
+            )
+            raise HTTPException(status_code=400, detail="config_reload_failed") from None
+        restart_required = [name for name in RESTART_ONLY_SETTINGS if getattr(config, name) != getattr(_config, name)]
+        for name in restart_required:
+            # The clients and cache built from these at startup are still the
+            # ones in use, so routing and /health keep reading the same values.
+            setattr(config, name, getattr(_config, name))
+        # No await between these: handlers see either the old config and table or the new ones.
+        _config, _config_source = config, source
+        _policy.apply_config(config, table)
+        reload_ms = _elapsed_ms(started, perf_counter())
+        logger.info(
+            log_fields(
+                "config reloaded",
+                config_source=str(source),
+                event_mappings=len(config.event_mappings),
+                restart_required=",".join(restart_required) or "none",
+                reload_ms=reload_ms,
+            )
+        )
+        return {
+            "reloaded": True,
+            "config_source": str(source),
+            "event_mappings": len(config.event_mappings),
+            "restart_required": restart_required,
+            "reload_ms": reload_ms,
+        }
+
+
+def _load_policy_config(path: Path) -> tuple[AppConfig, Mapping[str, CompiledMapping]]:
+    config = load_config(path)
+    try:
+        return config, compile_policy_table(config)
+    except (ArithmeticError, AttributeError, TypeError, ValueError) as exc:
+        raise RuntimeError(f"invalid_config: {path}: {exc}") from exc
+
+
+@app.get("/dispatch/{dispatch_id}")
+def dispatch_status(dispatch_id: str) -> dict:
+    record = _scheduler.get(dispatch_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="dispatch_not_found")
+    return record.as_dict()
+
+
 @app.post("/event")
-async def event(request: Request, x_signature: str = Header(default="")) -> dict:
+async def event(request: Request, x_signature: str = Header(default="")) -> Response:
+    return await _correlated(request, lambda: _handle_event(request, x_signature))
+
+
+async def _handle_event(request: Request, x_signature: str) -> Response:
+    started = perf_counter()
     body = await request.body()
-    logger.info("event request received body_bytes=%s", len(body))
-    if not verify_signature(_config.hmac_secret, body, x_signature):
-        logger.warning("event rejected reason=invalid_signature")
+    _metrics.observe_stage("body_read", perf_counter() - started)
+    logger.info(log_fields("event request received", body_bytes=len(body)))
+    if len(body) > _config.max_event_bytes:
+        logger.warning(
+            log_fields("event rejected", body_bytes=len(body), max_event_bytes=_config.max_event_bytes, reason="event_too_large")
+        )
+        _metrics.record_event("unknown", False, "event_too_large")
+        raise HTTPException(status_code=413, detail="event_too_large")
+    verify_started = perf_counter()
+    verified = verify_signature(_config.hmac_secret, body, x_signature)
+    parse_started = perf_counter()
+    _metrics.observe_stage("verify", parse_started - verify_started)
+    if not verified:
+        logger.warning(log_fields("event rejected", reason="invalid_signature"))
+        _metrics.record_event("unknown", False, "invalid_signature")
         raise HTTPException(status_code=401, detail="invalid_signature")
 
     try:
-        parsed = GameEvent.model_validate(json.loads(body))
-    except (JSONDecodeError, ValidationError):
-        logger.warning("event rejected reason=invalid_event_payload")
+        # One pass from raw bytes: pydantic parses and validates without an intermediate dict.
+        parsed = GameEvent.model_validate_json(body)
+    except ValidationError:
+        logger.warning(log_fields("event rejected", reason="invalid_event_payload"))
+        _metrics.record_event("unknown", False, "invalid_event_payload")
         raise HTTPException(status_code=400, detail="invalid_event_payload") from None
+    parsed_at = perf_counter()
+    _metrics.observe_stage("parse", parsed_at - parse_started)
 
     if _emergency_stop:
         logger.warning(
-            "event rejected event_type=%s session_id=%s reason=emergency_stop_enabled",
-            parsed.event_type,
-            parsed.session_id,
+            log_fields(
+                "event rejected",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                reason="emergency_stop_enabled",
+            )
         )
+        _metrics.record_event(_event_type_label(parsed.event_type), False, "emergency_stop_enabled")
         raise HTTPException(status_code=423, detail="emergency_stop_enabled")
 
+    stage_ms = {
+        "verify_ms": _elapsed_ms(verify_started, parse_started),
+        "parse_ms": _elapsed_ms(parse_started, parsed_at),
+    }
+    result, record = _evaluate_event(parsed, stage_ms, started)
+    status_code = 200
+    if record is not None and _config.async_dispatch:
+        status_code = 202
+    elif record is not None:
+        await _scheduler.wait(record)
+        result = _dispatch_outcome(record)
+    timing = format_server_timing(stage_ms, _elapsed_ms(started, perf_counter()))
+    return FastJSONResponse(result, status_code=status_code, headers={SERVER_TIMING_HEADER: timing})
+
+
+@app.post("/events")
+async def events(request: Request, x_signature: str = Header(default="")) -> Response:
+    """Evaluate a signed NDJSON or JSON-array batch of events in order."""
+    return await _correlated(request, lambda: _handle_event_batch(request, x_signature))
+
+
+async def _handle_event_batch(request: Request, x_signature: str) -> Response:
+    started = perf_counter()
+    body = await request.body()
+    logger.info(log_fields("event batch received", body_bytes=len(body)))
+    if len(body) > _config.max_event_bytes * _config.max_batch_events:
+        logger.warning(log_fields("event batch rejected", body_bytes=len(body), reason="event_batch_too_large"))
+        _metrics.record_event("unknown", False, "event_batch_too_large")
+        raise HTTPException(status_code=413, detail="event_batch_too_large")
+    verify_started = perf_counter()
+    if not verify_signature(_config.hmac_secret, body, x_signature):
+        logger.warning(log_fields("event batch rejected", reason="invalid_signature"))
+        _metrics.record_event("unknown", False, "invalid_signature")
+        raise HTTPException(status_code=401, detail="invalid_signature")
+
+    parse_started = perf_counter()
+    batch = _parse_event_batch(body)
+    if _emergency_stop:
+        logger.warning(log_fields("event batch rejected", events=len(batch), reason="emergency_stop_enabled"))
+        for parsed in batch:
+            event_type = _event_type_label(parsed.event_type) if parsed is not None else "unknown"
+            _metrics.record_event(event_type, False, "emergency_stop_enabled")
+        raise HTTPException(status_code=423, detail="emergency_stop_enabled")
+
+    stage_ms = {
+        "verify_ms": _elapsed_ms(verify_started, parse_started),
+        "parse_ms": _elapsed_ms(parse_started, perf_counter()),
+    }
+    # Policy runs for every event before any dispatch is awaited, so decisions
+    # (cooldowns, hard-mode ticks) follow batch order.
+    outcomes: list[tuple[dict, DispatchRecord | None]] = []
+    event_stage_ms: list[dict[str, float]] = []
+    for index, parsed in enumerate(batch):
+        if parsed is None:
+            logger.warning(log_fields("event rejected", batch_index=index, reason="invalid_event_payload"))
+            _metrics.record_event("unknown", False, "invalid_event_payload")
+            outcomes.append(({"accepted": False, "reason": "invalid_event_payload"}, None))
+            continue
+        event_stage_ms.append(dict(stage_ms))
+        outcomes.append(_evaluate_event(parsed, event_stage_ms[-1], started))
+
+    records = [record for _, record in outcomes if record is not None]
+    status_code = 200
+    if records and _config.async_dispatch:
+        status_code = 202
+    elif records:
+        await asyncio.gather(*(_scheduler.wait(record) for record in records))
+        outcomes = [(_dispatch_outcome(record), record) if record is not None else (result, None) for result, record in outcomes]
+
+    # Batch timing reports policy and dispatch as the sum over its events;
+    # dispatch only covers events that finished before the response.
+    for stage in ("policy_ms", "dispatch_ms"):
+        durations = [timings[stage] for timings in event_stage_ms if stage in timings]
+        if durations:
+            stage_ms[stage] = round(sum(durations), 3)
+
+    results = [{"index": index, **result} for index, (result, _) in enumerate(outcomes)]
+    accepted = sum(1 for result in results if result.get("accepted"))
+    total_ms = _elapsed_ms(started, perf_counter())
+    logger.info(log_fields("event batch handled", events=len(results), accepted=accepted, total_ms=total_ms, **stage_ms))
+    return FastJSONResponse(
+        {"events": len(results), "accepted": accepted, "results": results},
+        status_code=status_code,
+        headers={SERVER_TIMING_HEADER: format_server_timing(stage_ms, total_ms)},
+    )
+
+
+def _parse_event_batch(body: bytes) -> list[GameEvent | None]:
+    """Parse a JSON array or NDJSON body; invalid items become None."""
+    stripped = body.strip()
+    raw_items: list
+    if stripped.startswith(b"["):
+        try:
+            raw_items = json_loads(stripped)
+        except JSONDecodeError:
+            logger.warning(log_fields("event batch rejected", reason="invalid_event_payload"))
+            raise HTTPException(status_code=400, detail="invalid_event_payload") from None
+        if not isinstance(raw_items, list):
+            logger.warning(log_fields("event batch rejected", reason="invalid_event_payload"))
+            raise HTTPException(status_code=400, detail="invalid_event_payload")
+    else:
+        # NDJSON lines stay bytes and are decoded and validated in one pass below.
+        raw_items = [line for line in stripped.splitlines() if line.strip()]
+
+    if not raw_items:
+        logger.warning(log_fields("event batch rejected", reason="empty_event_batch"))
+        raise HTTPException(status_code=400, detail="empty_event_batch")
+    if len(raw_items) > _config.max_batch_events:
+        logger.warning(
+            log_fields(
+                "event batch rejected",
+                events=len(raw_items),
+                max_batch_events=_config.max_batch_events,
+                reason="event_batch_too_large",
+            )
+        )
+        raise HTTPException(status_code=413, detail="event_batch_too_large")
+
+    batch: list[GameEvent | None] = []
+    for raw in raw_items:
+        try:
+            batch.append(GameEvent.model_validate_json(raw) if isinstance(raw, bytes) else GameEvent.model_validate(raw))
+        except ValidationError:
+            batch.append(None)
+    return batch
+
+
+def _evaluate_event(parsed: GameEvent, stage_ms: dict[str, float], started: float) -> tuple[dict, DispatchRecord | None]:
+    """Run policy for one event and schedule its dispatch when allowed.
+
+    Returns the response body and, when a dispatch was scheduled, its record.
+    """
     runtime_armed = _sessions_armed.get(parsed.session_id, False)
     armed = parsed.armed and runtime_armed
     logger.info(
-        "event parsed event_type=%s session_id=%s payload_armed=%s runtime_armed=%s final_armed=%s",
-        parsed.event_type,
+        log_fields(
+            "event parsed",
+            event_type=parsed.event_type,
+            session_id=parsed.session_id,
+            payload_armed=parsed.armed,
+            runtime_armed=runtime_armed,
+            final_armed=armed,
+        )
+    )
+    event_type_label = _event_type_label(parsed.event_type)
+    replay_reason = _replay_cache.check(
         parsed.session_id,
-        parsed.armed,
-        runtime_armed,
-        armed,
+        parsed.event_type,
+        parsed.ts_ms,
+        _config.dedup_window_ms,
+        _config.event_max_age_ms,
     )
+    if replay_reason is not None:
+        logger.warning(
+            log_fields(
+                "event rejected",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                ts_ms=parsed.ts_ms,
+                reason=replay_reason,
+            )
+        )
+        _metrics.record_event(event_type_label, False, replay_reason)
+        return {"accepted": False, "reason": replay_reason}, None
+    policy_started = perf_counter()
     try:
         decision = _policy.evaluate(parsed.session_id, parsed.event_type, armed, parsed.context)
     except Exception as exc:
+        _metrics.record_event(event_type_label, False, "policy_evaluation_failed")
         logger.error(
-            "policy evaluation failed event_type=%s session_id=%s error_type=%s error_detail=%s",
-            parsed.event_type,
-            parsed.session_id,
-            type(exc).__name__,
-            redact_text(str(exc)),
+            log_fields(
+                "policy evaluation failed",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                error_type=type(exc).__name__,
+                error_detail=redact_text(str(exc)),
+            )
         )
         return {
             "accepted": False,
             "reason": "policy_evaluation_failed",
             "error_code": "policy_evaluation_failed",
-        }
+        }, None
+    policy_finished = perf_counter()
+    stage_ms["policy_ms"] = _elapsed_ms(policy_started, policy_finished)
+    _metrics.observe_stage("policy", policy_finished - policy_started)
+    _metrics.record_event(event_type_label, decision.allowed, decision.reason)
     if not decision.allowed:
         logger.warning(
-            "event blocked event_type=%s session_id=%s reason=%s payload_armed=%s runtime_armed=%s final_armed=%s",
-            parsed.event_type,
-            parsed.session_id,
-            decision.reason,
-            parsed.armed,
-            runtime_armed,
-            armed,
+            log_fields(
+                "event blocked",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                reason=decision.reason,
+                payload_armed=parsed.armed,
+                runtime_armed=runtime_armed,
+                final_armed=armed,
+                **stage_ms,
+            )
         )
-        return {"accepted": False, "reason": decision.reason}
+        return {"accepted": False, "reason": decision.reason}, None
 
+    # Remembered only once allowed, so blocked events can still be retried.
+    _replay_cache.remember(
+        parsed.session_id, parsed.event_type, parsed.ts_ms, _config.dedup_window_ms, _config.event_max_age_ms
+    )
     op = decision.op if decision.op is not None else 2
     intensity = decision.intensity if decision.intensity is not None else 1
     duration_s = decision.duration_s if decision.duration_s is not None else 1
     logger.info(
-        "policy allowed event_type=%s session_id=%s op=%s intensity=%s duration_s=%s bonus_pulses=%s",
-        parsed.event_type,
+        log_fields(
+            "policy allowed",
+            event_type=parsed.event_type,
+            session_id=parsed.session_id,
+            op=OP_NAMES.get(op, f"unknown:{op}"),
+            intensity=intensity,
+            duration_s=duration_s,
+            bonus_pulses=decision.bonus_pulses,
+        )
+    )
+
+    record = _scheduler.submit(
         parsed.session_id,
-        OP_NAMES.get(op, f"unknown:{op}"),
-        intensity,
-        duration_s,
-        decision.bonus_pulses,
+        parsed.event_type,
+        lambda record: _dispatch_decision(record, parsed, decision, op, intensity, duration_s, stage_ms, started),
+        operations=1 + max(0, decision.bonus_pulses),
     )
+    if _config.async_dispatch:
+        logger.info(
+            log_fields(
+                "event dispatch scheduled",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                dispatch_id=record.dispatch_id,
+                **stage_ms,
+            )
+        )
+    return {
+        "accepted": True,
+        "reason": decision.reason,
+        "dispatch_id": record.dispatch_id,
+        "status": record.status,
+    }, record
 
-    try:
-        status, text = await _operate_for_event(parsed.event_type, parsed.session_id, op, intensity, duration_s)
 
-        bonus_results: list[dict] = []
-        for _ in range(max(0, decision.bonus_pulses)):
-            await asyncio.sleep(max(0, decision.pulse_spacing_ms) / 1000)
-            bonus_intensity = max(
-                1,
-                min(_config.max_intensity, round(intensity * max(0.0, decision.bonus_intensity_ratio))),
+def _dispatch_outcome(record: DispatchRecord) -> dict:
+    if record.status == STATUS_CANCELLED or record.result is None:
+        return {
+            "accepted": False,
+            "reason": "dispatch_cancelled",
+            "error_code": "dispatch_cancelled",
+            "operations_started": record.operations_started,
+        }
+    return record.result
+
+
+@app.websocket("/ws")
+async def event_socket(websocket: WebSocket) -> None:
+    """Stream GameEvents over one authenticated connection.
+
+    The first frame must be a signed ``auth`` frame. After that every frame is
+    ``<seq> <mac>\\n`` followed by a GameEvent (plus an optional ``id`` echoed
+    back), MACed with a key derived from the handshake; ``seq`` counts up from 1.
+    The server answers with a ``decision`` frame and, for allowed events, a later
+    ``dispatch_result`` frame. A frame with a bad MAC or an out-of-order ``seq``
+    closes the connection.
+    """
+    await websocket.accept()
+    connection_id = uuid.uuid4().hex
+    send_lock = asyncio.Lock()
+    pushes: set[asyncio.Task] = set()
+
+    async def send(frame: dict) -> None:
+        async with send_lock:
+            await websocket.send_json(frame)
+
+    async def push_result(frame_id, record: DispatchRecord) -> None:
+        await _scheduler.wait(record)
+        await send(
+            {
+                "type": "dispatch_result",
+                "id": frame_id,
+                "dispatch_id": record.dispatch_id,
+                "status": record.status,
+                "result": _dispatch_outcome(record),
+            }
+        )
+
+    async def reject(reason: str) -> None:
+        logger.warning(log_fields("websocket rejected", connection_id=connection_id, reason=reason))
+        await send({"type": "error", "reason": reason})
+        await websocket.close(code=WS_POLICY_VIOLATION)
+
+    try:
+        key, reason = await _authenticate_socket(websocket)
+        if key is None:
+            await reject(reason)
+            return
+
+        _ws_connections.add(connection_id)
+        logger.info(log_fields("websocket connected", connection_id=connection_id))
+        await send({"type": "auth_ok", "connection_id": connection_id})
+        last_seq = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("text") or message.get("bytes") or b""
+            opened = open_websocket_frame(key, frame.encode("utf-8") if isinstance(frame, str) else frame)
+            if opened is None or opened[0] != last_seq + 1:
+                reason = "invalid_frame_mac" if opened is None else "invalid_frame_sequence"
+                _metrics.record_event("unknown", False, reason)
+                await reject(reason)
+                break
+            last_seq, body = opened
+            decision_frame, record = _handle_socket_frame(body)
+            await send(decision_frame)
+            if record is not None:
+                task = asyncio.create_task(push_result(decision_frame["id"], record))
+                pushes.add(task)
+                task.add_done_callback(pushes.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Dispatches keep running like async /event ones; only the push-back stops.
+        for task in list(pushes):
+            task.cancel()
+        if connection_id in _ws_connections:
+            _ws_connections.discard(connection_id)
+            logger.info(log_fields("websocket disconnected", connection_id=connection_id))
+
+
+async def _authenticate_socket(websocket: WebSocket) -> tuple[bytes | None, str]:
+    """Check the signed handshake frame; return ``(frame_key, "")`` or ``(None, reason)``."""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), WS_AUTH_TIMEOUT_S)
+        hello = json_loads(message.get("text") or message.get("bytes") or b"")
+        if hello.get("type") != "auth":
+            return None, "invalid_handshake"
+        nonce = str(hello["nonce"])
+        ts_ms = int(hello["ts_ms"])
+        signature = str(hello["signature"])
+    except asyncio.TimeoutError:
+        return None, "handshake_timeout"
+    except (JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+        return None, "invalid_handshake"
+
+    window_ms = max(0, _config.ws_auth_window_ms)
+    if abs(time.time() * 1000 - ts_ms) > window_ms:
+        return None, "stale_handshake"
+    if not verify_signature(_config.hmac_secret, websocket_auth_message(nonce, ts_ms), signature):
+        return None, "invalid_signature"
+    # Checked after the signature so unsigned frames cannot burn nonces.
+    if not _ws_nonces.consume(nonce, 2 * window_ms):
+        return None, "replayed_handshake"
+    return websocket_session_key(_config.hmac_secret, nonce, ts_ms), ""
+
+
+def _handle_socket_frame(frame: bytes) -> tuple[dict, DispatchRecord | None]:
+    started = perf_counter()
+    frame_id = None
+    frame_bytes = len(frame)
+    if frame_bytes > _config.max_event_bytes:
+        logger.warning(
+            log_fields(
+                "event rejected",
+                transport="websocket",
+                body_bytes=frame_bytes,
+                max_event_bytes=_config.max_event_bytes,
+                reason="event_too_large",
             )
-            b_status, b_text = await _operate_for_event(
-                parsed.event_type,
-                parsed.session_id,
-                op,
-                bonus_intensity,
-                duration_s,
+        )
+        _metrics.record_event("unknown", False, "event_too_large")
+        return {"type": "decision", "id": None, "accepted": False, "reason": "event_too_large"}, None
+    try:
+        raw = json_loads(frame)
+        if isinstance(raw, dict):
+            frame_id = raw.get("id")
+        parsed = GameEvent.model_validate(raw)
+    except (JSONDecodeError, ValidationError):
+        logger.warning(log_fields("event rejected", transport="websocket", reason="invalid_event_payload"))
+        _metrics.record_event("unknown", False, "invalid_event_payload")
+        return {"type": "decision", "id": frame_id, "accepted": False, "reason": "invalid_event_payload"}, None
+
+    if _emergency_stop:
+        logger.warning(
+            log_fields(
+                "event rejected",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                reason="emergency_stop_enabled",
             )
-            bonus_results.append({"status": b_status, "response": b_text, "intensity": bonus_intensity})
+        )
+        _metrics.record_event(_event_type_label(parsed.event_type), False, "emergency_stop_enabled")
+        result, record = {"accepted": False, "reason": "emergency_stop_enabled"}, None
+    else:
+        result, record = _evaluate_event(parsed, {"parse_ms": _elapsed_ms(started, perf_counter())}, started)
+    return {
+        "type": "decision",
+        "id": frame_id,
+        "event_type": parsed.event_type,
+        "session_id": parsed.session_id,
+        **result,
+    }, record
+
+
+async def _dispatch_decision(
+    record: DispatchRecord,
+    parsed: GameEvent,
+    decision: Decision,
+    op: int,
+    intensity: int,
+    duration_s: int,
+    stage_ms: dict[str, float],
+    started: float,
+) -> dict:
+    dispatch_started = perf_counter()
+    try:
+        record.operations_started += 1
+        status, text = await _operate_for_event(parsed.event_type, parsed.session_id, op, intensity, duration_s)
     except RuntimeModeOperationBlocked as exc:
         logger.warning(
-            "event rejected event_type=%s session_id=%s reason=runtime_mode_blocked block_reason=%s op=%s",
-            parsed.event_type,
-            parsed.session_id,
-            str(exc),
-            OP_NAMES.get(op, f"unknown:{op}"),
+            log_fields(
+                "event rejected",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                reason="runtime_mode_blocked",
+                block_reason=str(exc),
+                op=OP_NAMES.get(op, f"unknown:{op}"),
+            )
         )
+        _metrics.dispatch_errors.inc("runtime_mode_blocked")
+        _replay_cache.forget(parsed.session_id, parsed.event_type, parsed.ts_ms)
+        stage_ms["dispatch_ms"] = _elapsed_ms(dispatch_started, perf_counter())
         return {
             "accepted": False,
             "reason": "runtime_mode_blocked",
@@ -287,31 +923,84 @@ async def event(request: Request, x_signature: str = Header(default="")) -> dict
         }
     except Exception as exc:
         error_code = _pishock_error_code(exc)
+        _metrics.dispatch_errors.inc(error_code)
+        # Nothing reached the device, so the same event may be retried.
+        _replay_cache.forget(parsed.session_id, parsed.event_type, parsed.ts_ms)
+        stage_ms["dispatch_ms"] = _elapsed_ms(dispatch_started, perf_counter())
         logger.error(
-            "pishock operation failed event_type=%s session_id=%s op=%s error_type=%s error_detail=%s",
-            parsed.event_type,
-            parsed.session_id,
-            OP_NAMES.get(op, f"unknown:{op}"),
-            type(exc).__name__,
-            redact_text(str(exc)),
+            log_fields(
+                "pishock operation failed",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                op=OP_NAMES.get(op, f"unknown:{op}"),
+                error_type=type(exc).__name__,
+                error_detail=redact_text(str(exc)),
+            )
         )
         return {
             "accepted": False,
             "reason": "pishock_operate_failed",
             "error_code": error_code,
         }
+    _metrics.observe_stage("dispatch_primary", perf_counter() - dispatch_started)
 
+    # The primary operation went out: from here on the event stays remembered
+    # (a resend would repeat it), and a failed bonus pulse only ends the train.
+    bonus_results: list[dict] = []
+    bonus_error_code = None
+    try:
+        for _ in range(max(0, decision.bonus_pulses)):
+            await asyncio.sleep(max(0, decision.pulse_spacing_ms) / 1000)
+            bonus_intensity = max(
+                1,
+                min(_config.max_intensity, round(intensity * max(0.0, decision.bonus_intensity_ratio))),
+            )
+            record.operations_started += 1
+            bonus_started = perf_counter()
+            b_status, b_text = await _operate_for_event(
+                parsed.event_type,
+                parsed.session_id,
+                op,
+                bonus_intensity,
+                duration_s,
+            )
+            _metrics.observe_stage("dispatch_bonus", perf_counter() - bonus_started)
+            bonus_results.append({"status": b_status, "response": b_text, "intensity": bonus_intensity})
+    except Exception as exc:
+        if isinstance(exc, RuntimeModeOperationBlocked):
+            bonus_error_code = "runtime_mode_blocked"
+        else:
+            bonus_error_code = _pishock_error_code(exc)
+        _metrics.dispatch_errors.inc(bonus_error_code)
+        logger.error(
+            log_fields(
+                "pishock bonus pulse failed",
+                event_type=parsed.event_type,
+                session_id=parsed.session_id,
+                op=OP_NAMES.get(op, f"unknown:{op}"),
+                bonus_pulses_sent=len(bonus_results),
+                error_type=type(exc).__name__,
+                error_detail=redact_text(str(exc)),
+            )
+        )
+
+    finished = perf_counter()
+    stage_ms["dispatch_ms"] = _elapsed_ms(dispatch_started, finished)
     logger.info(
-        "event accepted event_type=%s session_id=%s op=%s intensity=%s duration_s=%s bonus_pulses_sent=%s status=%s",
-        parsed.event_type,
-        parsed.session_id,
-        OP_NAMES.get(op, f"unknown:{op}"),
-        intensity,
-        duration_s,
-        len(bonus_results),
-        status,
+        log_fields(
+            "event accepted",
+            event_type=parsed.event_type,
+            session_id=parsed.session_id,
+            op=OP_NAMES.get(op, f"unknown:{op}"),
+            intensity=intensity,
+            duration_s=duration_s,
+            bonus_pulses_sent=len(bonus_results),
+            status=status,
+            **stage_ms,
+            total_ms=_elapsed_ms(started, finished),
+        )
     )
-    return {
+    result = {
         "accepted": True,
         "reason": decision.reason,
         "pishock_status": status,
@@ -319,3 +1008,6 @@ async def event(request: Request, x_signature: str = Header(default="")) -> dict
         "bonus_pulses_sent": len(bonus_results),
         "bonus_results": bonus_results,
     }
+    if bonus_error_code is not None:
+        result["bonus_error_code"] = bonus_error_code
+    return result
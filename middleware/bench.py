@@ -0,0 +1,436 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from middleware.config import AppConfig, EnemyScalingConfig, EnemyTier, EventMapping
+from middleware.dispatch import DispatchRecord, DispatchScheduler
+from middleware.json_backend import BACKEND as JSON_BACKEND
+from middleware.json_backend import dumps as json_dumps
+from middleware.logging_config import redact_text
+from middleware.models import GameEvent
+from middleware.policy import PolicyEngine
+from middleware.tests.reference_impls import REDACTION_SAMPLES, ReferencePolicyEngine, reference_redact_text
+
+
+def _time_per_call(func: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_redaction(iterations: int) -> dict[str, float]:
+    def run(redactor: Callable[[object], str]) -> Callable[[], None]:
+        def _run() -> None:
+            for sample in REDACTION_SAMPLES:
+                redactor(sample)
+
+        return _run
+
+    reference_s = _time_per_call(run(reference_redact_text), iterations)
+    current_s = _time_per_call(run(redact_text), iterations)
+    return {
+        "samples": len(REDACTION_SAMPLES),
+        "reference_us_per_batch": reference_s * 1e6,
+        "current_us_per_batch": current_s * 1e6,
+        "speedup": reference_s / current_s if current_s else float("inf"),
+    }
+
+
+def bench_stop_latency(iterations: int) -> dict[str, float]:
+    """Worst-case time for DispatchScheduler.cancel_all to stop running pulse trains."""
+    sessions = 32
+
+    async def pulse_train(record: DispatchRecord) -> dict:
+        for _ in range(record.operations_planned):
+            record.operations_started += 1
+            await asyncio.sleep(0.12)
+        return {}
+
+    async def run_once() -> float:
+        scheduler = DispatchScheduler()
+        for index in range(sessions):
+            scheduler.submit(f"bench-{index}", "player_hard_mode_tick", pulse_train, operations=7)
+        await asyncio.sleep(0.01)
+        return (await scheduler.cancel_all()).latency_ms
+
+    latencies = sorted(asyncio.run(run_once()) for _ in range(max(1, iterations // 100)))
+    return {
+        "sessions": sessions,
+        "runs": len(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "max_ms": latencies[-1],
+    }
+
+
+def _policy_bench_config() -> AppConfig:
+    return AppConfig(
+        hmac_secret="bench",
+        allow_shock=True,
+        max_intensity=20,
+        max_duration_ms=1500,
+        default_cooldown_ms=0,
+        pishock={},
+        event_mappings={
+            "player_damaged": EventMapping(mode="shock", intensity=50, duration_ms=2500, cooldown_ms=0),
+            "player_healed": EventMapping(mode="beep", intensity=1, duration_ms=800, cooldown_ms=0),
+            "player_near_miss": EventMapping(mode="vibrate", intensity=12, duration_ms=600, cooldown_ms=0),
+            "player_death": EventMapping(mode="beep", intensity=1, duration_ms=1200, cooldown_ms=5000),
+        },
+        enemy_scaling=EnemyScalingConfig(),
+    )
+
+
+def bench_policy(iterations: int) -> dict[str, float]:
+    """Evaluations per second for the common (non hard-mode) event mix."""
+    events = ("player_damaged", "player_healed", "player_near_miss", "player_death", "unmapped_event")
+
+    def run(engine: PolicyEngine) -> Callable[[], None]:
+        def _run() -> None:
+            for event_type in events:
+                engine.evaluate("bench", event_type, armed=True)
+
+        return _run
+
+    reference_s = _time_per_call(run(ReferencePolicyEngine(_policy_bench_config())), iterations)
+    current_s = _time_per_call(run(PolicyEngine(_policy_bench_config())), iterations)
+    return {
+        "events": len(events),
+        "reference_evals_per_s": len(events) / reference_s,
+        "current_evals_per_s": len(events) / current_s,
+        "speedup": reference_s / current_s if current_s else float("inf"),
+    }
+
+
+def bench_hard_mode(iterations: int) -> dict[str, float]:
+    """Hard-mode ticks per second across a spread of enemy counts."""
+    enemy_counts = (0, 1, 3, 7, 15, 40, 120)
+
+    def run(engine: PolicyEngine) -> Callable[[], None]:
+        for enemy_count in enemy_counts:
+            engine.evaluate(
+                f"bench-{enemy_count}",
+                "player_hard_mode_tick",
+                armed=True,
+                context={"max_hp": 100, "current_hp": 40, "damage": 60},
+            )
+
+        def _run() -> None:
+            for enemy_count in enemy_counts:
+                engine.evaluate(
+                    f"bench-{enemy_count}",
+                    "player_hard_mode_tick",
+                    armed=True,
+                    context={"max_hp": 100, "current_hp": 70, "enemy_count": enemy_count, "in_combat": True},
+                )
+
+        return _run
+
+    def engine_config() -> AppConfig:
+        cfg = _policy_bench_config()
+        cfg.event_mappings["player_hard_mode_tick"] = EventMapping(mode="hard", intensity=20, duration_ms=500, cooldown_ms=0)
+        cfg.enemy_scaling.min_tick_ms = 0
+        cfg.enemy_scaling.bonus_global_cooldown_ms = 0
+        cfg.enemy_scaling.tiers = [
+            EnemyTier(min_enemies=1, max_enemies=2, extra_pulses=0),
+            EnemyTier(min_enemies=3, max_enemies=5, extra_pulses=1),
+            EnemyTier(min_enemies=6, max_enemies=None, extra_pulses=2),
+        ]
+        return cfg
+
+    reference_s = _time_per_call(run(ReferencePolicyEngine(engine_config())), iterations)
+    current_s = _time_per_call(run(PolicyEngine(engine_config())), iterations)
+    return {
+        "enemy_counts": len(enemy_counts),
+        "reference_ticks_per_s": len(enemy_counts) / reference_s,
+        "current_ticks_per_s": len(enemy_counts) / current_s,
+        "speedup": reference_s / current_s if current_s else float("inf"),
+    }
+
+
+async def _ping_app(scope: dict, receive: Callable, send: Callable) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
+
+
+def _request_latencies_us(client: Any, requests: int) -> list[float]:
+    for _ in range(min(50, requests)):
+        client.get("/health")
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return sorted(latencies)
+
+
+def _serve_in_thread(**config_kwargs: Any) -> Any:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(_ping_app, lifespan="off", log_level="warning", **config_kwargs))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("bench_server_failed_to_start")
+        time.sleep(0.01)
+    return server, thread
+
+
+def bench_uds_latency(iterations: int) -> dict[str, float]:
+    """HTTP round-trip latency over loopback TCP versus a Unix domain socket."""
+    import httpx
+
+    from middleware.run import bind_unix_socket
+
+    requests = max(100, iterations // 4)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server, thread = _serve_in_thread(host="127.0.0.1", port=port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            tcp = _request_latencies_us(client, requests)
+    finally:
+        server.should_exit = True
+        thread.join()
+    result: dict[str, float] = {
+        "requests": requests,
+        "tcp_p50_us": tcp[len(tcp) // 2],
+        "tcp_p99_us": tcp[int(len(tcp) * 0.99)],
+    }
+    if not hasattr(socket, "AF_UNIX"):
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.sock"
+        sock = bind_unix_socket(path)
+        server, thread = _serve_in_thread(fd=sock.fileno())
+        try:
+            with httpx.Client(base_url="http://localhost", transport=httpx.HTTPTransport(uds=str(path))) as client:
+                uds = _request_latencies_us(client, requests)
+        finally:
+            server.should_exit = True
+            thread.join()
+            sock.close()
+    result.update(
+        {
+            "uds_p50_us": uds[len(uds) // 2],
+            "uds_p99_us": uds[int(len(uds) * 0.99)],
+            "p50_speedup": tcp[len(tcp) // 2] / uds[len(uds) // 2],
+        }
+    )
+    return result
+
+
+def reference_stream_jsonl(path: Path, poll_interval_s: float = 0.2):
+    """Fixed-interval tail used by file_ingest before event-driven waiting."""
+    with path.open("r", encoding="utf-8-sig") as handle:
+        while True:
+            line = handle.readline()
+            if not line:
+                time.sleep(poll_interval_s)
+                continue
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def bench_ingest_latency(iterations: int) -> dict[str, float]:
+    """Time from a line being appended to file_ingest having it ready to POST."""
+    from middleware.file_ingest import stream_jsonl
+    from middleware.file_watch import inotify_available
+
+    events = max(20, min(200, iterations // 20))
+    rng = random.Random(2077)
+    gaps_s = [rng.uniform(0.0, 0.04) for _ in range(events)]
+
+    def measure(open_stream: Callable[[Path], Any]) -> list[float]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "events.jsonl"
+            path.write_text("", encoding="utf-8")
+
+            def write() -> None:
+                with path.open("a", encoding="utf-8") as handle:
+                    for index, gap_s in enumerate(gaps_s):
+                        time.sleep(gap_s)
+                        handle.write(json.dumps({"index": index, "appended": time.perf_counter()}) + "\n")
+                        handle.flush()
+
+            stream = open_stream(path)
+            writer = threading.Thread(target=write)
+            writer.start()
+            latencies = []
+            for event in stream:
+                latencies.append((time.perf_counter() - event["appended"]) * 1000)
+                if event["index"] == events - 1:
+                    break
+            stream.close()
+            writer.join()
+        return sorted(latencies)
+
+    variants = {
+        "fixed": lambda path: reference_stream_jsonl(path, 0.2),
+        "poll": lambda path: stream_jsonl(path, 0.2, watch="poll"),
+    }
+    if inotify_available():
+        variants["inotify"] = lambda path: stream_jsonl(path, 0.2, watch="inotify")
+
+    result: dict[str, float] = {"events": events}
+    for name, open_stream in variants.items():
+        latencies = measure(open_stream)
+        result[f"{name}_p50_ms"] = latencies[len(latencies) // 2]
+        result[f"{name}_p99_ms"] = latencies[int(len(latencies) * 0.99)]
+    return result
+
+
+def bench_ingest_throughput(iterations: int) -> dict[str, float]:
+    """file_ingest send rate against an in-process /event stand-in with 2 ms service time."""
+    import httpx
+
+    from middleware.file_ingest import PipelinedSender
+
+    events = [
+        {"event_type": "player_healed", "ts_ms": index, "session_id": f"run-{index % 16}", "armed": True, "context": {}}
+        for index in range(max(64, min(2000, iterations // 4)))
+    ]
+
+    async def stand_in(scope: dict, receive: Callable, send: Callable) -> None:
+        while (await receive()).get("more_body"):
+            pass
+        await asyncio.sleep(0.002)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"accepted":true,"reason":"ok"}'})
+
+    async def run(concurrency: int) -> float:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://bench") as client:
+            sender = PipelinedSender(client, "/event", "bench", concurrency=concurrency, on_response=lambda _resp: None)
+            start = time.perf_counter()
+            for event in events:
+                await sender.submit(event)
+            await sender.join()
+            return len(events) / (time.perf_counter() - start)
+
+    sequential = asyncio.run(run(1))
+    pipelined = asyncio.run(run(8))
+    return {
+        "events": len(events),
+        "sessions": 16,
+        "sequential_events_per_s": sequential,
+        "pipelined_events_per_s": pipelined,
+        "speedup": pipelined / sequential,
+    }
+
+
+EVENT_DECODE_BODY = json.dumps(
+    {
+        "event_type": "player_hard_mode_tick",
+        "ts_ms": 1_700_000_000_000,
+        "session_id": "bench",
+        "armed": True,
+        "context": {"max_hp": 400, "current_hp": 250, "damage": 40, "enemy_count": 6, "in_combat": True},
+    },
+    separators=(",", ":"),
+).encode()
+EVENT_DECODE_RESULT = {
+    "accepted": True,
+    "reason": "ok",
+    "dispatched": {"op": "shock", "intensity": 8, "duration_s": 1},
+    "bonus_pulses": 2,
+}
+
+
+def reference_event_decode(body: bytes) -> bytes:
+    """Two-pass decode and default JSONResponse encoding used before the fast path."""
+    GameEvent.model_validate(json.loads(body))
+    return json.dumps(jsonable_encoder(EVENT_DECODE_RESULT), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def current_event_decode(body: bytes) -> bytes:
+    GameEvent.model_validate_json(body)
+    return json_dumps(EVENT_DECODE_RESULT)
+
+
+def _cpu_per_call(func: Callable[[], object], iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations
+
+
+def _peak_alloc_per_call(func: Callable[[], object], samples: int = 50) -> float:
+    """Median tracemalloc peak of a single call, in bytes."""
+    func()
+    peaks: list[int] = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+    return float(sorted(peaks)[len(peaks) // 2])
+
+
+def bench_event_decode(iterations: int) -> dict[str, float]:
+    """CPU time and peak allocation per /event body: decode, validate, encode the reply."""
+
+    def reference() -> None:
+        reference_event_decode(EVENT_DECODE_BODY)
+
+    def current() -> None:
+        current_event_decode(EVENT_DECODE_BODY)
+
+    reference_s = _cpu_per_call(reference, iterations)
+    current_s = _cpu_per_call(current, iterations)
+    return {
+        "backend": JSON_BACKEND,
+        "body_bytes": len(EVENT_DECODE_BODY),
+        "reference_cpu_us": reference_s * 1e6,
+        "current_cpu_us": current_s * 1e6,
+        "reference_peak_alloc_bytes": _peak_alloc_per_call(reference),
+        "current_peak_alloc_bytes": _peak_alloc_per_call(current),
+        "speedup": reference_s / current_s if current_s else float("inf"),
+    }
+
+
+BENCHMARKS: dict[str, Callable[[int], dict[str, float]]] = {
+    "event-decode": bench_event_decode,
+    "hard-mode": bench_hard_mode,
+    "ingest-latency": bench_ingest_latency,
+    "ingest-throughput": bench_ingest_throughput,
+    "policy": bench_policy,
+    "redaction": bench_redaction,
+    "stop-latency": bench_stop_latency,
+    "uds-latency": bench_uds_latency,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run middleware micro-benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    result = BENCHMARKS[args.name](max(1, args.iterations))
+    print(" ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
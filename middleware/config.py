@@ -50,6 +50,15 @@ class AppConfig:
     pishock: dict[str, Any]
     event_mappings: dict[str, EventMapping]
     enemy_scaling: EnemyScalingConfig
+    async_dispatch: bool = False
+    max_batch_events: int = 256
+    max_event_bytes: int = 16_384
+    ws_auth_window_ms: int = 30_000
+    dedup_window_ms: int = 0
+    dedup_max_entries: int = 65_536
+    event_max_age_ms: int = 0
+    hard_mode_idle_timeout_ms: int = 60_000
+    hard_mode_max_sessions: int = 256
 
 
 DEFAULT_CONFIG_PATH = Path(__file__).with_name("config.yaml")
@@ -133,6 +142,8 @@ def load_config(path: Path | None = None) -> AppConfig:
             tiers=tiers,
         )
 
+        server_raw = raw.get("server", {}) or {}
+
         pishock = dict(raw.get("pishock", {}) or {})
         pishock["dry_run"] = _as_bool(pishock.get("dry_run", True), default=True)
 
@@ -145,10 +156,20 @@ def load_config(path: Path | None = None) -> AppConfig:
             pishock=pishock,
             event_mappings=mappings,
             enemy_scaling=enemy_scaling,
+            async_dispatch=_as_bool(server_raw.get("async_dispatch", False), default=False),
+            max_batch_events=int(server_raw.get("max_batch_events", 256)),
+            max_event_bytes=int(server_raw.get("max_event_bytes", 16_384)),
+            ws_auth_window_ms=int(server_raw.get("ws_auth_window_ms", 30_000)),
+            dedup_window_ms=int(server_raw.get("dedup_window_ms", 0)),
+            dedup_max_entries=int(server_raw.get("dedup_max_entries", 65_536)),
+            event_max_age_ms=int(server_raw.get("event_max_age_ms", 0)),
+            hard_mode_idle_timeout_ms=int(policy_raw.get("hard_mode_idle_timeout_ms", 60_000)),
+            hard_mode_max_sessions=int(policy_raw.get("hard_mode_max_sessions", 256)),
         )
     except KeyError as exc:
         logger.error("invalid config missing key path=%s key=%s", config_path, exc.args[0])
         raise RuntimeError(f"invalid_config_missing_key: {config_path}: {exc.args[0]}") from exc
-    except (TypeError, ValueError) as exc:
+    except (AttributeError, TypeError, ValueError) as exc:
+        # AttributeError: a section that should be a mapping is a list or scalar.
         logger.error("invalid config path=%s error_type=%s", config_path, type(exc).__name__)
         raise RuntimeError(f"invalid_config: {config_path}: {exc}") from exc
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
+import random
+import sys
 import time
 from pathlib import Path
 
 import httpx
 
 from middleware.config import load_config
+from middleware.metrics import SERVER_TIMING_HEADER, parse_server_timing, server_timing_summary
 from middleware.security import compute_signature
 
 BASE_URL_ENV = "PISHOCK_BASE_URL"
+UDS_ENV = "PISHOCK_UDS"
 DEFAULT_BASE_URL = "http://127.0.0.1:8000"
+DEFAULT_LOAD_MIX = "player_damaged=5,player_healed=2,player_hard_mode_tick=3"
+LIVE_LOAD_REFUSED = (
+    "load_refused_live_pishock: /health does not report dry_run_effective=true, so this load would reach a real "
+    "PiShock device. Use a dry-run config or runtime mode test, or pass --allow-live if that is intended."
+)
 
 
 def _resolve_secret(secret: str | None, config_path: str | None) -> str:
@@ -32,8 +42,12 @@ def _resolve_base_url(cli_base_url: str | None) -> str:
     return (cli_base_url or os.environ.get(BASE_URL_ENV) or DEFAULT_BASE_URL).rstrip("/")
 
 
+def _resolve_uds(cli_uds: str | None) -> str | None:
+    return cli_uds or os.environ.get(UDS_ENV) or None
+
+
 def _build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(description="Send one signed demo event to the middleware API")
+    parser = argparse.ArgumentParser(description="Send a signed demo event (or a --load stream) to the middleware API")
     parser.add_argument(
         "--base-url",
         "--url",
@@ -41,6 +55,11 @@ def _build_parser() -> argparse.ArgumentParser:
         default=None,
         help=f"Base middleware URL (default: {DEFAULT_BASE_URL}; env: {BASE_URL_ENV})",
     )
+    parser.add_argument(
+        "--uds",
+        default=None,
+        help=f"Connect through this Unix domain socket (middleware.run --uds); env: {UDS_ENV}",
+    )
     parser.add_argument("--session-id", default="demo-run", help="Session id used for arm/event")
     parser.add_argument("--event-type", default="player_damaged", help="Event type to send")
     parser.add_argument("--context-json", default='{"damage":12}', help="JSON object string for context")
@@ -51,6 +70,24 @@ def _build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--payload-unarmed", action="store_true", help="Send payload with armed=false")
     parser.add_argument("--timeout-s", type=float, default=3.0)
     parser.add_argument("--debug", action="store_true", help="Show tracebacks for connection/debug failures")
+    load = parser.add_argument_group("load mode")
+    load.add_argument(
+        "--load",
+        action="store_true",
+        help="Arm --sessions sessions and send a mixed event stream at --rate, then print a latency/outcome summary",
+    )
+    load.add_argument("--sessions", type=int, default=10, help="Sessions armed and sent to (ids: <session-id>-<n>)")
+    load.add_argument("--rate", type=float, default=50.0, help="Target events per second across all sessions")
+    load.add_argument("--duration-s", type=float, default=10.0, help="How long to send for")
+    load.add_argument("--concurrency", type=int, default=32, help="Most requests in flight at once")
+    load.add_argument("--mix", default=DEFAULT_LOAD_MIX, help="Event mix as event_type=weight,...")
+    load.add_argument("--max-enemies", type=int, default=8, help="Upper bound for hard-mode enemy_count")
+    load.add_argument("--seed", type=int, default=None, help="Seed for a repeatable event sequence")
+    load.add_argument(
+        "--allow-live",
+        action="store_true",
+        help="Run --load even when /health reports dry_run_effective=false (real PiShock operations)",
+    )
     return parser
 
 
@@ -123,10 +160,286 @@ def _pishock_failure_exit_code(response_text: str) -> int | None:
     return None
 
 
+def _parse_mix(text: str) -> list[tuple[str, float]]:
+    mix: list[tuple[str, float]] = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        event_type, _, weight = part.partition("=")
+        try:
+            value = float(weight) if weight.strip() else 1.0
+        except ValueError:
+            raise ValueError(f"invalid_mix_weight: {part.strip()}") from None
+        if value < 0:
+            raise ValueError(f"invalid_mix_weight: {part.strip()}")
+        if value > 0:
+            mix.append((event_type.strip(), value))
+    if not mix:
+        raise ValueError("invalid_mix: no event types with a positive weight")
+    return mix
+
+
+def build_load_event(rng: random.Random, event_type: str, session_id: str, max_enemies: int = 8) -> dict:
+    if event_type == "player_healed":
+        context: dict = {"amount": rng.randint(5, 40)}
+    elif event_type == "player_hard_mode_tick":
+        max_hp = 400
+        context = {
+            "enemy_count": rng.randint(0, max(0, max_enemies)),
+            "max_hp": max_hp,
+            "current_hp": rng.randint(1, max_hp),
+            "damage": rng.randint(0, 80),
+            "in_combat": rng.random() < 0.5,
+        }
+    else:
+        context = {"damage": rng.randint(1, 60)}
+    return {
+        "event_type": event_type,
+        "ts_ms": int(time.time() * 1000),
+        "session_id": session_id,
+        "armed": True,
+        "context": context,
+    }
+
+
+def _latency_summary(latencies_ms: list[float], prefix: str = "latency_") -> dict[str, float]:
+    if not latencies_ms:
+        return {f"{prefix}p50_ms": 0.0, f"{prefix}p95_ms": 0.0, f"{prefix}p99_ms": 0.0, f"{prefix}max_ms": 0.0}
+    ordered = sorted(latencies_ms)
+    return {
+        f"{prefix}p50_ms": round(ordered[len(ordered) // 2], 3),
+        f"{prefix}p95_ms": round(ordered[int(len(ordered) * 0.95)], 3),
+        f"{prefix}p99_ms": round(ordered[int(len(ordered) * 0.99)], 3),
+        f"{prefix}max_ms": round(ordered[-1], 3),
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    base_url: str,
+    secret: str,
+    sessions: int = 10,
+    rate: float = 50.0,
+    duration_s: float = 10.0,
+    concurrency: int = 32,
+    mix: list[tuple[str, float]] | None = None,
+    max_enemies: int = 8,
+    session_prefix: str = "load",
+    arm: bool = True,
+    seed: int | None = None,
+    allow_live: bool = False,
+    health: dict | None = None,
+) -> dict:
+    """Send a mixed event stream from many armed sessions at a fixed rate.
+
+    Events are scheduled every ``1 / rate`` seconds. Once ``concurrency``
+    requests are outstanding the schedule waits for one to finish, so a
+    middleware that cannot keep up shows as an achieved rate below the target
+    rather than as an ever-growing pile of open requests.
+
+    Refuses to start (RuntimeError) unless ``/health`` reports
+    ``dry_run_effective`` true, so a load test never reaches a real device by
+    accident; ``allow_live`` overrides that. ``health`` is a ``/health`` body
+    the caller already fetched.
+
+    Sessions armed here are disarmed again when the run ends, also after an
+    error or Ctrl-C; the summary counts failed disarms in ``disarm_errors``.
+    """
+    if health is None:
+        resp = await client.get(f"{base_url}/health")
+        try:
+            health = resp.json()
+        except ValueError:
+            health = {}
+    if not allow_live and not (isinstance(health, dict) and health.get("dry_run_effective") is True):
+        raise RuntimeError(LIVE_LOAD_REFUSED)
+    rng = random.Random(seed)
+    mix = mix or _parse_mix(DEFAULT_LOAD_MIX)
+    event_types = [event_type for event_type, _ in mix]
+    weights = [weight for _, weight in mix]
+    session_ids = [f"{session_prefix}-{index}" for index in range(max(1, sessions))]
+    errors: dict[str, int] = {}
+    blocked: dict[str, int] = {}
+    latencies_ms: list[float] = []
+    server_timings_ms: dict[str, list[float]] = {}
+    accepted = 0
+
+    def count_error(key: str) -> None:
+        errors[key] = errors.get(key, 0) + 1
+
+    armed_ids: list[str] = []
+    disarm_errors: dict[str, int] = {}
+    if arm:
+        for session_id, resp in zip(
+            session_ids,
+            await asyncio.gather(
+                *(client.post(f"{base_url}/arm/{session_id}") for session_id in session_ids),
+                return_exceptions=True,
+            ),
+        ):
+            if isinstance(resp, BaseException):
+                count_error(f"arm_{type(resp).__name__}")
+            elif resp.status_code >= 400:
+                count_error(f"arm_http_{resp.status_code}")
+            else:
+                armed_ids.append(session_id)
+
+    window = asyncio.Semaphore(max(1, concurrency))
+
+    async def send(event: dict) -> None:
+        nonlocal accepted
+        body = json.dumps(event, separators=(",", ":")).encode("utf-8")
+        started = time.perf_counter()
+        try:
+            resp = await client.post(
+                f"{base_url}/event",
+                content=body,
+                headers={"content-type": "application/json", "x-signature": compute_signature(secret, body)},
+            )
+        except httpx.HTTPError as exc:
+            count_error(type(exc).__name__)
+            return
+        finally:
+            window.release()
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        for stage, duration_ms in parse_server_timing(resp.headers.get(SERVER_TIMING_HEADER, "")).items():
+            server_timings_ms.setdefault(stage, []).append(duration_ms)
+        if resp.status_code >= 400:
+            count_error(f"http_{resp.status_code}")
+            return
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            count_error("invalid_response")
+        elif payload.get("accepted"):
+            accepted += 1
+        else:
+            reason = str(payload.get("reason", "unknown"))
+            blocked[reason] = blocked.get(reason, 0) + 1
+
+    rate = max(0.001, rate)
+    total = max(1, int(rate * max(0.0, duration_s)))
+    tasks: set[asyncio.Task] = set()
+    last_ts_ms = 0
+    completed = False
+    started = time.perf_counter()
+    try:
+        for index in range(total):
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await window.acquire()
+            event_type = rng.choices(event_types, weights)[0]
+            payload = build_load_event(rng, event_type, rng.choice(session_ids), max_enemies)
+            # Strictly increasing ts_ms: two events in the same millisecond would
+            # otherwise share a key and the second be suppressed as duplicate_event.
+            last_ts_ms = payload["ts_ms"] = max(payload["ts_ms"], last_ts_ms + 1)
+            task = asyncio.create_task(send(payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*list(tasks))
+        elapsed_s = time.perf_counter() - started
+        completed = True
+    finally:
+        # Also on Ctrl-C or an error: never leave load sessions armed.
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(*list(tasks), return_exceptions=True)
+        disarm_errors.update(await _disarm_sessions(client, base_url, armed_ids))
+        if disarm_errors and not completed:
+            # No summary is returned on this path, so report the failures here.
+            print(f"load_disarm_failed sessions={sum(disarm_errors.values())} errors={disarm_errors}", file=sys.stderr)
+
+    return {
+        "sessions": len(session_ids),
+        "requests": total,
+        "elapsed_s": round(elapsed_s, 3),
+        "target_rate_eps": round(rate, 1),
+        "achieved_rate_eps": round(total / elapsed_s, 1) if elapsed_s > 0 else 0.0,
+        "accepted": accepted,
+        "blocked": dict(sorted(blocked.items())),
+        "errors": dict(sorted(errors.items())),
+        "disarmed": len(armed_ids) - sum(disarm_errors.values()),
+        "disarm_errors": dict(sorted(disarm_errors.items())),
+        **_latency_summary(latencies_ms),
+        # Middleware-side time per stage, from the Server-Timing header.
+        "server_timing": {stage: _latency_summary(values, prefix="") for stage, values in server_timings_ms.items()},
+    }
+
+
+async def _disarm_sessions(client: httpx.AsyncClient, base_url: str, session_ids: list[str]) -> dict[str, int]:
+    """POST /disarm for each session; return failure counts keyed like ``errors``."""
+    failures: dict[str, int] = {}
+    for resp in await asyncio.gather(
+        *(client.post(f"{base_url}/disarm/{session_id}") for session_id in session_ids),
+        return_exceptions=True,
+    ):
+        if isinstance(resp, BaseException):
+            key = f"disarm_{type(resp).__name__}"
+        elif resp.status_code >= 400:
+            key = f"disarm_http_{resp.status_code}"
+        else:
+            continue
+        failures[key] = failures.get(key, 0) + 1
+    return failures
+
+
+async def _run_load_cli(args: argparse.Namespace, secret: str, base_url: str, uds: str | None) -> dict:
+    try:
+        mix = _parse_mix(args.mix)
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from None
+    transport = httpx.AsyncHTTPTransport(uds=uds) if uds else None
+    limits = httpx.Limits(max_connections=max(1, args.concurrency), max_keepalive_connections=max(1, args.concurrency))
+    async with httpx.AsyncClient(timeout=max(0.5, args.timeout_s), transport=transport, limits=limits) as client:
+        try:
+            health_resp = await client.get(f"{base_url}/health")
+        except (httpx.ConnectError, httpx.TimeoutException, httpx.RequestError):
+            if args.debug:
+                raise
+            print(_connection_help(base_url))
+            raise SystemExit(2) from None
+        try:
+            health_payload = health_resp.json()
+        except ValueError:
+            health_payload = {}
+        if not isinstance(health_payload, dict):
+            health_payload = {}
+        print(_health_line(health_resp.status_code, health_payload))
+        try:
+            return await run_load(
+                client,
+                base_url,
+                secret,
+                sessions=args.sessions,
+                rate=args.rate,
+                duration_s=args.duration_s,
+                concurrency=args.concurrency,
+                mix=mix,
+                max_enemies=args.max_enemies,
+                session_prefix=args.session_id,
+                arm=not args.skip_arm,
+                seed=args.seed,
+                allow_live=args.allow_live,
+                health=health_payload,
+            )
+        except RuntimeError as exc:
+            raise SystemExit(str(exc)) from None
+
+
 def main(argv: list[str] | None = None) -> None:
     parser = _build_parser()
     args = parser.parse_args(argv)
 
+    if args.load:
+        secret = _resolve_secret(args.secret or None, args.config or None)
+        summary = asyncio.run(_run_load_cli(args, secret, _resolve_base_url(args.base_url), _resolve_uds(args.uds)))
+        print(json.dumps(summary, indent=2))
+        return
+
     try:
         context = json.loads(args.context_json)
     except json.JSONDecodeError as exc:
@@ -146,8 +459,11 @@ def main(argv: list[str] | None = None) -> None:
     body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
     signature = compute_signature(secret, body)
     base_url = _resolve_base_url(args.base_url)
+    uds = _resolve_uds(args.uds)
+    # With a socket path the URL host is only used for the Host header.
+    transport = httpx.HTTPTransport(uds=uds) if uds else None
 
-    with httpx.Client(timeout=max(0.5, args.timeout_s)) as client:
+    with httpx.Client(timeout=max(0.5, args.timeout_s), transport=transport) as client:
         try:
             health_resp = client.get(f"{base_url}/health")
         except (httpx.ConnectError, httpx.TimeoutException, httpx.RequestError):
@@ -174,6 +490,9 @@ def main(argv: list[str] | None = None) -> None:
             headers={"content-type": "application/json", "x-signature": signature},
         )
         print(f"event_status={event_resp.status_code} event_response={event_resp.text}")
+        timing = server_timing_summary(event_resp.headers)
+        if timing:
+            print(f"event_timing {timing}")
         hint = _event_response_hint(event_resp.text, runtime_mode=runtime_mode)
         if hint:
             print(hint)
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from time import monotonic, perf_counter
+from typing import Any, Callable, Coroutine
+
+DISPATCH_QUEUE_FULL = "pishock_dispatch_queue_full"
+DEFAULT_DISPATCH_WORKERS = 2
+DEFAULT_DISPATCH_QUEUE_DEPTH = 16
+DEFAULT_DISPATCH_RECORDS = 1024
+STATUS_PENDING = "pending"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+
+class DispatchQueueFull(RuntimeError):
+    pass
+
+
+class DispatchExecutor:
+    """Bounded worker pool for blocking PiShock calls.
+
+    Keeps device I/O off the default thread pool that FastAPI uses for sync
+    endpoints. At most ``workers`` calls run at once and ``queue_depth`` more may
+    wait; anything beyond that fails immediately with DispatchQueueFull.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_DISPATCH_WORKERS,
+        queue_depth: int = DEFAULT_DISPATCH_QUEUE_DEPTH,
+        thread_name_prefix: str = "pishock-dispatch",
+    ):
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(0, int(queue_depth))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._service_total_s = 0.0
+        self._service_max_s = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise DispatchQueueFull(DISPATCH_QUEUE_FULL)
+            self._pending += 1
+            self.submitted += 1
+        try:
+            # Run in a copy of the caller's context so log records from the worker keep its correlation id.
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._timed_call, perf_counter(), func, args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # A call cancelled while still queued (/stop, /disarm, shutdown) never
+        # reaches _timed_call, so its slot is released here instead.
+        future.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_cancelled(self, future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._pending -= 1
+
+    def _timed_call(self, enqueued: float, func: Callable[..., Any], args: tuple) -> Any:
+        started = perf_counter()
+        with self._lock:
+            self._running += 1
+            wait_s = started - enqueued
+            self._wait_total_s += wait_s
+            self._wait_max_s = max(self._wait_max_s, wait_s)
+        try:
+            return func(*args)
+        finally:
+            service_s = perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self.completed += 1
+                self._service_total_s += service_s
+                self._service_max_s = max(self._service_max_s, service_s)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            started = self.completed + self._running
+            return {
+                "workers": self.workers,
+                "queue_capacity": self.queue_depth,
+                "queue_depth": self._pending - self._running,
+                "running": self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms_avg": round(self._wait_total_s * 1000 / started, 3) if started else 0.0,
+                "wait_ms_max": round(self._wait_max_s * 1000, 3),
+                "service_ms_avg": round(self._service_total_s * 1000 / self.completed, 3) if self.completed else 0.0,
+                "service_ms_max": round(self._service_max_s * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class DispatchRecord:
+    dispatch_id: str
+    session_id: str
+    event_type: str
+    operations_planned: int = 1
+    operations_started: int = 0
+    status: str = STATUS_PENDING
+    result: dict[str, Any] | None = None
+    created_at: float = field(default_factory=monotonic)
+    finished_at: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "dispatch_id": self.dispatch_id,
+            "session_id": self.session_id,
+            "event_type": self.event_type,
+            "status": self.status,
+            "operations_planned": self.operations_planned,
+            "operations_started": self.operations_started,
+            "result": self.result,
+        }
+
+
+@dataclass(frozen=True)
+class CancelResult:
+    dispatches: int
+    operations: int
+    latency_ms: float
+
+
+class DispatchScheduler:
+    """Runs event dispatches as tracked tasks and keeps their results.
+
+    Every dispatch is indexed by session so /disarm and /stop can cancel
+    pending pulses immediately. Results for the most recent ``max_records``
+    dispatches stay available for lookup; older finished records are evicted
+    first.
+    """
+
+    def __init__(self, max_records: int = DEFAULT_DISPATCH_RECORDS):
+        self.max_records = max(1, int(max_records))
+        self._records: OrderedDict[str, DispatchRecord] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._session_dispatches: dict[str, set[str]] = {}
+        self.cancelled_dispatches = 0
+        self.cancelled_operations = 0
+        self.max_cancel_latency_ms = 0.0
+
+    def submit(
+        self,
+        session_id: str,
+        event_type: str,
+        run: Callable[[DispatchRecord], Coroutine[Any, Any, dict[str, Any]]],
+        operations: int = 1,
+    ) -> DispatchRecord:
+        record = DispatchRecord(
+            dispatch_id=uuid.uuid4().hex,
+            session_id=session_id,
+            event_type=event_type,
+            operations_planned=max(1, int(operations)),
+        )
+        self._records[record.dispatch_id] = record
+        self._evict()
+        task = asyncio.get_running_loop().create_task(self._run(record, run))
+        task.add_done_callback(functools.partial(self._finish, record))
+        self._tasks[record.dispatch_id] = task
+        self._session_dispatches.setdefault(session_id, set()).add(record.dispatch_id)
+        return record
+
+    def get(self, dispatch_id: str) -> DispatchRecord | None:
+        return self._records.get(dispatch_id)
+
+    def pending_count(self) -> int:
+        return len(self._tasks)
+
+    async def wait(self, record: DispatchRecord) -> DispatchRecord:
+        task = self._tasks.get(record.dispatch_id)
+        if task is not None:
+            await asyncio.wait({task})
+        return record
+
+    async def cancel_session(self, session_id: str) -> CancelResult:
+        return await self._cancel(list(self._session_dispatches.get(session_id, ())))
+
+    async def cancel_all(self) -> CancelResult:
+        return await self._cancel(list(self._tasks))
+
+    async def _cancel(self, dispatch_ids: list[str]) -> CancelResult:
+        started = perf_counter()
+        tasks: list[asyncio.Task] = []
+        operations = 0
+        for dispatch_id in dispatch_ids:
+            task = self._tasks.get(dispatch_id)
+            record = self._records.get(dispatch_id)
+            if task is None or task.done() or record is None:
+                continue
+            # Nothing else runs on the loop until we await, so no further
+            # operation can start between this count and the cancellation.
+            operations += max(0, record.operations_planned - record.operations_started)
+            task.cancel()
+            tasks.append(task)
+        if tasks:
+            await asyncio.wait(tasks)
+        latency_ms = round((perf_counter() - started) * 1000, 3)
+        self.cancelled_dispatches += len(tasks)
+        self.cancelled_operations += operations
+        if tasks:
+            self.max_cancel_latency_ms = max(self.max_cancel_latency_ms, latency_ms)
+        return CancelResult(dispatches=len(tasks), operations=operations, latency_ms=latency_ms)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": len(self._tasks),
+            "records": len(self._records),
+            "cancelled_dispatches": self.cancelled_dispatches,
+            "cancelled_operations": self.cancelled_operations,
+            "max_cancel_latency_ms": self.max_cancel_latency_ms,
+        }
+
+    async def _run(
+        self,
+        record: DispatchRecord,
+        run: Callable[[DispatchRecord], Coroutine[Any, Any, dict[str, Any]]],
+    ) -> None:
+        try:
+            record.result = await run(record)
+            record.status = STATUS_COMPLETED
+        except Exception as exc:
+            record.status = STATUS_FAILED
+            record.result = {"accepted": False, "error_type": type(exc).__name__}
+
+    def _finish(self, record: DispatchRecord, task: asyncio.Task) -> None:
+        # Runs as a done callback so tasks cancelled before their first step are
+        # cleaned up too.
+        if task.cancelled():
+            record.status = STATUS_CANCELLED
+        record.finished_at = monotonic()
+        self._tasks.pop(record.dispatch_id, None)
+        session_dispatches = self._session_dispatches.get(record.session_id)
+        if session_dispatches is not None:
+            session_dispatches.discard(record.dispatch_id)
+            if not session_dispatches:
+                del self._session_dispatches[record.session_id]
+
+    def _evict(self) -> None:
+        if len(self._records) <= self.max_records:
+            return
+        for dispatch_id in list(self._records):
+            if len(self._records) <= self.max_records:
+                break
+            if self._records[dispatch_id].status != STATUS_PENDING:
+                del self._records[dispatch_id]
+
+    async def shutdown(self) -> None:
+        await self.cancel_all()
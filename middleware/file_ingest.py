@@ -1,15 +1,24 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
 import json
 import logging
+import mmap
+import os
 import sys
+import threading
 import time
+from collections import deque
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 import httpx
 
+from middleware.file_watch import WATCH_MODES, build_waiter
 from middleware.logging_config import configure_logging
+from middleware.metrics import server_timing_summary
 from middleware.security import compute_signature
 
 logger = logging.getLogger(__name__)
@@ -20,24 +29,590 @@ def encode_signed_event(event: dict, secret: str) -> tuple[bytes, str]:
     return body, compute_signature(secret, body)
 
 
-def stream_jsonl(path: Path, poll_interval_s: float = 0.2):
-    # Accept JSONL files saved with or without a UTF-8 BOM.
-    with path.open("r", encoding="utf-8-sig") as handle:
-        line_number = 0
+UTF8_BOM = b"\xef\xbb\xbf"
+CHECKPOINT_FLUSH_EVERY = 100
+CHECKPOINT_FLUSH_INTERVAL_S = 1.0
+
+
+def _file_identity(stat_result: os.stat_result) -> tuple[int, int]:
+    return stat_result.st_dev, stat_result.st_ino
+
+
+class IngestCheckpoint:
+    """Persisted read position (device, inode, byte offset) for a JSONL source.
+
+    ``advance`` only updates memory; the file is rewritten atomically every
+    ``flush_every`` events, every ``flush_interval_s`` seconds, whenever the
+    source goes idle, and on close. A crash therefore replays at most one batch.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        flush_every: int = CHECKPOINT_FLUSH_EVERY,
+        flush_interval_s: float = CHECKPOINT_FLUSH_INTERVAL_S,
+    ):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval_s = max(0.0, flush_interval_s)
+        self.identity: tuple[int, int] | None = None
+        self.offset = 0
+        self.writes = 0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> IngestCheckpoint:
+        checkpoint = cls(path, **kwargs)
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            checkpoint.identity = (int(raw["device"]), int(raw["inode"]))
+            checkpoint.offset = max(0, int(raw["offset"]))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("ignoring unreadable ingest checkpoint path=%s error_type=%s", path, type(exc).__name__)
+        return checkpoint
+
+    def matches(self, identity: tuple[int, int]) -> bool:
+        return self.identity == identity
+
+    def advance(self, identity: tuple[int, int], offset: int) -> None:
+        self.identity = identity
+        self.offset = offset
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._unflushed or self.identity is None:
+            return
+        payload = {"device": self.identity[0], "inode": self.identity[1], "offset": self.offset}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._unflushed = 0
+        self.writes += 1
+
+
+class CheckpointCommitter:
+    """Advances a checkpoint past events in file order as their sends finish.
+
+    Pipelined sends complete out of order across sessions, so each event gets
+    a sequence number when it is read and the checkpoint only moves up to the
+    last event whose predecessors have all finished. Events still queued or in
+    flight at a crash are therefore sent again on restart, never skipped.
+    """
+
+    def __init__(self, checkpoint: IngestCheckpoint):
+        self.checkpoint = checkpoint
+        self._next_seq = 0
+        self._done_upto = 0
+        self._positions: dict[int, tuple[tuple[int, int], int]] = {}
+        self._completed: set[int] = set()
+
+    def track(self, identity: tuple[int, int], offset: int) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._positions[seq] = (identity, offset)
+        return seq
+
+    def complete(self, seq: int) -> None:
+        self._completed.add(seq)
+        position = None
+        while self._done_upto in self._completed:
+            self._completed.discard(self._done_upto)
+            position = self._positions.pop(self._done_upto)
+            self._done_upto += 1
+        if position is not None:
+            self.checkpoint.advance(*position)
+
+
+def stream_jsonl(
+    path: Path,
+    poll_interval_s: float = 0.2,
+    watch: str = "auto",
+    checkpoint: IngestCheckpoint | None = None,
+    from_end: bool = False,
+    positions: bool = False,
+):
+    """Yield JSON objects appended to ``path``, waiting for more at EOF.
+
+    A line is only parsed once its newline has been written, so an event caught
+    mid-write is not reported as invalid. An unterminated tail that already
+    parses as JSON is yielded straight away.
+
+    Reading starts at the ``checkpoint`` offset when it refers to the same file,
+    otherwise at the end (``from_end``) or the beginning. At EOF the file is
+    checked for truncation (size below the read position: restart at 0) and
+    rotation (a different file now at ``path``: switch to it from byte 0).
+
+    With ``positions`` each item is ``(event, identity, offset)`` and the
+    checkpoint is only read for the start offset; the caller advances it once
+    the event has actually been handled (see CheckpointCommitter).
+    """
+    handle = path.open("rb")
+    identity = _file_identity(os.fstat(handle.fileno()))
+    size = os.fstat(handle.fileno()).st_size
+    offset = 0
+    if checkpoint is not None and checkpoint.matches(identity):
+        offset = checkpoint.offset if checkpoint.offset <= size else 0
+    elif from_end:
+        offset = size
+    handle.seek(offset)
+    tracked = None if positions else checkpoint
+    waiter = build_waiter(path, watch, poll_interval_s)
+    logger.info("file ingest waiting for data path=%s watch=%s offset=%s", path, waiter.mode, offset)
+    line_number = 0
+    pending = b""
+    try:
         while True:
-            line = handle.readline()
-            if not line:
-                time.sleep(poll_interval_s)
+            chunk = handle.readline()
+            if not chunk:
+                if tracked is not None:
+                    tracked.flush()
+                reason = _stale_handle_reason(path, identity, handle, offset + len(pending))
+                if reason is None:
+                    waiter.wait()
+                    continue
+                if reason == "rotated":
+                    try:
+                        new_handle = path.open("rb")
+                    except FileNotFoundError:
+                        waiter.wait()
+                        continue
+                    handle.close()
+                    waiter.close()
+                    handle = new_handle
+                    identity = _file_identity(os.fstat(handle.fileno()))
+                    waiter = build_waiter(path, watch, poll_interval_s)
+                else:
+                    handle.seek(0)
+                logger.warning("file ingest source changed path=%s reason=%s offset=%s", path, reason, offset)
+                pending = b""
+                offset = 0
                 continue
+
+            waiter.reset()
+            pending += chunk
+            if not pending.endswith(b"\n"):
+                try:
+                    event = json.loads(pending.removeprefix(UTF8_BOM))
+                except ValueError:
+                    continue
+                offset += len(pending)
+                pending = b""
+                yield (event, identity, offset) if positions else event
+                if tracked is not None:
+                    tracked.advance(identity, offset)
+                continue
+
             line_number += 1
-            line = line.strip()
+            offset += len(pending)
+            line, pending = pending.removeprefix(UTF8_BOM).strip(), b""
             if not line:
                 continue
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError as exc:
+                event = json.loads(line)
+            except ValueError as exc:
                 logger.warning("skipping invalid JSONL line path=%s line=%s error=%s", path, line_number, exc)
                 print(f"skipping_invalid_jsonl_line line={line_number}: {exc}", file=sys.stderr)
+                continue
+            yield (event, identity, offset) if positions else event
+            # Recorded once the consumer asks for the next event, i.e. after it
+            # handled this one.
+            if tracked is not None:
+                tracked.advance(identity, offset)
+    finally:
+        handle.close()
+        waiter.close()
+        if tracked is not None:
+            tracked.flush()
+
+
+def _stale_handle_reason(path: Path, identity: tuple[int, int], handle, position: int) -> str | None:
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        # Mid-rotation: keep the old handle until the new file appears.
+        return None
+    if _file_identity(current) != identity:
+        return "rotated"
+    if os.fstat(handle.fileno()).st_size < position:
+        return "truncated"
+    return None
+
+
+def iter_jsonl_mmap(path: Path) -> Iterator[dict]:
+    """Yield every JSON object in a finished JSONL file, read through mmap.
+
+    Meant for replaying a recorded session: lines are sliced straight out of the
+    mapping instead of being copied through a file buffer, and the file is not
+    tailed afterwards. Invalid lines are skipped like in ``stream_jsonl``.
+    """
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = len(UTF8_BOM) if mapped[: len(UTF8_BOM)] == UTF8_BOM else 0
+            size = len(mapped)
+            line_number = 0
+            while start < size:
+                end = mapped.find(b"\n", start)
+                if end < 0:
+                    end = size
+                line_number += 1
+                line = mapped[start:end].strip()
+                start = end + 1
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError as exc:
+                    logger.warning("skipping invalid JSONL line path=%s line=%s error=%s", path, line_number, exc)
+                    print(f"skipping_invalid_jsonl_line line={line_number}: {exc}", file=sys.stderr)
+                    continue
+                yield event
+
+
+POST_FAILURE_BACKOFF_S = 0.5
+DEFAULT_MAX_BACKLOG = 10_000
+
+
+def _report_response(resp: httpx.Response) -> None:
+    reason = ""
+    try:
+        payload = resp.json()
+        if isinstance(payload, dict):
+            reason = str(payload.get("reason", payload.get("detail", "")))
+    except json.JSONDecodeError:
+        reason = ""
+    timing = server_timing_summary(resp.headers)
+    logger.info("middleware response status=%s reason=%s %s", resp.status_code, reason, timing)
+    if timing:
+        print(resp.status_code, resp.text, timing)
+    else:
+        print(resp.status_code, resp.text)
+
+
+def _report_post_failure(url: str, exc: httpx.HTTPError) -> None:
+    logger.error("middleware post failed target_url=%s error_type=%s", url, type(exc).__name__)
+    print(f"middleware_post_failed: {exc}", file=sys.stderr)
+
+
+class PipelinedSender:
+    """Posts events with up to ``concurrency`` requests in flight.
+
+    Events for one session_id are sent strictly one after another, so the
+    middleware sees each session's events in file order; different sessions
+    overlap. ``submit`` waits once ``max_backlog`` events are queued or in
+    flight, which pushes back on the file reader instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        secret: str,
+        concurrency: int = 8,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+        on_response: Callable[[httpx.Response], None] = _report_response,
+        on_post: Callable[[dict], None] | None = None,
+    ):
+        self.client = client
+        self.url = url
+        self.secret = secret
+        self.concurrency = max(1, concurrency)
+        self.on_response = on_response
+        self.on_post = on_post
+        self._window = asyncio.Semaphore(self.concurrency)
+        self._capacity = asyncio.Semaphore(max(1, max_backlog))
+        self._sessions: dict[str, deque[tuple[dict, Callable[[], None] | None]]] = {}
+        self._drains: set[asyncio.Task] = set()
+        self.backlog = 0
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def submit(self, event: dict, on_done: Callable[[], None] | None = None) -> None:
+        """Queue ``event``; ``on_done`` runs once its post has finished, sent or failed."""
+        await self._capacity.acquire()
+        self.backlog += 1
+        session_id = str(event.get("session_id", "")) if isinstance(event, dict) else ""
+        queue = self._sessions.get(session_id)
+        if queue is not None:
+            queue.append((event, on_done))
+            return
+        self._sessions[session_id] = deque([(event, on_done)])
+        task = asyncio.create_task(self._drain(session_id))
+        self._drains.add(task)
+        task.add_done_callback(self._drains.discard)
+
+    async def join(self) -> None:
+        while self._drains:
+            await asyncio.gather(*list(self._drains))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "backlog": self.backlog,
+            "in_flight": self.in_flight,
+            "sessions": len(self._sessions),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    async def _drain(self, session_id: str) -> None:
+        queue = self._sessions[session_id]
+        try:
+            while queue:
+                event, on_done = queue.popleft()
+                try:
+                    async with self._window:
+                        ok = await self._post(event)
+                finally:
+                    self.backlog -= 1
+                    self._capacity.release()
+                if on_done is not None:
+                    on_done()
+                if not ok:
+                    # Only this session pauses; the rest of the window keeps going.
+                    await asyncio.sleep(POST_FAILURE_BACKOFF_S)
+        finally:
+            del self._sessions[session_id]
+
+    async def _post(self, event: dict) -> bool:
+        body, sig = encode_signed_event(event, self.secret)
+        if self.on_post is not None:
+            self.on_post(event)
+        self.in_flight += 1
+        try:
+            resp = await self.client.post(
+                self.url,
+                content=body,
+                headers={"content-type": "application/json", "x-signature": sig},
+            )
+        except httpx.HTTPError as exc:
+            self.failed += 1
+            _report_post_failure(self.url, exc)
+            return False
+        finally:
+            self.in_flight -= 1
+        self.sent += 1
+        self.on_response(resp)
+        return True
+
+
+def _event_ts_ms(event: dict) -> float | None:
+    ts_ms = event.get("ts_ms") if isinstance(event, dict) else None
+    if isinstance(ts_ms, bool) or not isinstance(ts_ms, (int, float)):
+        return None
+    return ts_ms
+
+
+def _lag_percentiles(lags_ms: list[float]) -> dict[str, float]:
+    if not lags_ms:
+        return {"lag_p50_ms": 0.0, "lag_p95_ms": 0.0, "lag_p99_ms": 0.0, "lag_max_ms": 0.0}
+    ordered = sorted(lags_ms)
+    return {
+        "lag_p50_ms": round(ordered[len(ordered) // 2], 3),
+        "lag_p95_ms": round(ordered[int(len(ordered) * 0.95)], 3),
+        "lag_p99_ms": round(ordered[int(len(ordered) * 0.99)], 3),
+        "lag_max_ms": round(ordered[-1], 3),
+    }
+
+
+async def replay_events(
+    events: Iterable[dict],
+    sender: PipelinedSender,
+    speed: float = 1.0,
+    clock: Callable[[], float] = time.perf_counter,
+) -> dict:
+    """Send recorded events with their original ``ts_ms`` spacing.
+
+    Event ``n`` is due ``(ts_ms[n] - ts_ms[0]) / speed`` ms after the first one;
+    ``speed`` 0 sends as fast as the sender accepts them. A timestamp that goes
+    backwards (or is missing) never moves the schedule back. Lag is measured
+    when each request actually starts, so it includes time spent waiting for a
+    free slot in the sender's window as well as late wake-ups.
+    """
+    due_at: dict[int, float] = {}
+    lags_ms: list[float] = []
+
+    def record_lag(event: dict) -> None:
+        due = due_at.pop(id(event), None)
+        if due is not None:
+            lags_ms.append((clock() - due) * 1000)
+
+    sender.on_post = record_lag
+    started = clock()
+    first_ts: float | None = None
+    last_ts: float | None = None
+    offset_s = 0.0
+    count = 0
+    for event in events:
+        ts_ms = _event_ts_ms(event)
+        if ts_ms is not None:
+            if first_ts is None:
+                first_ts = last_ts = ts_ms
+            last_ts = max(last_ts, ts_ms)
+            if speed > 0:
+                offset_s = max(offset_s, (ts_ms - first_ts) / 1000 / speed)
+        due = started + offset_s if speed > 0 else clock()
+        delay = due - clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        due_at[id(event)] = due
+        await sender.submit(event)
+        count += 1
+    await sender.join()
+    elapsed_s = clock() - started
+
+    span_s = (last_ts - first_ts) / 1000 if first_ts is not None else 0.0
+    target_s = span_s / speed if speed > 0 else 0.0
+    stats = sender.stats()
+    return {
+        "events": count,
+        "sent": stats["sent"],
+        "failed": stats["failed"],
+        "speed": speed if speed > 0 else "max",
+        "recorded_span_s": round(span_s, 3),
+        "target_duration_s": round(target_s, 3),
+        "elapsed_s": round(elapsed_s, 3),
+        "target_rate_eps": round(count / target_s, 1) if target_s > 0 else None,
+        "achieved_rate_eps": round(count / elapsed_s, 1) if elapsed_s > 0 else 0.0,
+        **_lag_percentiles(lags_ms),
+    }
+
+
+def _load_checkpoint(args: argparse.Namespace) -> IngestCheckpoint | None:
+    return IngestCheckpoint.load(Path(args.checkpoint)) if args.checkpoint else None
+
+
+def _source_events(
+    args: argparse.Namespace,
+    source_file: Path,
+    checkpoint: IngestCheckpoint | None,
+    positions: bool = False,
+):
+    return stream_jsonl(
+        source_file,
+        poll_interval_s=max(0.05, args.poll_interval_s),
+        watch=args.watch,
+        checkpoint=checkpoint,
+        from_end=args.from_end,
+        positions=positions,
+    )
+
+
+def _run_sequential(args: argparse.Namespace, source_file: Path) -> None:
+    transport = httpx.HTTPTransport(uds=args.uds) if args.uds else None
+    with httpx.Client(timeout=3.0, transport=transport) as client:
+        for event in _source_events(args, source_file, _load_checkpoint(args)):
+            body, sig = encode_signed_event(event, args.secret)
+            try:
+                resp = client.post(args.url, content=body, headers={"content-type": "application/json", "x-signature": sig})
+            except httpx.HTTPError as exc:
+                _report_post_failure(args.url, exc)
+                time.sleep(POST_FAILURE_BACKOFF_S)
+                continue
+            _report_response(resp)
+
+
+async def _run_pipelined(args: argparse.Namespace, source_file: Path) -> None:
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 4)
+
+    checkpoint = _load_checkpoint(args)
+    committer = CheckpointCommitter(checkpoint) if checkpoint is not None else None
+
+    def read() -> None:
+        try:
+            for item in _source_events(args, source_file, checkpoint, positions=True):
+                asyncio.run_coroutine_threadsafe(events.put(item), loop).result()
+        except Exception as exc:
+            logger.error("file ingest reader failed error=%r", exc)
+            asyncio.run_coroutine_threadsafe(events.put(exc), loop).result()
+
+    # A daemon thread, because stream_jsonl blocks waiting for new lines forever.
+    # It never touches the checkpoint: sends advance it, and this task flushes it.
+    # A reader failure is queued like an event so _pump_events can stop on it.
+    threading.Thread(target=read, name="file-ingest-reader", daemon=True).start()
+    transport = httpx.AsyncHTTPTransport(uds=args.uds) if args.uds else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(timeout=3.0, transport=transport, limits=limits) as client:
+            sender = PipelinedSender(client, args.url, args.secret, concurrency=args.concurrency)
+            await _pump_events(args, events, sender, committer)
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
+
+
+async def _pump_events(
+    args: argparse.Namespace,
+    events: asyncio.Queue,
+    sender: PipelinedSender,
+    committer: CheckpointCommitter | None,
+) -> None:
+    last_report = time.monotonic()
+    while True:
+        try:
+            item = await asyncio.wait_for(events.get(), timeout=args.report_interval_s)
+        except asyncio.TimeoutError:
+            item = None
+            if committer is not None:
+                committer.checkpoint.flush()
+        if isinstance(item, Exception):
+            await sender.join()
+            raise RuntimeError(f"file_ingest_reader_failed: {item!r}") from item
+        if item is not None:
+            event, identity, offset = item
+            on_done = functools.partial(committer.complete, committer.track(identity, offset)) if committer else None
+            await sender.submit(event, on_done=on_done)
+        now = time.monotonic()
+        if now - last_report >= args.report_interval_s:
+            last_report = now
+            stats = sender.stats()
+            logger.info(
+                "file ingest backlog backlog=%s in_flight=%s sessions=%s sent=%s failed=%s",
+                stats["backlog"],
+                stats["in_flight"],
+                stats["sessions"],
+                stats["sent"],
+                stats["failed"],
+            )
+            if stats["backlog"]:
+                print(f"ingest_backlog backlog={stats['backlog']} in_flight={stats['in_flight']}", file=sys.stderr)
+
+
+async def _run_replay(args: argparse.Namespace, source_file: Path) -> dict:
+    statuses: dict[int, int] = {}
+
+    def count_status(resp: httpx.Response) -> None:
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        if resp.status_code >= 400:
+            logger.info("middleware response status=%s", resp.status_code)
+
+    transport = httpx.AsyncHTTPTransport(uds=args.uds) if args.uds else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=3.0, transport=transport, limits=limits) as client:
+        sender = PipelinedSender(client, args.url, args.secret, concurrency=args.concurrency, on_response=count_status)
+        report = await replay_events(iter_jsonl_mmap(source_file), sender, speed=args.speed)
+    report["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+    return report
+
+
+def _speed(value: str) -> float:
+    if value.lower() == "max":
+        return 0.0
+    try:
+        speed = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid speed: {value}") from None
+    if speed < 0:
+        raise argparse.ArgumentTypeError("speed must be >= 0 or 'max'")
+    return speed
 
 
 def main() -> None:
@@ -46,34 +621,68 @@ def main() -> None:
     parser.add_argument("--file", required=True)
     parser.add_argument("--url", default="http://127.0.0.1:8000/event")
     parser.add_argument("--secret", required=True)
-    parser.add_argument("--poll-interval-s", type=float, default=0.2)
+    parser.add_argument("--uds", help="Post through this Unix domain socket (middleware.run --uds)")
+    parser.add_argument("--poll-interval-s", type=float, default=0.2, help="Longest wait between EOF checks")
+    parser.add_argument(
+        "--watch",
+        choices=WATCH_MODES,
+        default="auto",
+        help="How to wait for new lines: inotify (Linux), adaptive polling, or auto",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Requests kept in flight; above 1 sends asynchronously, still in order per session_id",
+    )
+    parser.add_argument("--report-interval-s", type=float, default=5.0, help="How often to log the send backlog")
+    parser.add_argument(
+        "--checkpoint",
+        help="File that stores the read position so a restart resumes instead of replaying the whole file",
+    )
+    parser.add_argument(
+        "--from-end",
+        action="store_true",
+        help="Skip existing lines and only send new ones (a matching checkpoint still wins)",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Send a recorded file once, keeping the original ts_ms spacing, then print a timing summary",
+    )
+    parser.add_argument(
+        "--speed",
+        type=_speed,
+        default=1.0,
+        help="Replay speed factor (2 = twice as fast); 0 or 'max' sends as fast as possible",
+    )
     args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+    args.report_interval_s = max(0.1, args.report_interval_s)
 
     source_file = Path(args.file)
     if not source_file.exists():
         logger.error("file ingest source file not found path=%s", source_file)
         raise SystemExit(f"file_not_found: {source_file}")
 
-    logger.info("file ingest starting source=%s target_url=%s", source_file, args.url)
-    with httpx.Client(timeout=3.0) as client:
-        for event in stream_jsonl(source_file, poll_interval_s=max(0.05, args.poll_interval_s)):
-            body, sig = encode_signed_event(event, args.secret)
-            try:
-                resp = client.post(args.url, content=body, headers={"content-type": "application/json", "x-signature": sig})
-            except httpx.HTTPError as exc:
-                logger.error("middleware post failed target_url=%s error_type=%s", args.url, type(exc).__name__)
-                print(f"middleware_post_failed: {exc}", file=sys.stderr)
-                time.sleep(0.5)
-                continue
-            reason = ""
-            try:
-                payload = resp.json()
-                if isinstance(payload, dict):
-                    reason = str(payload.get("reason", payload.get("detail", "")))
-            except json.JSONDecodeError:
-                reason = ""
-            logger.info("middleware response status=%s reason=%s", resp.status_code, reason)
-            print(resp.status_code, resp.text)
+    logger.info(
+        "file ingest starting source=%s target_url=%s uds=%s concurrency=%s",
+        source_file,
+        args.url,
+        args.uds,
+        args.concurrency,
+    )
+    if args.replay:
+        report = asyncio.run(_run_replay(args, source_file))
+        logger.info("file ingest replay finished %s", " ".join(f"{key}={value}" for key, value in report.items()))
+        print(json.dumps(report, indent=2))
+    elif args.concurrency == 1:
+        _run_sequential(args, source_file)
+    else:
+        try:
+            asyncio.run(_run_pipelined(args, source_file))
+        except RuntimeError as exc:
+            raise SystemExit(str(exc)) from exc
 
 
 if __name__ == "__main__":
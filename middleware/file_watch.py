@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+from pathlib import Path
+
+WATCH_MODES = ("auto", "inotify", "poll")
+MIN_POLL_INTERVAL_S = 0.005
+
+# <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_FILE_EVENTS = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF
+_DIR_EVENTS = _IN_CREATE | _IN_MOVED_TO
+
+
+class PollingWaiter:
+    """Sleeps between EOF checks with exponential backoff.
+
+    Starts at ``min_interval_s`` after new data and doubles on every idle check
+    up to ``max_interval_s``, so a busy file is picked up within milliseconds
+    while an idle one costs at most one wake-up per ``max_interval_s``.
+    """
+
+    mode = "poll"
+
+    def __init__(self, max_interval_s: float = 0.2, min_interval_s: float = MIN_POLL_INTERVAL_S):
+        self.max_interval_s = max(0.0, max_interval_s)
+        self.min_interval_s = min(max(0.0, min_interval_s), self.max_interval_s)
+        self._interval_s = self.min_interval_s
+
+    def wait(self) -> None:
+        time.sleep(self._interval_s)
+        self._interval_s = min(self.max_interval_s, max(self._interval_s * 2, MIN_POLL_INTERVAL_S))
+
+    def reset(self) -> None:
+        self._interval_s = self.min_interval_s
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWaiter:
+    """Blocks until the kernel reports a change to the watched file.
+
+    The parent directory is watched for new entries too, so a replacement file
+    created by log rotation wakes the reader straight away. ``max_wait_s``
+    bounds each wait so a missed notification (for example on a network
+    filesystem) costs no more than the old fixed poll did.
+    """
+
+    mode = "inotify"
+
+    def __init__(self, path: Path, max_wait_s: float = 0.2):
+        libc = _libc()
+        if libc is None:
+            raise OSError("inotify_unavailable")
+        self.max_wait_s = max(0.0, max_wait_s)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for watched, events in ((path, _FILE_EVENTS), (path.parent, _DIR_EVENTS)):
+            if libc.inotify_add_watch(self._fd, os.fsencode(watched), events) < 0:
+                errno = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(errno, f"inotify_add_watch failed: {watched}")
+
+    def wait(self) -> None:
+        readable, _, _ = select.select([self._fd], [], [], self.max_wait_s)
+        if readable:
+            self._drain()
+
+    def _drain(self) -> None:
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+_LIBC: ctypes.CDLL | None = None
+_LIBC_LOADED = False
+
+
+def _libc() -> ctypes.CDLL | None:
+    global _LIBC, _LIBC_LOADED
+    if not _LIBC_LOADED:
+        _LIBC_LOADED = True
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                _LIBC = libc
+            except (OSError, AttributeError):
+                _LIBC = None
+    return _LIBC
+
+
+def inotify_available() -> bool:
+    return _libc() is not None
+
+
+def build_waiter(path: Path, mode: str = "auto", poll_interval_s: float = 0.2) -> PollingWaiter | InotifyWaiter:
+    """Pick how to wait for new data at EOF: inotify on Linux, polling elsewhere."""
+    if mode not in WATCH_MODES:
+        raise ValueError(f"invalid_watch_mode: {mode}")
+    if mode != "poll":
+        try:
+            return InotifyWaiter(path, max_wait_s=poll_interval_s)
+        except OSError:
+            if mode == "inotify":
+                raise
+    return PollingWaiter(max_interval_s=poll_interval_s)
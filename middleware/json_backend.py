@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch one type.
+    loads = orjson.loads
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+else:
+    loads = json.loads
+
+    def dumps(value: Any) -> bytes:
+        # Same output settings as Starlette's JSONResponse.
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fastest available backend.
+
+    Handlers return it directly, which also skips FastAPI's jsonable_encoder
+    pass over plain dict results.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
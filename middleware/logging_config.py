@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+import copy
+import json
 import logging
 import os
+import queue
 import re
-from logging.handlers import RotatingFileHandler
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Iterator
 
 
 LOG_LEVEL_ENV = "PISHOCK_LOG_LEVEL"
+LOG_FORMAT_ENV = "PISHOCK_LOG_FORMAT"
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSON = "json"
+LOG_QUEUE_ENV = "PISHOCK_LOG_QUEUE"
+LOG_QUEUE_SIZE_ENV = "PISHOCK_LOG_QUEUE_SIZE"
+LOG_QUEUE_OVERFLOW_ENV = "PISHOCK_LOG_QUEUE_OVERFLOW"
+DEFAULT_LOG_QUEUE_SIZE = 10_000
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
 DEFAULT_LOG_PATH = Path(__file__).resolve().parent.parent / "logs" / "middleware.log"
 SENSITIVE_KEYS = (
     "api_key",
@@ -21,6 +36,23 @@ SENSITIVE_KEYS = (
 )
 
 
+CORRELATION_HEADER = "X-Correlation-Id"
+_correlation_id: ContextVar[str | None] = ContextVar("pishock_correlation_id", default=None)
+
+
+def current_correlation_id() -> str | None:
+    return _correlation_id.get()
+
+
+def bind_correlation_id(correlation_id: str | None) -> Token:
+    """Tag every record logged from this context (and tasks it starts) with an id."""
+    return _correlation_id.set(correlation_id)
+
+
+def reset_correlation_id(token: Token) -> None:
+    _correlation_id.reset(token)
+
+
 def log_path_from_env() -> Path:
     return Path(os.environ.get("PISHOCK_LOG_FILE", DEFAULT_LOG_PATH)).expanduser()
 
@@ -30,36 +62,300 @@ def _level_from_env(default: str = "INFO") -> int:
     return getattr(logging, raw_level, logging.INFO)
 
 
+def _log_format_from_env() -> str:
+    log_format = os.environ.get(LOG_FORMAT_ENV, LOG_FORMAT_TEXT).strip().lower()
+    return log_format if log_format in {LOG_FORMAT_TEXT, LOG_FORMAT_JSON} else LOG_FORMAT_TEXT
+
+
+def _queue_enabled_from_env() -> bool:
+    return os.environ.get(LOG_QUEUE_ENV, "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _queue_size_from_env() -> int:
+    try:
+        return int(os.environ.get(LOG_QUEUE_SIZE_ENV, DEFAULT_LOG_QUEUE_SIZE))
+    except ValueError:
+        return DEFAULT_LOG_QUEUE_SIZE
+
+
+def _overflow_from_env() -> str:
+    overflow = os.environ.get(LOG_QUEUE_OVERFLOW_ENV, OVERFLOW_DROP_OLDEST).strip().lower()
+    return overflow if overflow in OVERFLOW_POLICIES else OVERFLOW_DROP_OLDEST
+
+
+_KEY_ALTERNATION = "|".join(re.escape(key) for key in SENSITIVE_KEYS)
+# One alternation covering every sensitive key, tried in priority order at each
+# position: quoted values, then the free-text authorization/x-signature forms,
+# then bare key=value pairs.
+_REDACTION_PATTERN = re.compile(
+    rf"(?P<quoted>['\"]?(?:{_KEY_ALTERNATION})['\"]?\s*[:=]\s*['\"])[^'\"]+(?P<quoted_end>['\"])"
+    r"|(?P<authorization>\bauthorization\b\s*[:=]\s*)[^,\r\n]+"
+    r"|(?P<signature>\bx-signature\b\s*[:=]\s*)[^,\r\n\s]+"
+    rf"|(?P<bare>\b(?:{_KEY_ALTERNATION})\b\s*[:=]\s*)(?P<bare_open>['\"]?)[^,'\"\s}}\]\[]+(?P<bare_close>['\"]?)",
+    re.IGNORECASE,
+)
+# Keys that are not substrings of another key; used by the cheap precheck.
+_CANDIDATE_KEYS = tuple(
+    key for key in SENSITIVE_KEYS if not any(other != key and other in key for other in SENSITIVE_KEYS)
+)
+
+
+def _redaction_replacement(match: re.Match[str]) -> str:
+    if match.group("quoted") is not None:
+        return f"{match.group('quoted')}[REDACTED]{match.group('quoted_end')}"
+    if match.group("authorization") is not None:
+        return f"{match.group('authorization')}[REDACTED]"
+    if match.group("signature") is not None:
+        return f"{match.group('signature')}[REDACTED]"
+    return f"{match.group('bare')}{match.group('bare_open')}[REDACTED]{match.group('bare_close')}"
+
+
 def redact_text(value: object) -> str:
     text = str(value)
-    for key in SENSITIVE_KEYS:
-        text = re.sub(
-            rf"(?i)((?:['\"]?){re.escape(key)}(?:['\"]?)\s*[:=]\s*['\"])([^'\"]+)(['\"])",
-            rf"\1[REDACTED]\3",
-            text,
-        )
-        text = re.sub(
-            rf"(?i)(\b{re.escape(key)}\b\s*[:=]\s*)(['\"]?)([^,'\"\s}}\]\[]+)(['\"]?)",
-            rf"\1\2[REDACTED]\4",
-            text,
-        )
-    text = re.sub(r"(?i)(\bauthorization\b\s*[:=]\s*)([^,\r\n]+)", r"\1[REDACTED]", text)
-    text = re.sub(r"(?i)(\bx-signature\b\s*[:=]\s*)([^,\r\n\s]+)", r"\1[REDACTED]", text)
-    return text
+    lowered = text.lower()
+    if not any(key in lowered for key in _CANDIDATE_KEYS):
+        return text
+    return _REDACTION_PATTERN.sub(_redaction_replacement, text)
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class StructuredMessage:
+    """Log message with typed fields, rendered only when a handler emits it.
+
+    Text handlers render ``message key=value ...``; the JSON formatter emits the
+    fields with their original types.
+    """
+
+    __slots__ = ("message", "fields")
+
+    def __init__(self, message: str, fields: dict[str, Any]):
+        self.message = message
+        self.fields = fields
+
+    def __str__(self) -> str:
+        if not self.fields:
+            return self.message
+        rendered = " ".join(f"{key}={_render_value(value)}" for key, value in self.fields.items())
+        return f"{self.message} {rendered}"
+
+    def redacted(self) -> StructuredMessage:
+        fields: dict[str, Any] = {}
+        for key, value in self.fields.items():
+            if key.lower() in SENSITIVE_KEYS:
+                fields[key] = "[REDACTED]"
+            elif isinstance(value, str):
+                fields[key] = redact_text(value)
+            else:
+                fields[key] = value
+        return StructuredMessage(redact_text(self.message), fields)
+
+
+def log_fields(message: str, **fields: Any) -> StructuredMessage:
+    return StructuredMessage(message, fields)
 
 
 class RedactionFilter(logging.Filter):
+    """Redact a record once, however many handlers share this filter."""
+
     def filter(self, record: logging.LogRecord) -> bool:
-        record.msg = redact_text(record.getMessage())
+        if getattr(record, "_pishock_redacted", False):
+            return True
+        if isinstance(record.msg, StructuredMessage) and not record.args:
+            record.msg = record.msg.redacted()
+        else:
+            record.msg = redact_text(record.getMessage())
         record.args = ()
+        record._pishock_redacted = True
+        return True
+
+
+class CorrelationFilter(logging.Filter):
+    """Append the caller's correlation id to a record, once.
+
+    Runs on the handler that first sees the record, which is always on the
+    logging thread (the queue handler in queue mode), so the context variable
+    still holds the request's id.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "_pishock_correlated", False):
+            return True
+        record._pishock_correlated = True
+        correlation_id = _correlation_id.get()
+        record.correlation_id = correlation_id
+        if correlation_id is None:
+            return True
+        if isinstance(record.msg, StructuredMessage) and not record.args:
+            if "correlation_id" not in record.msg.fields:
+                record.msg = StructuredMessage(record.msg.message, {**record.msg.fields, "correlation_id": correlation_id})
+        else:
+            record.msg = f"{record.getMessage()} correlation_id={correlation_id}"
+            record.args = ()
         return True
 
 
+_JSON_RESERVED_KEYS = frozenset({"ts", "time", "level", "logger", "message", "exc"})
+
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "ts": record.created,
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, StructuredMessage) and not record.args:
+            payload["message"] = record.msg.message
+            for key, value in record.msg.fields.items():
+                payload[f"field_{key}" if key in _JSON_RESERVED_KEYS else key] = value
+        else:
+            payload["message"] = record.getMessage()
+        if getattr(record, "correlation_id", None) is not None:
+            payload.setdefault("correlation_id", record.correlation_id)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+def _rotation_index(path: Path) -> int:
+    suffix = path.suffix.lstrip(".")
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def read_json_logs(log_path: Path | str | None = None) -> Iterator[dict[str, Any]]:
+    """Yield JSON log records oldest first across the rotated set of log files.
+
+    Lines that are not JSON objects (for example text-mode output written before
+    switching formats) are skipped.
+    """
+    base = Path(log_path).expanduser() if log_path is not None else log_path_from_env()
+    rotated = sorted(
+        (path for path in base.parent.glob(f"{base.name}.*") if _rotation_index(path) > 0),
+        key=_rotation_index,
+        reverse=True,
+    )
+    for path in (*rotated, base):
+        if not path.exists():
+            continue
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.startswith("{"):
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = OVERFLOW_DROP_OLDEST):
+        super().__init__(log_queue)
+        self.overflow = overflow if overflow in OVERFLOW_POLICIES else OVERFLOW_DROP_OLDEST
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so keep exc_info and structured
+        # messages for the target formatters; only snapshot %-style arguments.
+        record = copy.copy(record)
+        if not isinstance(record.msg, StructuredMessage) or record.args:
+            record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Handler.handle serializes emit() under self.lock, so the counter is safe.
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            self.dropped += 1
+        if self.overflow == OVERFLOW_DROP_NEWEST:
+            return
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class _DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Block instead of raising queue.Full so stop() always drains pending records.
+        self.queue.put(self._sentinel)
+
+
+_queue_listener: QueueListener | None = None
+_queue_handler: BoundedQueueHandler | None = None
+
+
+def shutdown_logging() -> None:
+    """Drain the log queue and fall back to writing records synchronously.
+
+    Called on app shutdown so nothing queued is lost and late shutdown records
+    still reach the console and log file.
+    """
+    global _queue_listener
+    listener = _queue_listener
+    _queue_listener = None
+    if listener is None:
+        return
+    listener.stop()
+    logger = logging.getLogger("middleware")
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+    for handler in listener.handlers:
+        handler.flush()
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
+
+
+def logging_queue_stats() -> dict:
+    handler = _queue_handler
+    if handler is None:
+        return {"enabled": False, "depth": 0, "capacity": 0, "overflow": None, "dropped": 0}
+    return {
+        "enabled": _queue_listener is not None,
+        "depth": handler.queue.qsize(),
+        "capacity": handler.queue.maxsize,
+        "overflow": handler.overflow,
+        "dropped": handler.dropped,
+    }
+
+
 def configure_logging(
     log_path: Path | str | None = None,
     level: int | str | None = None,
     force: bool = False,
+    use_queue: bool | None = None,
+    queue_size: int | None = None,
+    overflow: str | None = None,
+    log_format: str | None = None,
 ) -> Path:
+    """Attach redacting console and rotating file handlers to the middleware logger.
+
+    With ``use_queue`` (or PISHOCK_LOG_QUEUE=1) records go through a bounded
+    in-memory queue and a background listener thread does the console and disk
+    I/O, so callers on the event loop never wait on either. ``log_format="json"``
+    (or PISHOCK_LOG_FORMAT=json) writes one JSON object per record to the log
+    file; the console stays human-readable.
+    """
+    global _queue_handler, _queue_listener
+
     resolved_path = Path(log_path).expanduser() if log_path is not None else log_path_from_env()
     resolved_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -72,6 +368,8 @@ def configure_logging(
 
     logger = logging.getLogger("middleware")
     if force:
+        shutdown_logging()
+        _queue_handler = None
         for handler in list(logger.handlers):
             logger.removeHandler(handler)
             handler.close()
@@ -84,10 +382,12 @@ def configure_logging(
 
     formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
     redaction_filter = RedactionFilter()
+    correlation_filter = CorrelationFilter()
 
     console_handler = logging.StreamHandler()
     console_handler.setLevel(resolved_level)
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(correlation_filter)
     console_handler.addFilter(redaction_filter)
     console_handler._pishock_handler = True
 
@@ -98,11 +398,40 @@ def configure_logging(
         encoding="utf-8",
     )
     file_handler.setLevel(resolved_level)
-    file_handler.setFormatter(formatter)
+    resolved_format = (log_format or _log_format_from_env()).strip().lower()
+    file_handler.setFormatter(JsonFormatter() if resolved_format == LOG_FORMAT_JSON else formatter)
+    file_handler.addFilter(correlation_filter)
     file_handler.addFilter(redaction_filter)
     file_handler._pishock_handler = True
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.info("logging initialized log_file=%s level=%s", resolved_path, logging.getLevelName(resolved_level))
+    if use_queue is None:
+        use_queue = _queue_enabled_from_env()
+    if use_queue:
+        capacity = max(1, queue_size if queue_size is not None else _queue_size_from_env())
+        queue_handler = BoundedQueueHandler(
+            queue.Queue(maxsize=capacity),
+            overflow=(overflow or _overflow_from_env()).strip().lower(),
+        )
+        queue_handler.setLevel(resolved_level)
+        # The listener thread cannot see the caller's context, so tag records before they are queued.
+        queue_handler.addFilter(correlation_filter)
+        queue_handler._pishock_handler = True
+        # Redaction and formatting stay on the target handlers and run on the listener thread.
+        listener = _DrainingQueueListener(queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        _queue_handler = queue_handler
+        _queue_listener = listener
+        logger.addHandler(queue_handler)
+    else:
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+    logger.info(
+        log_fields(
+            "logging initialized",
+            log_file=str(resolved_path),
+            level=logging.getLevelName(resolved_level),
+            queue=bool(use_queue),
+            format=resolved_format,
+        )
+    )
     return resolved_path
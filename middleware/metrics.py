@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Iterable, Mapping
+
+from middleware.logging_config import CORRELATION_HEADER
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 10 us .. 5 s; policy and verify land in the low buckets, PiShock calls in the high ones.
+STAGE_BUCKETS_S = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+STAGES = ("body_read", "verify", "parse", "policy", "dispatch_primary", "dispatch_bonus")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: dict[tuple[str, ...], int] = {}
+
+    def inc(self, *label_values: str, amount: int = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+
+class _Buckets:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Fixed-bucket histogram with one series per value of a single label.
+
+    ``observe`` does one bisect and three additions; buckets are kept
+    non-cumulative and only summed up when rendered.
+    """
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple[float, ...] = STAGE_BUCKETS_S):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self.series: dict[str, _Buckets] = {}
+
+    def observe(self, label_value: str, value: float) -> None:
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = _Buckets(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.total += value
+        series.count += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_value, series in sorted(self.series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label},le="{_number(bound)}"}} {cumulative}'
+            yield f"{self.name}_sum{{{label}}} {_number(series.total)}"
+            yield f"{self.name}_count{{{label}}} {series.count}"
+
+
+class EventMetrics:
+    """Counters and stage histograms for the event path.
+
+    There are no locks: every recording call runs on the event loop thread
+    (the /event, /events and /ws handlers and the dispatch tasks), and /metrics
+    renders there too, so a scrape never races an update.
+    """
+
+    def __init__(self):
+        self.events = Counter(
+            "pishock_events_total",
+            "Events handled, by event type and decision reason.",
+            ("event_type", "accepted", "reason"),
+        )
+        self.dispatch_errors = Counter(
+            "pishock_dispatch_errors_total",
+            "PiShock dispatches that failed after the policy allowed them, by error code.",
+            ("error_code",),
+        )
+        self.stages = Histogram(
+            "pishock_event_stage_seconds",
+            "Time spent in each stage of event handling.",
+            "stage",
+        )
+
+    def record_event(self, event_type: str, accepted: bool, reason: str) -> None:
+        self.events.inc(event_type, "true" if accepted else "false", reason)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stages.observe(stage, seconds)
+
+    def render(self, gauges: Iterable[tuple[str, str, tuple[str, ...], list[tuple[tuple[str, ...], float]]]] = ()) -> str:
+        """Return the Prometheus text exposition.
+
+        ``gauges`` are sampled by the caller at scrape time as
+        ``(name, help, label_names, [(label_values, value), ...])``.
+        """
+        lines: list[str] = []
+        lines.extend(self.events.render())
+        lines.extend(self.dispatch_errors.render())
+        lines.extend(self.stages.render())
+        for name, help_text, label_names, samples in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for label_values, value in samples:
+                lines.append(f"{name}{_labels(label_names, label_values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+SERVER_TIMING_HEADER = "Server-Timing"
+SERVER_TIMING_STAGES = ("verify", "parse", "policy", "dispatch")
+
+
+def format_server_timing(stage_ms: dict[str, float], total_ms: float | None = None) -> str:
+    """Render ``{"verify_ms": 0.01, ...}`` as a Server-Timing header value."""
+    parts = [f"{stage};dur={stage_ms[f'{stage}_ms']}" for stage in SERVER_TIMING_STAGES if f"{stage}_ms" in stage_ms]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms}")
+    return ", ".join(parts)
+
+
+def parse_server_timing(value: str) -> dict[str, float]:
+    """Return ``{metric: dur_ms}`` for each entry of a Server-Timing header that has a duration."""
+    timings: dict[str, float] = {}
+    for entry in value.split(","):
+        name, *params = (part.strip() for part in entry.split(";"))
+        for param in params:
+            key, _, duration = param.partition("=")
+            if name and key.strip() == "dur":
+                try:
+                    timings[name] = float(duration)
+                except ValueError:
+                    pass
+    return timings
+
+
+def server_timing_summary(headers: Mapping[str, str]) -> str:
+    """One-line ``verify=0.012ms ... correlation_id=...`` summary of a middleware response.
+
+    Empty when the response carries neither header (for example from an older
+    middleware).
+    """
+    parts = [f"{name}={duration}ms" for name, duration in parse_server_timing(headers.get(SERVER_TIMING_HEADER, "")).items()]
+    correlation_id = headers.get(CORRELATION_HEADER)
+    if correlation_id:
+        parts.append(f"correlation_id={correlation_id}")
+    return " ".join(parts)
@@ -1,9 +1,42 @@
-from pydantic import BaseModel, Field
+from typing import Any
+
+from pydantic import BaseModel, Field, field_validator
+
+MAX_ID_LENGTH = 128
+MAX_CONTEXT_ITEMS = 64
+MAX_CONTEXT_DEPTH = 3
+MAX_CONTEXT_STRING_LENGTH = 256
+
+
+def _check_context(value: Any, depth: int, budget: list[int]) -> None:
+    if isinstance(value, str):
+        if len(value) > MAX_CONTEXT_STRING_LENGTH:
+            raise ValueError("context_string_too_long")
+        return
+    if not isinstance(value, (dict, list)):
+        return
+    if depth > MAX_CONTEXT_DEPTH:
+        raise ValueError("context_too_deep")
+    items = value.items() if isinstance(value, dict) else enumerate(value)
+    for key, item in items:
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise ValueError("context_too_large")
+        if isinstance(key, str) and len(key) > MAX_CONTEXT_STRING_LENGTH:
+            raise ValueError("context_string_too_long")
+        _check_context(item, depth + 1, budget)
 
 
 class GameEvent(BaseModel):
-    event_type: str
+    event_type: str = Field(max_length=MAX_ID_LENGTH)
     ts_ms: int
-    session_id: str
+    session_id: str = Field(max_length=MAX_ID_LENGTH)
     armed: bool = False
     context: dict = Field(default_factory=dict)
+
+    @field_validator("context")
+    @classmethod
+    def _limit_context(cls, value: dict) -> dict:
+        # Bounded so a single event cannot make policy or the logs walk a huge structure.
+        _check_context(value, 1, [MAX_CONTEXT_ITEMS])
+        return value
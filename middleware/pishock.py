@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-import asyncio
 from dataclasses import dataclass
+import functools
 import logging
-from typing import Any
+import threading
+from typing import Any, Callable
 
-from middleware.logging_config import redact_text
+from middleware.dispatch import DEFAULT_DISPATCH_QUEUE_DEPTH, DEFAULT_DISPATCH_WORKERS, DispatchExecutor
+from middleware.logging_config import log_fields, redact_text
 from middleware.runtime_mode import RuntimeMode, log_runtime_mode
 
 
@@ -57,10 +59,13 @@ class DryRunPiShockClient:
     async def operate(self, op: int, intensity: int, duration_s: int) -> tuple[int, str]:
         op_name = OP_NAMES.get(op, f"unknown:{op}")
         logger.info(
-            "dry-run operation op=%s intensity=%s duration_s=%s no_real_api=true",
-            op_name,
-            intensity,
-            duration_s,
+            log_fields(
+                "dry-run operation",
+                op=op_name,
+                intensity=intensity,
+                duration_s=duration_s,
+                no_real_api=True,
+            )
         )
         return 200, f"dry_run op={op_name} intensity={intensity} duration_s={duration_s}"
 
@@ -76,11 +81,15 @@ class BeepOnlyPiShockClient:
     async def operate(self, op: int, intensity: int, duration_s: int) -> tuple[int, str]:
         if op != OP_BEEP:
             logger.warning(
-                "runtime mode block mode=beep op=%s reason=runtime_mode_beep_blocks_non_beep_operation",
-                OP_NAMES.get(op, f"unknown:{op}"),
+                log_fields(
+                    "runtime mode block",
+                    mode="beep",
+                    op=OP_NAMES.get(op, f"unknown:{op}"),
+                    reason="runtime_mode_beep_blocks_non_beep_operation",
+                )
             )
             raise RuntimeModeOperationBlocked("runtime_mode_beep_blocks_non_beep_operation")
-        logger.info("beep mode operation allowed op=beep intensity=%s duration_s=%s", intensity, duration_s)
+        logger.info(log_fields("beep mode operation allowed", op="beep", intensity=intensity, duration_s=duration_s))
         return await self.real_client.operate(op, intensity, duration_s)
 
 
@@ -129,22 +138,51 @@ def build_pishock_client(config: dict[str, Any], mode: RuntimeMode | str | None
     log_runtime_mode(runtime_mode)
 
     if runtime_status.dry_run_active:
-        logger.info("pishock client mode=dry_run runtime_mode=%s", runtime_mode.value)
+        logger.info(log_fields("pishock client", mode="dry_run", runtime_mode=runtime_mode.value))
         client = DryRunPiShockClient()
     else:
         client = PiShockClient(config)
 
     if runtime_mode == RuntimeMode.BEEP:
-        logger.info("pishock client mode=beep_only real_client_enabled=%s", runtime_status.real_client_enabled)
+        logger.info(
+            log_fields("pishock client", mode="beep_only", real_client_enabled=runtime_status.real_client_enabled)
+        )
         return BeepOnlyPiShockClient(client)
     if runtime_status.dry_run_active:
         return client
-    logger.info("pishock client mode=live")
+    logger.info(log_fields("pishock client", mode="live"))
     return client
 
 
+def _call_duration(method: Callable[..., Any], duration_s: int, intensity: int) -> Any:
+    return method(duration=duration_s)
+
+
+def _call_duration_intensity(method: Callable[..., Any], duration_s: int, intensity: int) -> Any:
+    return method(duration=duration_s, intensity=intensity)
+
+
+def _call_positional(method: Callable[..., Any], duration_s: int, intensity: int) -> Any:
+    return method(duration_s, intensity)
+
+
+# Call shapes tried, in order, across python-pishock versions.
+_METHOD_CALL_SHAPES: dict[str, tuple[Callable[[Callable[..., Any], int, int], Any], ...]] = {
+    "beep": (_call_duration, _call_duration_intensity),
+    "shock": (_call_duration_intensity, _call_positional),
+    "vibrate": (_call_duration_intensity, _call_positional),
+}
+
+
 class PiShockClient:
-    """Thin wrapper around python-pishock to keep middleware logic simple."""
+    """Thin wrapper around python-pishock to keep middleware logic simple.
+
+    The shocker instance, the constructor variant that built it, and the call
+    shape of each operation method are resolved once and reused. A failed
+    operation drops the cached shocker so the next call rebuilds it. Blocking
+    calls run on a dedicated bounded DispatchExecutor sized by
+    ``dispatch_workers`` and ``dispatch_queue_depth``.
+    """
 
     client_mode = "live"
 
@@ -157,10 +195,59 @@ class PiShockClient:
         if not self.username or not self.api_key or not self.share_code:
             raise RuntimeError("pishock_credentials_missing")
 
+        self._shocker_lock = threading.Lock()
+        self._shocker: Any | None = None
+        self._shocker_factory: Callable[[], Any] | None = None
+        self._call_shapes: dict[str, Callable[[Callable[..., Any], int, int], Any]] = {}
+        self.cache_hits = 0
+        self.shocker_builds = 0
+        self.invalidations = 0
+        self._dispatch = DispatchExecutor(
+            workers=int(config.get("dispatch_workers", DEFAULT_DISPATCH_WORKERS)),
+            queue_depth=int(config.get("dispatch_queue_depth", DEFAULT_DISPATCH_QUEUE_DEPTH)),
+        )
+
     async def operate(self, op: int, intensity: int, duration_s: int) -> tuple[int, str]:
-        return await asyncio.to_thread(self._operate_sync, op, intensity, duration_s)
+        return await self._dispatch.run(self._operate_sync, op, intensity, duration_s)
+
+    def dispatch_stats(self) -> dict[str, Any]:
+        return self._dispatch.stats()
+
+    def close(self) -> None:
+        self._dispatch.shutdown()
+
+    def invalidate(self) -> None:
+        """Drop the cached shocker and call shapes; the next operation rebuilds them."""
+        with self._shocker_lock:
+            if self._shocker is not None:
+                self.invalidations += 1
+            self._shocker = None
+            self._call_shapes.clear()
+
+    def cache_stats(self) -> dict[str, int]:
+        return {
+            "cache_hits": self.cache_hits,
+            "shocker_builds": self.shocker_builds,
+            "rebuilds": max(0, self.shocker_builds - 1),
+            "invalidations": self.invalidations,
+        }
+
+    def _cached_shocker(self) -> Any:
+        with self._shocker_lock:
+            if self._shocker is None:
+                self._shocker = self._build_shocker()
+                self.shocker_builds += 1
+            else:
+                self.cache_hits += 1
+            return self._shocker
 
     def _build_shocker(self):
+        if self._shocker_factory is not None:
+            try:
+                return self._shocker_factory()
+            except TypeError:
+                self._shocker_factory = None
+
         try:
             from pishock import PiShockAPI
         except Exception:
@@ -180,9 +267,11 @@ class PiShockClient:
                         ((), {"code": self.share_code, "name": self.name}),
                     ):
                         try:
-                            return api.shocker(*args, **kwargs)
+                            shocker = api.shocker(*args, **kwargs)
                         except TypeError:
                             continue
+                        self._shocker_factory = _api_shocker_factory(PiShockAPI, api_args, api_kwargs, args, kwargs)
+                        return shocker
                 except TypeError:
                     continue
 
@@ -199,55 +288,75 @@ class PiShockClient:
             {"username": self.username, "api_key": self.api_key, "code": self.share_code},
         ):
             try:
-                return Shocker(**kwargs)
+                shocker = Shocker(**kwargs)
             except TypeError:
                 continue
+            self._shocker_factory = functools.partial(Shocker, **kwargs)
+            return shocker
 
         raise RuntimeError("python_pishock_shocker_init_failed")
 
     @staticmethod
-    def _call_shocker_method(shocker: Any, method_name: str, duration_s: int, intensity: int) -> Any:
+    def _call_shocker_method(shocker: Any, method_name: str, duration_s: int, intensity: int) -> tuple[Any, Callable]:
+        """Probe the call shapes for ``method_name`` and return the result and the shape that worked."""
         method = getattr(shocker, method_name)
-
-        if method_name == "beep":
-            try:
-                return method(duration=duration_s)
-            except TypeError:
-                return method(duration=duration_s, intensity=intensity)
-
-        for args, kwargs in (
-            ((), {"duration": duration_s, "intensity": intensity}),
-            ((duration_s, intensity), {}),
-        ):
+        shapes = _METHOD_CALL_SHAPES[method_name]
+        for shape in shapes[:-1]:
             try:
-                return method(*args, **kwargs)
+                return shape(method, duration_s, intensity), shape
             except TypeError:
                 continue
 
-        raise RuntimeError(f"python_pishock_{method_name}_call_failed")
+        if method_name == "beep":
+            # Older releases need intensity on beep; surface their TypeError as-is.
+            return shapes[-1](method, duration_s, intensity), shapes[-1]
+        try:
+            return shapes[-1](method, duration_s, intensity), shapes[-1]
+        except TypeError:
+            raise RuntimeError(f"python_pishock_{method_name}_call_failed") from None
+
+    def _call_cached(self, method_name: str, duration_s: int, intensity: int) -> Any:
+        shocker = self._cached_shocker()
+        shape = self._call_shapes.get(method_name)
+        if shape is not None:
+            return shape(getattr(shocker, method_name), duration_s, intensity)
+        result, shape = self._call_shocker_method(shocker, method_name, duration_s, intensity)
+        self._call_shapes[method_name] = shape
+        return result
 
     def _operate_sync(self, op: int, intensity: int, duration_s: int) -> tuple[int, str]:
+        method_name = OP_NAMES.get(op)
         try:
-            shocker = self._build_shocker()
-
-            if op == 0:
-                logger.info("pishock operation dispatch op=shock intensity=%s duration_s=%s", intensity, duration_s)
-                result = self._call_shocker_method(shocker, "shock", duration_s, intensity)
-            elif op == 1:
-                logger.info("pishock operation dispatch op=vibrate intensity=%s duration_s=%s", intensity, duration_s)
-                result = self._call_shocker_method(shocker, "vibrate", duration_s, intensity)
-            elif op == 2:
-                logger.info("pishock operation dispatch op=beep intensity=%s duration_s=%s", intensity, duration_s)
-                result = self._call_shocker_method(shocker, "beep", duration_s, intensity)
-            else:
+            if method_name is None:
                 raise RuntimeError("invalid_operation")
+            logger.info(
+                log_fields("pishock operation dispatch", op=method_name, intensity=intensity, duration_s=duration_s)
+            )
+            result = self._call_cached(method_name, duration_s, intensity)
         except Exception as exc:
+            if method_name is not None:
+                self.invalidate()
             logger.error(
-                "pishock operation failed op=%s error_type=%s error_detail=%s",
-                OP_NAMES.get(op, f"unknown:{op}"),
-                type(exc).__name__,
-                redact_text(str(exc)),
+                log_fields(
+                    "pishock operation failed",
+                    op=OP_NAMES.get(op, f"unknown:{op}"),
+                    error_type=type(exc).__name__,
+                    error_detail=redact_text(str(exc)),
+                )
             )
             raise
 
         return 200, str(result)
+
+
+def _api_shocker_factory(
+    api_class: Any,
+    api_args: tuple,
+    api_kwargs: dict[str, Any],
+    args: tuple,
+    kwargs: dict[str, Any],
+) -> Callable[[], Any]:
+    def factory() -> Any:
+        return api_class(*api_args, **api_kwargs).shocker(*args, **kwargs)
+
+    return factory
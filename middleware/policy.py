@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import math
-from dataclasses import dataclass
+import sys
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from time import monotonic
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
 
 from middleware.config import AppConfig, EnemyTier, EventMapping
+from middleware.ttl_store import CooldownStore
 
 
 MODE_TO_OP = {"shock": 0, "vibrate": 1, "beep": 2, "hard": 0}
 MAX_BONUS_PULSES = 6
+HARD_MODE_TABLE_MAX_ROWS = 4096
 
 
 @dataclass
@@ -24,43 +30,272 @@ class Decision:
     pulse_spacing_ms: int = 120
 
 
-@dataclass
+class TierResolver:
+    """Resolves the enemy-tier bonus for a count with one bisect.
+
+    Tier membership only changes at each ``min_enemies`` and ``max_enemies + 1``,
+    so the best bonus is precomputed for every interval between those bounds.
+    """
+
+    __slots__ = ("bounds", "bonuses")
+
+    def __init__(self, tiers: list[EnemyTier]):
+        bounds = {0}
+        for tier in tiers:
+            bounds.add(max(0, tier.min_enemies))
+            if tier.max_enemies is not None:
+                bounds.add(max(0, tier.max_enemies + 1))
+        self.bounds = tuple(sorted(bounds))
+        self.bonuses = tuple(self._scan(enemy_count, tiers) for enemy_count in self.bounds)
+
+    @staticmethod
+    def _scan(enemy_count: int, tiers: list[EnemyTier]) -> int:
+        bonus = 0
+        for tier in tiers:
+            if enemy_count < tier.min_enemies:
+                continue
+            if tier.max_enemies is not None and enemy_count > tier.max_enemies:
+                continue
+            bonus = max(bonus, tier.extra_pulses)
+        return bonus
+
+    def __call__(self, enemy_count: int) -> int:
+        return self.bonuses[bisect_right(self.bounds, enemy_count) - 1]
+
+
+@dataclass(frozen=True, slots=True)
+class HardModeRow:
+    cooldown_ms: int
+    multiplier: float
+    duration_s: int
+    bonus_pulses: int
+    combo_eligible: bool
+
+
+@dataclass(frozen=True, slots=True)
+class HardModeTable:
+    """Hard-mode scaling for one mapping, indexed by enemy count.
+
+    Every column except ``multiplier`` stops changing past the last row, so
+    larger counts reuse it and only recompute the multiplier. Configs that never
+    settle (negative tick reduction) keep ``saturated`` false and compute rows
+    past the end directly.
+    """
+
+    rows: tuple[HardModeRow, ...]
+    saturated: bool
+    bonus_intensity_ratio: float
+    pulse_spacing_ms: int
+    build_row: Callable[[int], HardModeRow]
+    multiplier: Callable[[int], float]
+
+    def row(self, enemy_count: int) -> HardModeRow:
+        if enemy_count < len(self.rows):
+            return self.rows[enemy_count]
+        if not self.saturated:
+            return self.build_row(enemy_count)
+        last = self.rows[-1]
+        return HardModeRow(
+            cooldown_ms=last.cooldown_ms,
+            multiplier=self.multiplier(enemy_count),
+            duration_s=last.duration_s,
+            bonus_pulses=last.bonus_pulses,
+            combo_eligible=last.combo_eligible,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledMapping:
+    """Everything about an event mapping that depends only on config."""
+
+    event_type: str
+    mode: str
+    op: int | None
+    intensity: int
+    duration_ms: int
+    duration_s: int
+    cooldown_ms: int
+    requires_shock: bool
+    block_reason: str | None = None
+    hard_mode: HardModeTable | None = None
+
+
+def _duration_seconds(duration_ms: int, max_duration_ms: int) -> int:
+    max_seconds = max(1, max_duration_ms // 1000)
+    return max(1, min(duration_ms // 1000, max_seconds))
+
+
+def _ceil_div(numerator: int, denominator: int) -> int:
+    return -(-max(0, numerator) // denominator)
+
+
+def compile_hard_mode_table(cooldown_ms: int, duration_ms: int, config: AppConfig) -> HardModeTable:
+    """Precompute hard-mode cooldown, multiplier, duration and bonus by enemy count."""
+    enemy_cfg = config.enemy_scaling
+    min_tick_ms = max(0, enemy_cfg.min_tick_ms)
+    bonus_threshold = max(1, enemy_cfg.bonus_threshold)
+    tier_bonus = TierResolver(enemy_cfg.tiers)
+    if enemy_cfg.enabled:
+        scaled_duration_cap = int(duration_ms * max(0.0, enemy_cfg.max_duration_multiplier))
+        duration_cap = min(config.max_duration_ms, max(100, scaled_duration_cap))
+    else:
+        duration_cap = config.max_duration_ms
+
+    def multiplier(enemy_count: int) -> float:
+        if not enemy_cfg.enabled:
+            return 1.0
+        enemy_factor = math.log1p(enemy_count) if enemy_cfg.use_logarithmic_intensity else enemy_count
+        return 1 + (enemy_cfg.intensity_per_enemy * enemy_factor)
+
+    def threshold_bonus(enemy_count: int) -> int:
+        if enemy_cfg.use_logarithmic_intensity:
+            return max(0, int(math.log(enemy_count + 1)))
+        return enemy_count // bonus_threshold
+
+    def build_row(enemy_count: int) -> HardModeRow:
+        if not enemy_cfg.enabled:
+            return HardModeRow(cooldown_ms, 1.0, _duration_seconds(duration_ms, config.max_duration_ms), 0, False)
+        row_cooldown_ms = max(min_tick_ms, cooldown_ms - (enemy_cfg.tick_reduction_per_enemy_ms * enemy_count))
+        row_duration_ms = max(100, min(duration_ms + enemy_cfg.duration_per_enemy_ms * enemy_count, duration_cap))
+        bonus_pulses = 0
+        if enemy_count > 0:
+            bonus_pulses = max(0, min(threshold_bonus(enemy_count) + tier_bonus(enemy_count), MAX_BONUS_PULSES))
+        return HardModeRow(
+            cooldown_ms=row_cooldown_ms,
+            multiplier=multiplier(enemy_count),
+            duration_s=_duration_seconds(row_duration_ms, config.max_duration_ms),
+            bonus_pulses=bonus_pulses,
+            combo_eligible=(
+                enemy_cfg.combat_combo_enabled and enemy_count > 0 and enemy_count >= enemy_cfg.combat_combo_min_enemies
+            ),
+        )
+
+    last_changing: int | None = 0
+    if enemy_cfg.enabled:
+        reduction = enemy_cfg.tick_reduction_per_enemy_ms
+        per_enemy_ms = enemy_cfg.duration_per_enemy_ms
+        if enemy_cfg.use_logarithmic_intensity:
+            bonus_saturates = math.ceil(math.exp(MAX_BONUS_PULSES)) - 1
+            while bonus_saturates > 1 and threshold_bonus(bonus_saturates - 1) >= MAX_BONUS_PULSES:
+                bonus_saturates -= 1
+            while threshold_bonus(bonus_saturates) < MAX_BONUS_PULSES:
+                bonus_saturates += 1
+        else:
+            bonus_saturates = MAX_BONUS_PULSES * bonus_threshold
+        if per_enemy_ms > 0:
+            duration_saturates = _ceil_div(duration_cap - duration_ms, per_enemy_ms)
+        elif per_enemy_ms < 0:
+            duration_saturates = _ceil_div(duration_ms - 100, -per_enemy_ms)
+        else:
+            duration_saturates = 0
+        last_changing = max(
+            duration_saturates,
+            bonus_saturates,
+            tier_bonus.bounds[-1],
+            max(1, enemy_cfg.combat_combo_min_enemies),
+        )
+        if reduction > 0:
+            last_changing = max(last_changing, _ceil_div(cooldown_ms - min_tick_ms, reduction))
+        elif reduction < 0:
+            last_changing = None
+
+    saturated = last_changing is not None and last_changing < HARD_MODE_TABLE_MAX_ROWS
+    row_count = last_changing + 1 if saturated else HARD_MODE_TABLE_MAX_ROWS
+    return HardModeTable(
+        rows=tuple(build_row(enemy_count) for enemy_count in range(row_count)),
+        saturated=saturated,
+        bonus_intensity_ratio=max(0.0, min(enemy_cfg.bonus_pulse_intensity_ratio, 1.0)),
+        pulse_spacing_ms=enemy_cfg.pulse_spacing_ms,
+        build_row=build_row,
+        multiplier=multiplier,
+    )
+
+
+def compile_mapping(event_type: str, mapping: EventMapping, config: AppConfig) -> CompiledMapping:
+    intensity = max(1, min(mapping.intensity, config.max_intensity))
+    duration_ms = max(100, min(mapping.duration_ms, config.max_duration_ms))
+    hard_mode = None
+    if mapping.mode == "hard":
+        hard_mode = compile_hard_mode_table(mapping.cooldown_ms, duration_ms, config)
+    return CompiledMapping(
+        event_type=event_type,
+        mode=mapping.mode,
+        op=MODE_TO_OP.get(mapping.mode),
+        intensity=intensity,
+        duration_ms=duration_ms,
+        duration_s=_duration_seconds(duration_ms, config.max_duration_ms),
+        cooldown_ms=mapping.cooldown_ms,
+        requires_shock=mapping.mode in {"shock", "hard"},
+        block_reason=None if mapping.mode in MODE_TO_OP else "invalid_mode",
+        hard_mode=hard_mode,
+    )
+
+
+def compile_policy_table(config: AppConfig) -> Mapping[str, CompiledMapping]:
+    return MappingProxyType(
+        {event_type: compile_mapping(event_type, mapping, config) for event_type, mapping in config.event_mappings.items()}
+    )
+
+
+@dataclass(slots=True)
 class HardModeState:
     max_hp: int
     initial_missing_hp: int
     current_enemy_count: int = 0
+    last_tick: float = field(default_factory=monotonic)
 
 
 class PolicyEngine:
     def __init__(self, config: AppConfig):
         self.config = config
-        self._cooldowns: dict[tuple[str, str], float] = {}
-        self._bonus_cooldowns: dict[tuple[str, str], float] = {}
-        self._hard_mode_states: dict[str, HardModeState] = {}
+        self._cooldowns = CooldownStore()
+        self._bonus_cooldowns = CooldownStore()
+        # Ordered by last tick (least recent first) for idle expiry and LRU eviction.
+        self._hard_mode_states: OrderedDict[str, HardModeState] = OrderedDict()
+        self.hard_mode_expired = 0
+        self.hard_mode_evicted = 0
+        self._table = compile_policy_table(config)
+
+    def recompile(self) -> None:
+        """Rebuild the compiled policy table after config changes."""
+        self._table = compile_policy_table(self.config)
+
+    def apply_config(self, config: AppConfig, table: Mapping[str, CompiledMapping] | None = None) -> None:
+        """Switch to ``config`` in one step, keeping cooldowns and hard-mode state.
+
+        ``table`` is ``compile_policy_table(config)`` when the caller already
+        compiled it, for example off the event loop.
+        """
+        table = compile_policy_table(config) if table is None else table
+        self.config, self._table = config, table
 
     def evaluate(self, session_id: str, event_type: str, armed: bool, context: dict[str, Any] | None = None) -> Decision:
-        mapping: EventMapping | None = self.config.event_mappings.get(event_type)
-        if mapping is None:
-            return Decision(False, "event_not_mapped")
+        entry = self._table.get(event_type)
+        if entry is None:
+            entry = self._compile_missing(event_type)
+            if entry is None:
+                return Decision(False, "event_not_mapped")
         if not armed:
             return Decision(False, "session_not_armed")
-        if mapping.mode in {"shock", "hard"} and not self.config.allow_shock:
+        # allow_shock is read live so the safety switch never comes from a stale table.
+        if entry.requires_shock and not self.config.allow_shock:
             return Decision(False, "shock_disabled")
 
-        context = context or {}
-        if mapping.mode == "hard":
-            return self._evaluate_hard_mode(session_id, mapping, context)
-        if mapping.mode not in MODE_TO_OP:
-            return Decision(False, "invalid_mode")
+        if entry.mode == "hard":
+            return self._evaluate_hard_mode(session_id, entry, context or {})
+        if entry.block_reason is not None:
+            return Decision(False, entry.block_reason)
 
-        if not self._consume_cooldown(session_id, event_type, mapping.cooldown_ms):
+        if not self._cooldowns.consume((session_id, event_type), entry.cooldown_ms):
             return Decision(False, "cooldown_active")
 
-        intensity = max(1, min(mapping.intensity, self.config.max_intensity))
-        duration_ms = max(100, min(mapping.duration_ms, self.config.max_duration_ms))
-        duration_s = self._duration_seconds(duration_ms)
+        return Decision(True, "ok", op=entry.op, intensity=entry.intensity, duration_s=entry.duration_s)
 
-        return Decision(True, "ok", op=MODE_TO_OP[mapping.mode], intensity=intensity, duration_s=duration_s)
+    def _compile_missing(self, event_type: str) -> CompiledMapping | None:
+        if event_type not in self.config.event_mappings:
+            return None
+        self.recompile()
+        return self._table.get(event_type)
 
     @staticmethod
     def _coerce_int(value: Any, default: int = 0) -> int:
@@ -69,27 +304,64 @@ class PolicyEngine:
         except (TypeError, ValueError):
             return default
 
-    def _consume_cooldown(self, session_id: str, event_type: str, cooldown_ms: int) -> bool:
-        cooldown_key = (session_id, event_type)
+    def hard_mode_snapshot(self) -> dict[str, Any]:
         now = monotonic()
-        next_ok = self._cooldowns.get(cooldown_key, 0.0)
-        if now < next_ok:
-            return False
-        self._cooldowns[cooldown_key] = now + (cooldown_ms / 1000)
-        return True
+        self._expire_hard_mode_states(now)
+        states = self._hard_mode_states
+        approx_bytes = sys.getsizeof(states) + sum(
+            sys.getsizeof(session_id) + sys.getsizeof(state) for session_id, state in states.items()
+        )
+        return {
+            "count": len(states),
+            "max_sessions": self.config.hard_mode_max_sessions,
+            "idle_timeout_ms": self.config.hard_mode_idle_timeout_ms,
+            "expired": self.hard_mode_expired,
+            "evicted": self.hard_mode_evicted,
+            "approx_bytes": approx_bytes,
+            "sessions": [
+                {
+                    "session_id": session_id,
+                    "max_hp": state.max_hp,
+                    "initial_missing_hp": state.initial_missing_hp,
+                    "current_enemy_count": state.current_enemy_count,
+                    "idle_ms": round((now - state.last_tick) * 1000),
+                }
+                for session_id, state in states.items()
+            ],
+        }
+
+    def _expire_hard_mode_states(self, now: float) -> None:
+        timeout_s = self.config.hard_mode_idle_timeout_ms / 1000
+        if timeout_s <= 0:
+            return
+        states = self._hard_mode_states
+        while states:
+            session_id, state = next(iter(states.items()))
+            if now - state.last_tick < timeout_s:
+                break
+            del states[session_id]
+            self.hard_mode_expired += 1
+
+    def _start_hard_mode_state(self, session_id: str, state: HardModeState) -> None:
+        states = self._hard_mode_states
+        states[session_id] = state
+        states.move_to_end(session_id)
+        limit = max(1, self.config.hard_mode_max_sessions)
+        while len(states) > limit:
+            states.popitem(last=False)
+            self.hard_mode_evicted += 1
+
+    def cooldown_stats(self) -> dict[str, dict[str, int]]:
+        return {"cooldowns": self._cooldowns.stats(), "bonus_cooldowns": self._bonus_cooldowns.stats()}
+
+    def _consume_cooldown(self, session_id: str, event_type: str, cooldown_ms: int) -> bool:
+        return self._cooldowns.consume((session_id, event_type), cooldown_ms)
 
     def _consume_bonus_cooldown(self, session_id: str, event_type: str, cooldown_ms: int) -> bool:
-        cooldown_key = (session_id, event_type)
-        now = monotonic()
-        next_ok = self._bonus_cooldowns.get(cooldown_key, 0.0)
-        if now < next_ok:
-            return False
-        self._bonus_cooldowns[cooldown_key] = now + (cooldown_ms / 1000)
-        return True
+        return self._bonus_cooldowns.consume((session_id, event_type), cooldown_ms)
 
     def _duration_seconds(self, duration_ms: int) -> int:
-        max_seconds = max(1, self.config.max_duration_ms // 1000)
-        return max(1, min(duration_ms // 1000, max_seconds))
+        return _duration_seconds(duration_ms, self.config.max_duration_ms)
 
     def _enemy_count(self, context: dict[str, Any]) -> int:
         candidates = [context.get("enemy_count"), context.get("enemies_nearby"), context.get("enemy_wave")]
@@ -102,17 +374,7 @@ class PolicyEngine:
                 continue
         return 0
 
-    def _tier_bonus_pulses(self, enemy_count: int, tiers: list[EnemyTier]) -> int:
-        bonus = 0
-        for tier in tiers:
-            if enemy_count < tier.min_enemies:
-                continue
-            if tier.max_enemies is not None and enemy_count > tier.max_enemies:
-                continue
-            bonus = max(bonus, tier.extra_pulses)
-        return bonus
-
-    def _evaluate_hard_mode(self, session_id: str, mapping: EventMapping, context: dict[str, Any]) -> Decision:
+    def _evaluate_hard_mode(self, session_id: str, entry: CompiledMapping, context: dict[str, Any]) -> Decision:
         max_hp = self._coerce_int(context.get("max_hp", 0))
         current_hp = self._coerce_int(context.get("current_hp", 0))
         damage = self._coerce_int(context.get("damage", 0))
@@ -121,29 +383,31 @@ class PolicyEngine:
         if max_hp <= 0:
             return Decision(False, "hard_mode_missing_max_hp")
 
+        now = monotonic()
+        self._expire_hard_mode_states(now)
         state = self._hard_mode_states.get(session_id)
         if state is None:
             initial_missing_hp = damage if damage > 0 else max(0, max_hp - current_hp)
             if initial_missing_hp <= 0:
                 return Decision(False, "hard_mode_not_started")
-            self._hard_mode_states[session_id] = HardModeState(
-                max_hp=max_hp,
-                initial_missing_hp=initial_missing_hp,
-                current_enemy_count=enemy_count,
+            self._start_hard_mode_state(
+                session_id,
+                HardModeState(
+                    max_hp=max_hp,
+                    initial_missing_hp=initial_missing_hp,
+                    current_enemy_count=enemy_count,
+                    last_tick=now,
+                ),
             )
             return Decision(False, "hard_mode_started")
 
         state.current_enemy_count = enemy_count
+        state.last_tick = now
+        self._hard_mode_states.move_to_end(session_id)
 
-        enemy_cfg = self.config.enemy_scaling
-        dynamic_cooldown_ms = mapping.cooldown_ms
-        if enemy_cfg.enabled:
-            dynamic_cooldown_ms = max(
-                max(0, enemy_cfg.min_tick_ms),
-                mapping.cooldown_ms - (enemy_cfg.tick_reduction_per_enemy_ms * enemy_count),
-            )
-
-        if not self._consume_cooldown(session_id, "hard_mode", dynamic_cooldown_ms):
+        table = entry.hard_mode
+        row = table.row(enemy_count)
+        if not self._consume_cooldown(session_id, "hard_mode", row.cooldown_ms):
             return Decision(False, "cooldown_active")
 
         if current_hp >= state.max_hp:
@@ -156,52 +420,24 @@ class PolicyEngine:
             return Decision(False, "hard_mode_waiting_for_heal")
 
         ratio = healed_hp / state.max_hp
-        configured_max = max(1, min(mapping.intensity, self.config.max_intensity))
-
-        if enemy_cfg.enabled:
-            enemy_factor = math.log1p(enemy_count) if enemy_cfg.use_logarithmic_intensity else enemy_count
-            multiplier = 1 + (enemy_cfg.intensity_per_enemy * enemy_factor)
-        else:
-            multiplier = 1.0
-
-        intensity = max(1, min(self.config.max_intensity, round(ratio * configured_max * multiplier)))
-
-        base_duration_ms = max(100, min(mapping.duration_ms, self.config.max_duration_ms))
-        duration_ms = base_duration_ms
-        if enemy_cfg.enabled:
-            duration_ms += enemy_cfg.duration_per_enemy_ms * enemy_count
-            scaled_duration_cap = int(base_duration_ms * max(0.0, enemy_cfg.max_duration_multiplier))
-            duration_cap = min(self.config.max_duration_ms, max(100, scaled_duration_cap))
-        else:
-            duration_cap = self.config.max_duration_ms
-
-        duration_ms = max(100, min(duration_ms, duration_cap))
-        duration_s = self._duration_seconds(duration_ms)
+        intensity = max(1, min(self.config.max_intensity, round(ratio * entry.intensity * row.multiplier)))
 
         bonus_pulses = 0
-        if enemy_cfg.enabled and enemy_count > 0:
-            threshold_bonus = enemy_count // max(1, enemy_cfg.bonus_threshold)
-            tier_bonus = self._tier_bonus_pulses(enemy_count, enemy_cfg.tiers)
-            combat_bonus = 1 if (
-                context.get("in_combat") and enemy_count >= enemy_cfg.combat_combo_min_enemies and enemy_cfg.combat_combo_enabled
-            ) else 0
-
-            if enemy_cfg.use_logarithmic_intensity:
-                threshold_bonus = max(0, int(math.log(enemy_count + 1)))
-
-            raw_bonus = threshold_bonus + tier_bonus + combat_bonus
-            raw_bonus = max(0, min(raw_bonus, MAX_BONUS_PULSES))
-
-            if raw_bonus > 0 and self._consume_bonus_cooldown(session_id, "hard_mode_bonus", enemy_cfg.bonus_global_cooldown_ms):
-                bonus_pulses = raw_bonus
+        raw_bonus = row.bonus_pulses
+        if row.combo_eligible and context.get("in_combat"):
+            raw_bonus = min(raw_bonus + 1, MAX_BONUS_PULSES)
+        if raw_bonus > 0 and self._consume_bonus_cooldown(
+            session_id, "hard_mode_bonus", self.config.enemy_scaling.bonus_global_cooldown_ms
+        ):
+            bonus_pulses = raw_bonus
 
         return Decision(
             True,
             "ok",
-            op=MODE_TO_OP[mapping.mode],
+            op=entry.op,
             intensity=intensity,
-            duration_s=duration_s,
+            duration_s=row.duration_s,
             bonus_pulses=bonus_pulses,
-            bonus_intensity_ratio=max(0.0, min(enemy_cfg.bonus_pulse_intensity_ratio, 1.0)),
-            pulse_spacing_ms=enemy_cfg.pulse_spacing_ms,
+            bonus_intensity_ratio=table.bonus_intensity_ratio,
+            pulse_spacing_ms=table.pulse_spacing_ms,
         )
@@ -3,10 +3,13 @@ from __future__ import annotations
 import argparse
 import logging
 import os
+import socket
+import stat
+from pathlib import Path
 
 import uvicorn
 
-from middleware.logging_config import configure_logging
+from middleware.logging_config import LOG_FORMAT_ENV, LOG_QUEUE_ENV, configure_logging
 from middleware.runtime_mode import (
     LIVE_CONFIRMATION_ENV,
     LIVE_CONFIRMATION_PHRASE,
@@ -16,20 +19,88 @@ from middleware.runtime_mode import (
     log_runtime_mode,
 )
 
+DEFAULT_UDS_MODE = 0o600
+
+
+def bind_unix_socket(path: Path, mode: int = DEFAULT_UDS_MODE) -> socket.socket:
+    """Bind a Unix domain socket whose file permissions are ``mode``.
+
+    Connecting needs write permission on the socket file, so the default 0600
+    limits access to the user running the middleware. A stale socket left by a
+    previous run is replaced; a live one or any other kind of file is refused.
+    """
+    if path.exists() or path.is_symlink():
+        if not stat.S_ISSOCK(path.lstat().st_mode):
+            raise RuntimeError(f"uds_path_not_a_socket: {path}")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+        else:
+            raise RuntimeError(f"uds_path_in_use: {path}")
+        finally:
+            probe.close()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Create the file with the final permissions so it is never briefly wider.
+    previous_umask = os.umask(0o777 & ~mode)
+    try:
+        sock.bind(str(path))
+    except OSError:
+        sock.close()
+        raise
+    finally:
+        os.umask(previous_umask)
+    os.chmod(path, mode)
+    return sock
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run the Cyberpunk -> PiShock middleware")
     parser.add_argument("--mode", choices=[mode.value for mode in RuntimeMode], help="Runtime mode: test, beep, or live")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--uds", help="Listen on this Unix domain socket path instead of --host/--port")
+    parser.add_argument(
+        "--uds-mode",
+        type=lambda value: int(value, 8),
+        default=DEFAULT_UDS_MODE,
+        help="Octal file mode for the --uds socket (default: 600, owner only)",
+    )
     parser.add_argument("--reload", dest="reload", action="store_true", default=False)
     parser.add_argument("--no-reload", dest="reload", action="store_false")
+    parser.add_argument(
+        "--log-queue",
+        action="store_true",
+        help="Write logs from a background thread through a bounded queue",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=["text", "json"],
+        help="Log file format; json writes one object per record",
+    )
     args = parser.parse_args()
+    if args.uds and not hasattr(socket, "AF_UNIX"):
+        parser.error("--uds is not supported on this platform")
+
+    # Carried to the uvicorn worker, which configures logging on import.
+    if args.log_format:
+        os.environ[LOG_FORMAT_ENV] = args.log_format
+    if args.log_queue:
+        os.environ[LOG_QUEUE_ENV] = "1"
 
     log_path = configure_logging()
     logger = logging.getLogger(__name__)
     print(f"[runtime] logs: {log_path}")
-    logger.info("launcher starting host=%s port=%s reload=%s log_file=%s", args.host, args.port, args.reload, log_path)
+    logger.info(
+        "launcher starting host=%s port=%s uds=%s reload=%s log_file=%s",
+        args.host,
+        args.port,
+        args.uds,
+        args.reload,
+        log_path,
+    )
 
     mode = choose_runtime_mode(cli_mode=args.mode, interactive=True)
     os.environ[RUNTIME_MODE_ENV] = mode.value
@@ -40,8 +111,32 @@ def main() -> None:
         os.environ.pop(LIVE_CONFIRMATION_ENV)
 
     log_runtime_mode(mode)
-    logger.info("uvicorn starting host=%s port=%s reload=%s runtime_mode=%s", args.host, args.port, args.reload, mode.value)
-    uvicorn.run("middleware.app:app", host=args.host, port=args.port, reload=args.reload)
+    if not args.uds:
+        logger.info("uvicorn starting host=%s port=%s reload=%s runtime_mode=%s", args.host, args.port, args.reload, mode.value)
+        uvicorn.run("middleware.app:app", host=args.host, port=args.port, reload=args.reload)
+        return
+
+    uds_path = Path(args.uds)
+    try:
+        sock = bind_unix_socket(uds_path, args.uds_mode)
+    except (OSError, RuntimeError) as exc:
+        logger.error("uds bind failed path=%s error=%s", uds_path, exc)
+        raise SystemExit(f"uds_bind_failed: {exc}") from exc
+    print(f"[runtime] listening on unix socket {uds_path} mode={args.uds_mode:o}")
+    logger.info(
+        "uvicorn starting uds=%s uds_mode=%o reload=%s runtime_mode=%s",
+        uds_path,
+        args.uds_mode,
+        args.reload,
+        mode.value,
+    )
+    try:
+        # uvicorn's own uds option chmods the socket to 0666; handing it a
+        # pre-bound descriptor keeps the permissions chosen here.
+        uvicorn.run("middleware.app:app", fd=sock.fileno(), reload=args.reload)
+    finally:
+        sock.close()
+        uds_path.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
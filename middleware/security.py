@@ -1,5 +1,12 @@
 import hashlib
 import hmac
+import time
+
+from middleware.ttl_store import CooldownStore
+
+DUPLICATE_EVENT = "duplicate_event"
+STALE_EVENT = "stale_event"
+WS_FRAME_MAC_BYTES = 16
 
 
 def compute_signature(secret: str, body: bytes) -> str:
@@ -10,3 +17,97 @@ def compute_signature(secret: str, body: bytes) -> str:
 def verify_signature(secret: str, body: bytes, provided_signature: str) -> bool:
     expected = compute_signature(secret, body)
     return hmac.compare_digest(expected, provided_signature)
+
+
+def websocket_auth_message(nonce: str, ts_ms: int) -> bytes:
+    """Bytes signed by the /ws handshake; binds the signature to one nonce and time."""
+    return f"ws-auth:{nonce}:{ts_ms}".encode("utf-8")
+
+
+def websocket_auth_frame(secret: str, nonce: str, ts_ms: int) -> dict:
+    return {
+        "type": "auth",
+        "nonce": nonce,
+        "ts_ms": ts_ms,
+        "signature": compute_signature(secret, websocket_auth_message(nonce, ts_ms)),
+    }
+
+
+def websocket_session_key(secret: str, nonce: str, ts_ms: int) -> bytes:
+    """Per-connection key for /ws frames, derived from the signed handshake."""
+    return hmac.new(secret.encode("utf-8"), f"ws-key:{nonce}:{ts_ms}".encode("utf-8"), hashlib.sha256).digest()
+
+
+def websocket_frame_mac(key: bytes, seq: int, body: bytes) -> str:
+    digest = hmac.new(key, f"ws-frame:{seq}:".encode("utf-8") + body, hashlib.sha256).digest()
+    return digest[:WS_FRAME_MAC_BYTES].hex()
+
+
+def websocket_event_frame(key: bytes, seq: int, body: bytes) -> bytes:
+    """Wrap an event body as ``<seq> <mac>\\n<body>`` for the /ws channel."""
+    return f"{seq} {websocket_frame_mac(key, seq, body)}\n".encode("utf-8") + body
+
+
+def open_websocket_frame(key: bytes, frame: bytes) -> tuple[int, bytes] | None:
+    """Return ``(seq, body)`` of a /ws event frame, or None if its MAC does not match."""
+    header, newline, body = frame.partition(b"\n")
+    seq_text, _, mac = header.partition(b" ")
+    if not newline or not seq_text.isdigit() or len(seq_text) > 20:
+        return None
+    seq = int(seq_text)
+    if not hmac.compare_digest(websocket_frame_mac(key, seq, body).encode("ascii"), mac):
+        return None
+    return seq, body
+
+
+class ReplayCache:
+    """Recently dispatched events keyed by ``(session_id, event_type, ts_ms)``.
+
+    ``check`` runs before policy: a retried or resent event carrying the key of
+    one already dispatched is answered with ``duplicate_event`` instead of
+    being sent to the device a second time. Keys are only ``remember``-ed once
+    policy allows an event, and ``forget``-ing a key whose dispatch failed lets
+    the retry through, so blocked or failed events can always be retried. Keys
+    expire after the dedup window and at most ``max_entries`` are kept. With
+    ``max_age_ms`` set, events whose ``ts_ms`` is further than that from server
+    time are refused as ``stale_event``, and keys are kept for at least twice
+    that long so anything still fresh enough to pass is also still remembered.
+    """
+
+    def __init__(self, max_entries: int = 65_536):
+        self._seen = CooldownStore(max_entries=max_entries)
+        self.hits = 0
+        self.stale = 0
+
+    def check(
+        self,
+        session_id: str,
+        event_type: str,
+        ts_ms: int,
+        window_ms: int,
+        max_age_ms: int = 0,
+        now_ms: float | None = None,
+    ) -> str | None:
+        """Return the rejection reason for this event, or None."""
+        if max_age_ms > 0:
+            now_ms = time.time() * 1000 if now_ms is None else now_ms
+            if abs(now_ms - ts_ms) > max_age_ms:
+                self.stale += 1
+                return STALE_EVENT
+        if window_ms > 0 and self._seen.get((session_id, event_type, ts_ms)) > time.monotonic():
+            self.hits += 1
+            return DUPLICATE_EVENT
+        return None
+
+    def remember(self, session_id: str, event_type: str, ts_ms: int, window_ms: int, max_age_ms: int = 0) -> None:
+        if window_ms > 0:
+            self._seen.consume((session_id, event_type, ts_ms), max(window_ms, 2 * max_age_ms))
+
+    def forget(self, session_id: str, event_type: str, ts_ms: int) -> None:
+        self._seen.forget((session_id, event_type, ts_ms))
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {**self._seen.stats(), "hits": self.hits, "stale": self.stale}
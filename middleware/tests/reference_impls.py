@@ -0,0 +1,187 @@
+"""Pre-optimisation reference implementations.
+
+The equivalence tests compare the fast paths against these, and middleware.bench
+times both sides with them.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import time
+from typing import Any
+
+from middleware.config import EnemyTier, EventMapping
+from middleware.logging_config import SENSITIVE_KEYS
+from middleware.policy import MAX_BONUS_PULSES, MODE_TO_OP, Decision, HardModeState, PolicyEngine
+
+# Messages taken from test_logging_config.py plus the everyday
+# log lines that make up most of the traffic and carry no secrets at all.
+REDACTION_SAMPLES = (
+    'username="operator" api_key=abc123 share_code=share-value hmac_secret=hm secret=value '
+    'token=t Authorization=Bearer abc.def X-Signature=sha256=abc '
+    '{"api_key":"json-secret"}',
+    "api_key=policy-secret-value",
+    "share_code=device-secret-value",
+    "api_key=raw-api-key share_code=raw-share username=raw-user",
+    "event request received body_bytes=142",
+    "event parsed event_type=player_hard_mode_tick session_id=run-1 payload_armed=True runtime_armed=True final_armed=True",
+    "policy allowed event_type=player_hard_mode_tick session_id=run-1 op=shock intensity=8 duration_s=1 bonus_pulses=2",
+    "dry-run operation op=shock intensity=8 duration_s=1 no_real_api=true",
+)
+
+
+def reference_redact_text(value: object) -> str:
+    """Per-key multi-pass redaction used before the single-pass engine."""
+    text = str(value)
+    for key in SENSITIVE_KEYS:
+        text = re.sub(
+            rf"(?i)((?:['\"]?){re.escape(key)}(?:['\"]?)\s*[:=]\s*['\"])([^'\"]+)(['\"])",
+            rf"\1[REDACTED]\3",
+            text,
+        )
+        text = re.sub(
+            rf"(?i)(\b{re.escape(key)}\b\s*[:=]\s*)(['\"]?)([^,'\"\s}}\]\[]+)(['\"]?)",
+            rf"\1\2[REDACTED]\4",
+            text,
+        )
+    text = re.sub(r"(?i)(\bauthorization\b\s*[:=]\s*)([^,\r\n]+)", r"\1[REDACTED]", text)
+    text = re.sub(r"(?i)(\bx-signature\b\s*[:=]\s*)([^,\r\n\s]+)", r"\1[REDACTED]", text)
+    return text
+
+
+class ReferencePolicyEngine(PolicyEngine):
+    """PolicyEngine.evaluate as it was before the compiled decision and hard-mode tables."""
+
+    def evaluate(self, session_id: str, event_type: str, armed: bool, context: dict[str, Any] | None = None) -> Decision:
+        mapping = self.config.event_mappings.get(event_type)
+        if mapping is None:
+            return Decision(False, "event_not_mapped")
+        if not armed:
+            return Decision(False, "session_not_armed")
+        if mapping.mode in {"shock", "hard"} and not self.config.allow_shock:
+            return Decision(False, "shock_disabled")
+        if mapping.mode == "hard":
+            return self._evaluate_hard_mode_reference(session_id, mapping, context or {})
+        if mapping.mode not in MODE_TO_OP:
+            return Decision(False, "invalid_mode")
+        if not self._consume_cooldown(session_id, event_type, mapping.cooldown_ms):
+            return Decision(False, "cooldown_active")
+
+        intensity = max(1, min(mapping.intensity, self.config.max_intensity))
+        duration_ms = max(100, min(mapping.duration_ms, self.config.max_duration_ms))
+        duration_s = self._duration_seconds(duration_ms)
+        return Decision(True, "ok", op=MODE_TO_OP[mapping.mode], intensity=intensity, duration_s=duration_s)
+
+    def _evaluate_hard_mode_reference(self, session_id: str, mapping: EventMapping, context: dict[str, Any]) -> Decision:
+        max_hp = self._coerce_int(context.get("max_hp", 0))
+        current_hp = self._coerce_int(context.get("current_hp", 0))
+        damage = self._coerce_int(context.get("damage", 0))
+        enemy_count = self._enemy_count(context)
+
+        if max_hp <= 0:
+            return Decision(False, "hard_mode_missing_max_hp")
+
+        now = time.monotonic()
+        self._expire_hard_mode_states(now)
+        state = self._hard_mode_states.get(session_id)
+        if state is None:
+            initial_missing_hp = damage if damage > 0 else max(0, max_hp - current_hp)
+            if initial_missing_hp <= 0:
+                return Decision(False, "hard_mode_not_started")
+            self._start_hard_mode_state(
+                session_id,
+                HardModeState(
+                    max_hp=max_hp,
+                    initial_missing_hp=initial_missing_hp,
+                    current_enemy_count=enemy_count,
+                    last_tick=now,
+                ),
+            )
+            return Decision(False, "hard_mode_started")
+
+        state.current_enemy_count = enemy_count
+        state.last_tick = now
+        self._hard_mode_states.move_to_end(session_id)
+
+        enemy_cfg = self.config.enemy_scaling
+        dynamic_cooldown_ms = mapping.cooldown_ms
+        if enemy_cfg.enabled:
+            dynamic_cooldown_ms = max(
+                max(0, enemy_cfg.min_tick_ms),
+                mapping.cooldown_ms - (enemy_cfg.tick_reduction_per_enemy_ms * enemy_count),
+            )
+
+        if not self._consume_cooldown(session_id, "hard_mode", dynamic_cooldown_ms):
+            return Decision(False, "cooldown_active")
+
+        if current_hp >= state.max_hp:
+            self._hard_mode_states.pop(session_id, None)
+            return Decision(False, "hard_mode_completed")
+
+        current_missing_hp = max(0, state.max_hp - current_hp)
+        healed_hp = max(0, state.initial_missing_hp - current_missing_hp)
+        if healed_hp <= 0:
+            return Decision(False, "hard_mode_waiting_for_heal")
+
+        ratio = healed_hp / state.max_hp
+        configured_max = max(1, min(mapping.intensity, self.config.max_intensity))
+
+        if enemy_cfg.enabled:
+            enemy_factor = math.log1p(enemy_count) if enemy_cfg.use_logarithmic_intensity else enemy_count
+            multiplier = 1 + (enemy_cfg.intensity_per_enemy * enemy_factor)
+        else:
+            multiplier = 1.0
+
+        intensity = max(1, min(self.config.max_intensity, round(ratio * configured_max * multiplier)))
+
+        base_duration_ms = max(100, min(mapping.duration_ms, self.config.max_duration_ms))
+        duration_ms = base_duration_ms
+        if enemy_cfg.enabled:
+            duration_ms += enemy_cfg.duration_per_enemy_ms * enemy_count
+            scaled_duration_cap = int(base_duration_ms * max(0.0, enemy_cfg.max_duration_multiplier))
+            duration_cap = min(self.config.max_duration_ms, max(100, scaled_duration_cap))
+        else:
+            duration_cap = self.config.max_duration_ms
+
+        duration_ms = max(100, min(duration_ms, duration_cap))
+        duration_s = self._duration_seconds(duration_ms)
+
+        bonus_pulses = 0
+        if enemy_cfg.enabled and enemy_count > 0:
+            threshold_bonus = enemy_count // max(1, enemy_cfg.bonus_threshold)
+            tier_bonus = self._tier_bonus_pulses(enemy_count, enemy_cfg.tiers)
+            combat_bonus = 1 if (
+                context.get("in_combat") and enemy_count >= enemy_cfg.combat_combo_min_enemies and enemy_cfg.combat_combo_enabled
+            ) else 0
+
+            if enemy_cfg.use_logarithmic_intensity:
+                threshold_bonus = max(0, int(math.log(enemy_count + 1)))
+
+            raw_bonus = threshold_bonus + tier_bonus + combat_bonus
+            raw_bonus = max(0, min(raw_bonus, MAX_BONUS_PULSES))
+
+            if raw_bonus > 0 and self._consume_bonus_cooldown(session_id, "hard_mode_bonus", enemy_cfg.bonus_global_cooldown_ms):
+                bonus_pulses = raw_bonus
+
+        return Decision(
+            True,
+            "ok",
+            op=MODE_TO_OP[mapping.mode],
+            intensity=intensity,
+            duration_s=duration_s,
+            bonus_pulses=bonus_pulses,
+            bonus_intensity_ratio=max(0.0, min(enemy_cfg.bonus_pulse_intensity_ratio, 1.0)),
+            pulse_spacing_ms=enemy_cfg.pulse_spacing_ms,
+        )
+
+    @staticmethod
+    def _tier_bonus_pulses(enemy_count: int, tiers: list[EnemyTier]) -> int:
+        bonus = 0
+        for tier in tiers:
+            if enemy_count < tier.min_enemies:
+                continue
+            if tier.max_enemies is not None and enemy_count > tier.max_enemies:
+                continue
+            bonus = max(bonus, tier.extra_pulses)
+        return bonus
@@ -1,15 +1,28 @@
 import json
+import shutil
+import time
+import uuid
 from pathlib import Path
 
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
 
 import middleware.app as app_module
 from middleware.config import EventMapping, load_config
+from middleware.dispatch import DISPATCH_QUEUE_FULL, DispatchQueueFull, DispatchScheduler
+from middleware.metrics import EventMetrics, parse_server_timing
 from middleware.pishock import BeepOnlyPiShockClient, DryRunPiShockClient, PiShockClient
-from middleware.policy import PolicyEngine
+from middleware.policy import Decision, PolicyEngine
 from middleware.runtime_mode import RuntimeMode
-from middleware.security import compute_signature
+from middleware.security import (
+    ReplayCache,
+    compute_signature,
+    websocket_auth_frame,
+    websocket_event_frame,
+    websocket_session_key,
+)
+from middleware.ttl_store import CooldownStore
 
 
 @pytest.fixture(autouse=True)
@@ -20,11 +33,15 @@ def _reset_app_state(monkeypatch) -> None:
     monkeypatch.setattr(app_module, "_client", DryRunPiShockClient())
     monkeypatch.setattr(app_module, "_dry_run_client", DryRunPiShockClient())
     monkeypatch.setattr(app_module, "_runtime_mode", RuntimeMode.TEST)
+    monkeypatch.setattr(app_module, "_scheduler", DispatchScheduler())
     app_module._sessions_armed.clear()
     app_module._emergency_stop = False
     app_module._policy._cooldowns.clear()
     app_module._policy._bonus_cooldowns.clear()
     app_module._policy._hard_mode_states.clear()
+    monkeypatch.setattr(app_module, "_ws_nonces", CooldownStore())
+    monkeypatch.setattr(app_module, "_replay_cache", ReplayCache())
+    monkeypatch.setattr(app_module, "_metrics", EventMetrics())
 
 
 def _signed_body(payload: dict) -> tuple[bytes, str]:
@@ -380,6 +397,35 @@ def test_event_returns_structured_error_when_pishock_fails(monkeypatch) -> None:
     assert "error" not in data
 
 
+def test_event_reports_dispatch_queue_full_error_code(monkeypatch) -> None:
+    client = TestClient(app_module.app)
+    app_module._sessions_armed["abc"] = True
+    app_module._config.pishock["dry_run"] = False
+    monkeypatch.setattr(app_module, "_runtime_mode", RuntimeMode.LIVE)
+
+    async def full_operate(op: int, intensity: int, duration_s: int):
+        raise DispatchQueueFull(DISPATCH_QUEUE_FULL)
+
+    monkeypatch.setattr(app_module._client, "operate", full_operate)
+    payload = {
+        "event_type": "player_damaged",
+        "ts_ms": 1,
+        "session_id": "abc",
+        "armed": True,
+        "context": {},
+    }
+    body, sig = _signed_body(payload)
+
+    res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+    assert res.status_code == 200
+    assert res.json() == {
+        "accepted": False,
+        "reason": "pishock_operate_failed",
+        "error_code": "pishock_dispatch_queue_full",
+    }
+
+
 def test_beep_mode_missing_python_pishock_returns_safe_error_code(monkeypatch) -> None:
     client = TestClient(app_module.app)
     app_module._sessions_armed["abc"] = True
@@ -427,6 +473,23 @@ def test_event_invalid_payload_returns_400() -> None:
     assert res.json()["detail"] == "invalid_event_payload"
 
 
+def test_event_rejects_oversized_body_and_context(monkeypatch) -> None:
+    client = TestClient(app_module.app)
+    monkeypatch.setattr(app_module._config, "max_event_bytes", 64)
+    payload = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True, "context": {"note": "x" * 64}}
+    body, sig = _signed_body(payload)
+    res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+    assert res.status_code == 413
+    assert res.json()["detail"] == "event_too_large"
+
+    monkeypatch.setattr(app_module._config, "max_event_bytes", 16_384)
+    for context in ({"a": {"b": {"c": {"d": 1}}}}, {f"k{i}": i for i in range(100)}, {"note": "x" * 1000}):
+        body, sig = _signed_body({**payload, "context": context})
+        res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+        assert res.status_code == 400
+        assert res.json()["detail"] == "invalid_event_payload"
+
+
 def test_hard_mode_uses_shock_operation_code(monkeypatch) -> None:
     client = TestClient(app_module.app)
     app_module._sessions_armed["abc"] = True
@@ -499,3 +562,529 @@ def test_success_response_redacts_pishock_client_text(monkeypatch) -> None:
     assert "raw-share" not in res.text
     assert "raw-user" not in res.text
     assert "[REDACTED]" in res.json()["pishock_response"]
+
+
+def _wait_for_dispatch(client: TestClient, dispatch_id: str) -> dict:
+    for _ in range(200):
+        res = client.get(f"/dispatch/{dispatch_id}")
+        assert res.status_code == 200
+        if res.json()["status"] != "pending":
+            return res.json()
+        time.sleep(0.01)
+    raise AssertionError("dispatch did not finish")
+
+
+def test_async_dispatch_returns_202_and_reports_result(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "async_dispatch", True)
+    app_module._sessions_armed["abc"] = True
+    payload = {
+        "event_type": "player_healed",
+        "ts_ms": 1,
+        "session_id": "abc",
+        "armed": True,
+        "context": {},
+    }
+    body, sig = _signed_body(payload)
+
+    with TestClient(app_module.app) as client:
+        res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+        assert res.status_code == 202
+        data = res.json()
+        assert data["accepted"] is True
+        assert data["status"] == "pending"
+
+        record = _wait_for_dispatch(client, data["dispatch_id"])
+
+    assert record["status"] == "completed"
+    assert record["session_id"] == "abc"
+    assert record["result"]["accepted"] is True
+    assert "dry_run" in record["result"]["pishock_response"]
+
+
+def test_async_dispatch_blocked_event_still_answers_synchronously(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "async_dispatch", True)
+    payload = {
+        "event_type": "player_healed",
+        "ts_ms": 1,
+        "session_id": "abc",
+        "armed": True,
+        "context": {},
+    }
+    body, sig = _signed_body(payload)
+
+    with TestClient(app_module.app) as client:
+        res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+    assert res.status_code == 200
+    assert res.json() == {"accepted": False, "reason": "session_not_armed"}
+
+
+def test_unknown_dispatch_id_returns_404() -> None:
+    res = TestClient(app_module.app).get("/dispatch/missing")
+
+    assert res.status_code == 404
+    assert res.json()["detail"] == "dispatch_not_found"
+
+
+def test_stop_cancels_in_flight_pulse_train(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "async_dispatch", True)
+    monkeypatch.setattr(
+        app_module._policy,
+        "evaluate",
+        lambda *_args, **_kwargs: Decision(
+            True, "ok", op=2, intensity=1, duration_s=1, bonus_pulses=5, pulse_spacing_ms=1000
+        ),
+    )
+    app_module._sessions_armed["abc"] = True
+    payload = {
+        "event_type": "player_healed",
+        "ts_ms": 1,
+        "session_id": "abc",
+        "armed": True,
+        "context": {},
+    }
+    body, sig = _signed_body(payload)
+
+    with TestClient(app_module.app) as client:
+        res = client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+        assert res.status_code == 202
+        dispatch_id = res.json()["dispatch_id"]
+        time.sleep(0.05)
+
+        stop_res = client.post("/stop")
+        record = client.get(f"/dispatch/{dispatch_id}").json()
+
+    assert stop_res.status_code == 200
+    data = stop_res.json()
+    assert data["emergency_stop"] is True
+    assert data["cancelled_dispatches"] == 1
+    assert data["cancelled_operations"] == 5
+    assert data["stop_latency_ms"] < 100
+    assert record["status"] == "cancelled"
+    assert record["operations_started"] == 1
+
+
+def test_disarm_reports_cancelled_operations_for_idle_session() -> None:
+    res = TestClient(app_module.app).post("/disarm/abc")
+
+    assert res.status_code == 200
+    assert res.json() == {
+        "session_id": "abc",
+        "armed": False,
+        "cancelled_dispatches": 0,
+        "cancelled_operations": 0,
+    }
+
+
+def test_hard_mode_sessions_endpoint_lists_live_sessions(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "allow_shock", True)
+    app_module._sessions_armed["abc"] = True
+    payload = {
+        "event_type": "player_hard_mode_tick",
+        "ts_ms": 1,
+        "session_id": "abc",
+        "armed": True,
+        "context": {"max_hp": 100, "current_hp": 50, "damage": 50},
+    }
+    body, sig = _signed_body(payload)
+    client = TestClient(app_module.app)
+    client.post('/event', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+    res = client.get("/hard-mode/sessions")
+
+    assert res.status_code == 200
+    data = res.json()
+    assert data["count"] == 1
+    assert data["sessions"][0]["session_id"] == "abc"
+    assert data["sessions"][0]["max_hp"] == 100
+
+
+def test_event_returns_server_timing_and_correlation_id() -> None:
+    client = TestClient(app_module.app)
+    app_module._sessions_armed["abc"] = True
+    body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True})
+
+    res = client.post("/event", content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+    assert res.status_code == 200
+    assert len(res.headers["x-correlation-id"]) == 32
+    timings = parse_server_timing(res.headers["server-timing"])
+    assert list(timings) == ["verify", "parse", "policy", "dispatch", "total"]
+    assert all(duration >= 0 for duration in timings.values())
+    assert timings["total"] >= timings["dispatch"]
+
+    blocked = client.post(
+        "/event",
+        content=body,
+        headers={"x-signature": sig, "content-type": "application/json", "x-correlation-id": "run-7.tick_3"},
+    )
+    assert blocked.headers["x-correlation-id"] == "run-7.tick_3"
+    assert "dispatch" not in parse_server_timing(blocked.headers["server-timing"])
+
+    rejected = client.post("/event", content=body, headers={"x-signature": "bad", "x-correlation-id": "bad id"})
+    assert rejected.status_code == 401
+    assert rejected.headers["x-correlation-id"] != "bad id"
+
+
+def test_metrics_exposes_decisions_stage_histograms_and_gauges() -> None:
+    client = TestClient(app_module.app)
+    client.post("/arm/abc")
+    headers = {"content-type": "application/json"}
+    for ts_ms, event_type in enumerate(("player_healed", "player_healed", "made_up_event"), start=1):
+        body, sig = _signed_body({"event_type": event_type, "ts_ms": ts_ms, "session_id": "abc", "armed": True})
+        client.post("/event", content=body, headers={**headers, "x-signature": sig})
+    client.post("/event", content=b"{}", headers={**headers, "x-signature": "bad"})
+
+    res = client.get("/metrics")
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = set(res.text.splitlines())
+    assert 'pishock_events_total{event_type="player_healed",accepted="true",reason="ok"} 1' in lines
+    assert 'pishock_events_total{event_type="player_healed",accepted="false",reason="cooldown_active"} 1' in lines
+    assert 'pishock_events_total{event_type="unknown",accepted="false",reason="invalid_signature"} 1' in lines
+    assert any(line.startswith('pishock_events_total{event_type="unmapped"') for line in lines)
+    assert 'pishock_event_stage_seconds_count{stage="verify"} 4' in lines
+    assert 'pishock_event_stage_seconds_count{stage="policy"} 3' in lines
+    assert 'pishock_event_stage_seconds_count{stage="dispatch_primary"} 1' in lines
+    assert 'pishock_event_stage_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert "pishock_armed_sessions 1" in lines
+    assert 'pishock_cooldown_store_entries{store="cooldowns"} 1' in lines
+    assert "pishock_hard_mode_sessions 0" in lines
+
+
+def test_resent_and_stale_events_are_rejected_before_policy(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "dedup_window_ms", 60_000)
+    client = TestClient(app_module.app)
+    headers = {"content-type": "application/json"}
+    body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 5, "session_id": "abc", "armed": True})
+
+    # Blocked events are not remembered, so the retry after arming goes through.
+    assert client.post("/event", content=body, headers={**headers, "x-signature": sig}).json()["reason"] == "session_not_armed"
+    client.post("/arm/abc")
+    assert client.post("/event", content=body, headers={**headers, "x-signature": sig}).json()["accepted"] is True
+    app_module._policy._cooldowns.clear()
+    res = client.post("/event", content=body, headers={**headers, "x-signature": sig})
+    assert res.status_code == 200
+    assert res.json() == {"accepted": False, "reason": "duplicate_event"}
+
+    monkeypatch.setattr(app_module._config, "event_max_age_ms", 60_000)
+    body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 6, "session_id": "abc", "armed": True})
+    assert client.post("/event", content=body, headers={**headers, "x-signature": sig}).json()["reason"] == "stale_event"
+
+    assert client.get("/health").json()["replay_cache"] == {"size": 1, "evictions": 0, "hits": 1, "stale": 1}
+    lines = set(client.get("/metrics").text.splitlines())
+    assert 'pishock_events_total{event_type="player_healed",accepted="false",reason="duplicate_event"} 1' in lines
+    assert "pishock_replay_cache_entries 1" in lines
+
+
+def test_event_whose_dispatch_failed_can_be_retried(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "dedup_window_ms", 60_000)
+    app_module._sessions_armed["abc"] = True
+    calls = 0
+
+    async def flaky_operate(*_args, **_kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("device offline")
+        return 200, "ok"
+
+    monkeypatch.setattr(app_module._dry_run_client, "operate", flaky_operate)
+    client = TestClient(app_module.app)
+    body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 7, "session_id": "abc", "armed": True})
+
+    assert client.post("/event", content=body, headers={"x-signature": sig}).json()["reason"] == "pishock_operate_failed"
+    app_module._policy._cooldowns.clear()
+    assert client.post("/event", content=body, headers={"x-signature": sig}).json()["accepted"] is True
+    assert calls == 2
+
+
+def test_event_whose_bonus_pulse_failed_stays_remembered(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "dedup_window_ms", 60_000)
+    monkeypatch.setattr(
+        app_module._policy,
+        "evaluate",
+        lambda *_args, **_kwargs: Decision(True, "ok", op=2, intensity=1, duration_s=1, bonus_pulses=2, pulse_spacing_ms=0),
+    )
+    app_module._sessions_armed["abc"] = True
+    calls = 0
+
+    async def bonus_fails(*_args, **_kwargs):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("device offline")
+        return 200, "ok"
+
+    monkeypatch.setattr(app_module._dry_run_client, "operate", bonus_fails)
+    client = TestClient(app_module.app)
+    body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 8, "session_id": "abc", "armed": True})
+
+    data = client.post("/event", content=body, headers={"x-signature": sig}).json()
+    assert (data["accepted"], data["pishock_status"], data["bonus_pulses_sent"]) == (True, 200, 0)
+    assert data["bonus_error_code"] == "pishock_operate_failed"
+    # The primary pulse went out, so a resend must not repeat it.
+    assert client.post("/event", content=body, headers={"x-signature": sig}).json() == {
+        "accepted": False,
+        "reason": "duplicate_event",
+    }
+    assert calls == 2
+
+
+def test_admin_reload_swaps_config_and_keeps_session_state(monkeypatch) -> None:
+    base = Path(".tmp_test_reload") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        config_path = base / "config.yaml"
+        example = Path(app_module.__file__).with_name("config.example.yaml").read_text(encoding="utf-8")
+        config_path.write_text(example.replace("hmac_secret: change-me", "hmac_secret: reloaded-secret"), encoding="utf-8")
+        monkeypatch.setattr(app_module, "_runtime_config", config_path)
+        monkeypatch.setattr(app_module, "_config_source", app_module._config_source)
+        client = TestClient(app_module.app)
+        client.post("/arm/abc")
+        body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True})
+        assert client.post("/event", content=body, headers={"x-signature": sig}).json()["accepted"] is True
+        policy = app_module._policy
+
+        res = client.post("/admin/reload")
+
+        assert res.status_code == 200
+        assert res.json()["reloaded"] is True
+        assert res.json()["restart_required"] == []
+        assert app_module._config.hmac_secret == "reloaded-secret"
+        assert app_module._policy is policy and policy.config is app_module._config
+        assert app_module._sessions_armed == {"abc": True}
+        body, sig = _signed_body({"event_type": "player_healed", "ts_ms": 2, "session_id": "abc", "armed": True})
+        assert client.post("/event", content=body, headers={"x-signature": sig}).json()["reason"] == "cooldown_active"
+
+        dry_run_before = client.get("/health").json()["dry_run_effective"]
+        live = example.replace("hmac_secret: change-me", "hmac_secret: reloaded-secret").replace("dry_run: true", "dry_run: false")
+        config_path.write_text(live, encoding="utf-8")
+        res = client.post("/admin/reload")
+        assert res.json()["restart_required"] == ["pishock"]
+        assert app_module._config.pishock["dry_run"] is True
+        assert client.get("/health").json()["dry_run_effective"] is dry_run_before is True
+
+        broken = example.replace("hmac_secret: change-me", "hmac_secret: broken-secret")
+        for bad_config in (
+            "security: [unclosed",
+            broken.replace("event_mappings:", "event_mappings: [1, 2]\nunused_mappings:", 1),
+            broken.replace("enemy_scaling:", "enemy_scaling: 5\nunused_scaling:", 1),
+        ):
+            config_path.write_text(bad_config, encoding="utf-8")
+            res = client.post("/admin/reload")
+            assert res.status_code == 400
+            assert res.json()["detail"] == "config_reload_failed"
+            assert app_module._config.hmac_secret == "reloaded-secret"
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def _signed_batch(payloads: list[dict], ndjson: bool = True) -> tuple[bytes, str]:
+    if ndjson:
+        body = b"\n".join(json.dumps(payload, separators=(",", ":")).encode() for payload in payloads)
+    else:
+        body = json.dumps(payloads, separators=(",", ":")).encode()
+    return body, compute_signature(app_module._config.hmac_secret, body)
+
+
+def test_events_batch_evaluates_ndjson_in_order() -> None:
+    app_module._sessions_armed["abc"] = True
+    healed = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True, "context": {}}
+    body, sig = _signed_batch([healed, {**healed, "ts_ms": 2}, {**healed, "event_type": "unknown_event"}])
+    body += b"\n{not json\n"
+    sig = compute_signature(app_module._config.hmac_secret, body)
+
+    res = TestClient(app_module.app).post('/events', content=body, headers={"x-signature": sig})
+
+    assert res.status_code == 200
+    data = res.json()
+    assert (data["events"], data["accepted"]) == (4, 1)
+    assert [result["index"] for result in data["results"]] == [0, 1, 2, 3]
+    assert data["results"][0]["accepted"] is True
+    assert "dry_run" in data["results"][0]["pishock_response"]
+    assert [result["reason"] for result in data["results"][1:]] == [
+        "cooldown_active",
+        "event_not_mapped",
+        "invalid_event_payload",
+    ]
+    timings = parse_server_timing(res.headers["server-timing"])
+    assert list(timings) == ["verify", "parse", "policy", "dispatch", "total"]
+    assert timings["total"] >= timings["dispatch"]
+
+
+def test_events_batch_accepts_json_array_and_async_dispatch(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "async_dispatch", True)
+    app_module._sessions_armed["abc"] = True
+    app_module._sessions_armed["def"] = True
+    payloads = [
+        {"event_type": "player_healed", "ts_ms": 1, "session_id": session_id, "armed": True, "context": {}}
+        for session_id in ("abc", "def")
+    ]
+    body, sig = _signed_batch(payloads, ndjson=False)
+
+    with TestClient(app_module.app) as client:
+        res = client.post('/events', content=body, headers={"x-signature": sig, "content-type": "application/json"})
+
+        assert res.status_code == 202
+        results = res.json()["results"]
+        assert [result["status"] for result in results] == ["pending", "pending"]
+        records = [_wait_for_dispatch(client, result["dispatch_id"]) for result in results]
+
+    assert [record["session_id"] for record in records] == ["abc", "def"]
+    assert all(record["status"] == "completed" for record in records)
+
+
+def test_events_batch_rejects_bad_signature_oversize_and_emergency_stop(monkeypatch) -> None:
+    client = TestClient(app_module.app)
+    payload = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True, "context": {}}
+    body, sig = _signed_batch([payload, payload, payload])
+
+    assert client.post('/events', content=body, headers={"x-signature": "sha256=bad"}).status_code == 401
+
+    monkeypatch.setattr(app_module._config, "max_batch_events", 2)
+    res = client.post('/events', content=body, headers={"x-signature": sig})
+    assert res.status_code == 413
+    assert res.json()["detail"] == "event_batch_too_large"
+
+    empty_sig = compute_signature(app_module._config.hmac_secret, b"\n")
+    assert client.post('/events', content=b"\n", headers={"x-signature": empty_sig}).json()["detail"] == "empty_event_batch"
+
+    monkeypatch.setattr(app_module._config, "max_batch_events", 256)
+    monkeypatch.setattr(app_module, "_emergency_stop", True)
+    assert client.post('/events', content=body, headers={"x-signature": sig}).status_code == 423
+
+
+def _ws_auth(nonce: str = "nonce-1", ts_ms: int | None = None) -> dict:
+    ts_ms = int(time.time() * 1000) if ts_ms is None else ts_ms
+    return websocket_auth_frame(app_module._config.hmac_secret, nonce, ts_ms)
+
+
+def _ws_key(auth: dict) -> bytes:
+    return websocket_session_key(app_module._config.hmac_secret, auth["nonce"], auth["ts_ms"])
+
+
+def _ws_event(key: bytes, seq: int, payload: dict) -> bytes:
+    return websocket_event_frame(key, seq, json.dumps(payload).encode())
+
+
+def test_websocket_streams_decisions_and_dispatch_results() -> None:
+    app_module._sessions_armed["abc"] = True
+    healed = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True, "context": {}}
+
+    auth = _ws_auth()
+    key = _ws_key(auth)
+
+    with TestClient(app_module.app) as client, client.websocket_connect("/ws") as ws:
+        ws.send_json(auth)
+        assert ws.receive_json()["type"] == "auth_ok"
+
+        ws.send_bytes(_ws_event(key, 1, {**healed, "id": 7}))
+        decision = ws.receive_json()
+        assert (decision["type"], decision["id"], decision["accepted"]) == ("decision", 7, True)
+        result = ws.receive_json()
+        assert (result["type"], result["id"]) == ("dispatch_result", 7)
+        assert result["dispatch_id"] == decision["dispatch_id"]
+        assert result["status"] == "completed"
+        assert "dry_run" in result["result"]["pishock_response"]
+
+        ws.send_bytes(_ws_event(key, 2, {**healed, "ts_ms": 2, "id": 8}))
+        assert ws.receive_json()["reason"] == "cooldown_active"
+        ws.send_text(websocket_event_frame(key, 3, b"{broken").decode())
+        assert ws.receive_json() == {
+            "type": "decision",
+            "id": None,
+            "accepted": False,
+            "reason": "invalid_event_payload",
+        }
+
+
+def test_websocket_rejects_bad_stale_and_replayed_handshakes() -> None:
+    client = TestClient(app_module.app)
+    bad = {**_ws_auth(), "signature": "sha256=bad"}
+    stale = _ws_auth(nonce="old", ts_ms=int(time.time() * 1000) - 10 * app_module._config.ws_auth_window_ms)
+    replay = _ws_auth(nonce="once")
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json(replay)
+        assert ws.receive_json()["type"] == "auth_ok"
+
+    for frame, reason in ((bad, "invalid_signature"), (stale, "stale_handshake"), (replay, "replayed_handshake")):
+        with client.websocket_connect("/ws") as ws:
+            ws.send_json(frame)
+            assert ws.receive_json() == {"type": "error", "reason": reason}
+
+
+def test_websocket_closes_on_tampered_or_unsigned_frames() -> None:
+    app_module._sessions_armed["abc"] = True
+    healed = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True, "context": {}}
+    client = TestClient(app_module.app)
+    frame = _ws_event(_ws_key(_ws_auth(nonce="n-0")), 1, healed)
+
+    for nonce, bad_frame in (
+        ("n-1", frame.replace(b'"abc"', b'"xyz"')),
+        ("n-2", json.dumps(healed).encode()),
+        ("n-3", _ws_event(b"other-key", 1, healed)),
+        ("n-4", frame.replace(b"1 ", b"11 ", 1)),
+    ):
+        auth = _ws_auth(nonce=nonce)
+        with client.websocket_connect("/ws") as ws:
+            ws.send_json(auth)
+            assert ws.receive_json()["type"] == "auth_ok"
+            ws.send_bytes(bad_frame)
+            assert ws.receive_json() == {"type": "error", "reason": "invalid_frame_mac"}
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+            assert closed.value.code == 1008
+
+    # Nothing reached policy: no cooldown was started for any of the frames.
+    assert app_module._policy._cooldowns.stats()["size"] == 0
+
+
+def test_websocket_closes_on_replayed_or_skipped_sequence() -> None:
+    healed = {"event_type": "player_healed", "ts_ms": 1, "armed": True, "context": {}}
+
+    with TestClient(app_module.app) as client:
+        for nonce, seqs in (("seq-replay", (1, 1)), ("seq-gap", (1, 3))):
+            app_module._sessions_armed[nonce] = True
+            auth = _ws_auth(nonce=nonce)
+            key = _ws_key(auth)
+            with client.websocket_connect("/ws") as ws:
+                ws.send_json(auth)
+                assert ws.receive_json()["type"] == "auth_ok"
+                ws.send_bytes(_ws_event(key, seqs[0], {**healed, "session_id": nonce, "id": 1}))
+                assert ws.receive_json()["accepted"] is True
+                assert ws.receive_json()["type"] == "dispatch_result"
+                ws.send_bytes(_ws_event(key, seqs[1], {**healed, "session_id": nonce, "ts_ms": 2, "id": 2}))
+                assert ws.receive_json() == {"type": "error", "reason": "invalid_frame_sequence"}
+                with pytest.raises(WebSocketDisconnect):
+                    ws.receive_json()
+
+        lines = set(client.get("/metrics").text.splitlines())
+    assert 'pishock_events_total{event_type="unknown",accepted="false",reason="invalid_frame_sequence"} 2' in lines
+
+
+def test_websocket_rejects_oversized_frames_and_counts_emergency_stops(monkeypatch) -> None:
+    monkeypatch.setattr(app_module._config, "max_event_bytes", 128)
+    app_module._sessions_armed["abc"] = True
+    healed = {"event_type": "player_healed", "ts_ms": 1, "session_id": "abc", "armed": True}
+
+    auth = _ws_auth()
+    key = _ws_key(auth)
+
+    with TestClient(app_module.app) as client, client.websocket_connect("/ws") as ws:
+        ws.send_json(auth)
+        assert ws.receive_json()["type"] == "auth_ok"
+
+        ws.send_bytes(_ws_event(key, 1, {**healed, "context": {"note": "x" * 128}, "id": 1}))
+        assert ws.receive_json() == {"type": "decision", "id": None, "accepted": False, "reason": "event_too_large"}
+
+        monkeypatch.setattr(app_module, "_emergency_stop", True)
+        ws.send_bytes(_ws_event(key, 2, {**healed, "id": 2}))
+        assert ws.receive_json()["reason"] == "emergency_stop_enabled"
+
+        lines = set(client.get("/metrics").text.splitlines())
+        assert 'pishock_events_total{event_type="unknown",accepted="false",reason="event_too_large"} 1' in lines
+        assert 'pishock_events_total{event_type="player_healed",accepted="false",reason="emergency_stop_enabled"} 1' in lines
@@ -50,3 +50,27 @@ def test_load_config_missing_file_has_setup_hint() -> None:
         message = str(exc)
         assert "config_file_not_found" in message
         assert "python -m middleware.setup_wizard" in message
+
+
+def test_load_config_rejects_sections_with_the_wrong_shape() -> None:
+    base = Path(".tmp_test_config") / str(uuid.uuid4())
+    valid = """
+security:
+  hmac_secret: test-secret
+policy:
+  max_intensity: 20
+  max_duration_ms: 1500
+  default_cooldown_ms: 1000
+"""
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        config_path = base / "config.yaml"
+        for section in ("event_mappings: [1, 2]", "enemy_scaling: [1, 2]", "enemy_scaling:\n  tiers: [1]"):
+            config_path.write_text(valid + section + "\n", encoding="utf-8")
+            try:
+                load_config(config_path)
+                raise AssertionError("expected runtime error")
+            except RuntimeError as exc:
+                assert str(exc).startswith("invalid_config")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
@@ -1,3 +1,5 @@
+import asyncio
+import json
 from pathlib import Path
 import shutil
 import uuid
@@ -6,7 +8,8 @@ import httpx
 import pytest
 
 import middleware.demo_event as demo_event
-from middleware.demo_event import _build_parser, _event_response_hint, _resolve_base_url, _resolve_secret
+from middleware.demo_event import _build_parser, _event_response_hint, _parse_mix, _resolve_base_url, _resolve_secret
+from middleware.security import compute_signature
 
 
 def test_resolve_secret_prefers_explicit_value() -> None:
@@ -195,3 +198,185 @@ def test_main_pishock_operate_failed_prints_guidance_and_exits_4(monkeypatch, ca
     assert "You are in beep mode." in output
     assert "python-pishock" in output
     assert '$env:PISHOCK_RUNTIME_MODE="test"' in output
+
+
+def test_main_uds_option_routes_client_through_unix_socket(monkeypatch) -> None:
+    transports: list[object] = []
+
+    class FakeClient:
+        def __init__(self, transport=None, **_kwargs):
+            transports.append(transport)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_args):
+            return None
+
+        def get(self, _url: str):
+            return httpx.Response(200, json={"runtime_mode": "test"})
+
+        def post(self, _url: str, **_kwargs):
+            return httpx.Response(200, json={"accepted": True, "reason": "ok"})
+
+    monkeypatch.setattr(demo_event.httpx, "Client", FakeClient)
+
+    demo_event.main(["--secret", "s", "--skip-arm", "--uds", "/tmp/middleware.sock"])
+
+    assert isinstance(transports[0], httpx.HTTPTransport)
+
+
+def test_main_prints_server_timing_and_correlation_id(monkeypatch, capsys) -> None:
+    class FakeClient:
+        def __init__(self, **_kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_args):
+            return None
+
+        def get(self, _url: str):
+            return httpx.Response(200, json={"runtime_mode": "test"})
+
+        def post(self, _url: str, **_kwargs):
+            return httpx.Response(
+                200,
+                json={"accepted": True, "reason": "ok"},
+                headers={"server-timing": "verify;dur=0.01, policy;dur=0.02, total;dur=0.4", "x-correlation-id": "c1"},
+            )
+
+    monkeypatch.setattr(demo_event.httpx, "Client", FakeClient)
+
+    demo_event.main(["--secret", "s", "--skip-arm"])
+
+    assert "event_timing verify=0.01ms policy=0.02ms total=0.4ms correlation_id=c1" in capsys.readouterr().out
+
+
+def test_parse_mix_reads_weights_and_drops_zero_entries() -> None:
+    assert _parse_mix("player_damaged=5, player_healed=0,player_hard_mode_tick") == [
+        ("player_damaged", 5.0),
+        ("player_hard_mode_tick", 1.0),
+    ]
+    with pytest.raises(ValueError):
+        _parse_mix("player_damaged=0")
+
+
+def test_run_load_reports_outcomes_by_reason_and_errors() -> None:
+    armed: list[str] = []
+    disarmed: list[str] = []
+    seen: list[dict] = []
+
+    async def stand_in(scope, receive, send) -> None:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        status, payload = 200, {"accepted": True}
+        if scope["path"] == "/health":
+            payload = {"dry_run_effective": True}
+        elif scope["path"].startswith("/arm/"):
+            armed.append(scope["path"].removeprefix("/arm/"))
+        elif scope["path"].startswith("/disarm/"):
+            disarmed.append(scope["path"].removeprefix("/disarm/"))
+        else:
+            headers = dict(scope["headers"])
+            assert headers[b"x-signature"].decode() == compute_signature("secret", body)
+            event = json.loads(body)
+            seen.append(event)
+            if event["event_type"] == "player_healed":
+                payload = {"accepted": False, "reason": "cooldown_active"}
+            elif event["event_type"] == "player_hard_mode_tick":
+                assert 0 <= event["context"]["enemy_count"] <= 4
+                status, payload = 503, {"detail": "busy"}
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    async def run() -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+            return await demo_event.run_load(
+                client,
+                "http://test",
+                "secret",
+                sessions=3,
+                rate=400.0,
+                duration_s=0.1,
+                concurrency=4,
+                max_enemies=4,
+                seed=1,
+            )
+
+    summary = asyncio.run(run())
+
+    assert sorted(armed) == sorted(disarmed) == ["load-0", "load-1", "load-2"]
+    assert (summary["disarmed"], summary["disarm_errors"]) == (3, {})
+    assert summary["requests"] == len(seen) == 40
+    counts = {"player_damaged": 0, "player_healed": 0, "player_hard_mode_tick": 0}
+    for event in seen:
+        counts[event["event_type"]] += 1
+    assert summary["accepted"] == counts["player_damaged"]
+    assert summary["blocked"] == {"cooldown_active": counts["player_healed"]}
+    assert summary["errors"] == {"http_503": counts["player_hard_mode_tick"]}
+    assert {event["session_id"] for event in seen} <= set(armed)
+    assert 0 < summary["latency_p50_ms"] <= summary["latency_p95_ms"] <= summary["latency_p99_ms"]
+
+
+def test_run_load_disarms_sessions_when_the_run_is_interrupted(capsys) -> None:
+    paths: list[str] = []
+
+    async def stand_in(scope, receive, send) -> None:
+        while (await receive()).get("more_body"):
+            pass
+        paths.append(scope["path"])
+        if scope["path"] == "/event":
+            raise KeyboardInterrupt
+        status, payload = 200, {"dry_run_effective": True}
+        if scope["path"] == "/disarm/load-1":
+            status = 500
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    async def run() -> None:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+            await demo_event.run_load(client, "http://test", "secret", sessions=2, rate=100.0, duration_s=0.05)
+
+    with pytest.raises(KeyboardInterrupt):
+        asyncio.run(run())
+
+    assert sorted(path for path in paths if path.startswith("/disarm/")) == ["/disarm/load-0", "/disarm/load-1"]
+    assert "load_disarm_failed sessions=1 errors={'disarm_http_500': 1}" in capsys.readouterr().err
+
+
+def test_load_refuses_live_middleware_without_allow_live(monkeypatch, capsys) -> None:
+    requests: list[str] = []
+
+    async def stand_in(scope, receive, send) -> None:
+        requests.append(scope["path"])
+        body = {"runtime_mode": "live", "dry_run_effective": False, "pishock_client_mode": "live"}
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+    real_client = httpx.AsyncClient
+
+    def client_factory(**kwargs):
+        kwargs.pop("transport", None)
+        return real_client(transport=httpx.ASGITransport(app=stand_in), **kwargs)
+
+    monkeypatch.setattr(demo_event.httpx, "AsyncClient", client_factory)
+
+    with pytest.raises(SystemExit) as exc:
+        demo_event.main(["--load", "--secret", "secret", "--duration-s", "0.05"])
+
+    assert str(exc.value).startswith("load_refused_live_pishock")
+    assert requests == ["/health"]
+
+    async def run() -> None:
+        async with real_client(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+            with pytest.raises(RuntimeError):
+                await demo_event.run_load(client, "http://test", "secret", duration_s=0.05)
+
+    asyncio.run(run())
+    assert requests == ["/health", "/health"]
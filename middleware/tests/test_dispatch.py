@@ -0,0 +1,173 @@
+import asyncio
+import threading
+
+import pytest
+
+from middleware.dispatch import (
+    DISPATCH_QUEUE_FULL,
+    STATUS_CANCELLED,
+    STATUS_COMPLETED,
+    DispatchExecutor,
+    DispatchQueueFull,
+    DispatchScheduler,
+)
+
+
+def test_dispatch_executor_runs_calls_on_dedicated_threads() -> None:
+    executor = DispatchExecutor(workers=1, queue_depth=1)
+    try:
+        name = asyncio.run(executor.run(lambda: threading.current_thread().name))
+
+        assert name.startswith("pishock-dispatch")
+        stats = executor.stats()
+        assert stats["submitted"] == 1
+        assert stats["completed"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["service_ms_max"] >= 0.0
+    finally:
+        executor.shutdown()
+
+
+def test_dispatch_executor_releases_slot_of_cancelled_queued_call() -> None:
+    executor = DispatchExecutor(workers=1, queue_depth=1)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        assert executor.stats()["queue_depth"] == 0
+        release.set()
+        assert await running is True
+        assert await executor.run(lambda: "after") == "after"
+
+    try:
+        asyncio.run(scenario())
+        stats = executor.stats()
+        assert (stats["queue_depth"], stats["running"], stats["completed"]) == (0, 0, 2)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_dispatch_executor_fails_fast_when_queue_is_full() -> None:
+    executor = DispatchExecutor(workers=1, queue_depth=1)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queue_depth"] == 1
+        assert executor.stats()["running"] == 1
+
+        with pytest.raises(DispatchQueueFull) as exc:
+            await executor.run(lambda: "rejected")
+        assert str(exc.value) == DISPATCH_QUEUE_FULL
+
+        release.set()
+        assert await running is True
+        assert await queued == "queued"
+
+    try:
+        asyncio.run(scenario())
+        stats = executor.stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["wait_ms_max"] > 0.0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_dispatch_scheduler_records_results_and_evicts_finished_records() -> None:
+    scheduler = DispatchScheduler(max_records=2)
+
+    def result(value: int):
+        async def run(_record) -> dict:
+            return {"value": value}
+
+        return run
+
+    async def scenario() -> list:
+        records = []
+        for value in range(3):
+            records.append(scheduler.submit("s1", "player_healed", result(value)))
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        return records
+
+    first, second, third = asyncio.run(scenario())
+
+    assert scheduler.get(first.dispatch_id) is None
+    assert scheduler.get(second.dispatch_id).result == {"value": 1}
+    assert scheduler.get(third.dispatch_id).as_dict()["status"] == STATUS_COMPLETED
+
+
+def test_dispatch_scheduler_shutdown_cancels_pending_dispatches() -> None:
+    scheduler = DispatchScheduler()
+
+    async def scenario():
+        record = scheduler.submit("s1", "player_hard_mode_tick", lambda _record: asyncio.sleep(10, result={}))
+        await asyncio.sleep(0)
+        assert scheduler.pending_count() == 1
+        await scheduler.shutdown()
+        return record
+
+    record = asyncio.run(scenario())
+
+    assert record.status == STATUS_CANCELLED
+    assert scheduler.pending_count() == 0
+
+
+def test_dispatch_scheduler_cancels_pending_pulses_by_session() -> None:
+    scheduler = DispatchScheduler()
+    sent: list[str] = []
+
+    def pulse_train(label: str):
+        async def run(record) -> dict:
+            for _ in range(record.operations_planned):
+                record.operations_started += 1
+                sent.append(label)
+                await asyncio.sleep(0.05)
+            return {"sent": record.operations_started}
+
+        return run
+
+    async def scenario():
+        first = scheduler.submit("s1", "player_hard_mode_tick", pulse_train("s1"), operations=4)
+        other = scheduler.submit("s2", "player_hard_mode_tick", pulse_train("s2"), operations=2)
+        await asyncio.sleep(0.01)
+        cancelled = await scheduler.cancel_session("s1")
+        await scheduler.wait(other)
+        return first, other, cancelled
+
+    first, other, cancelled = asyncio.run(scenario())
+
+    assert first.status == STATUS_CANCELLED
+    assert first.operations_started == 1
+    assert cancelled.dispatches == 1
+    assert cancelled.operations == 3
+    assert cancelled.latency_ms < 50
+    assert other.status == STATUS_COMPLETED
+    assert sent.count("s1") == 1
+    assert scheduler.stats()["cancelled_operations"] == 3
+
+
+def test_dispatch_scheduler_cancel_before_first_step_is_recorded() -> None:
+    scheduler = DispatchScheduler()
+
+    async def scenario():
+        record = scheduler.submit("s1", "player_healed", lambda _record: asyncio.sleep(1, result={}))
+        cancelled = await scheduler.cancel_all()
+        return record, cancelled
+
+    record, cancelled = asyncio.run(scenario())
+
+    assert record.status == STATUS_CANCELLED
+    assert cancelled.dispatches == 1
+    assert scheduler.pending_count() == 0
@@ -1,9 +1,27 @@
+import argparse
+import asyncio
 import json
 from pathlib import Path
+import random
 import shutil
+import threading
+import time
 import uuid
 
-from middleware.file_ingest import encode_signed_event, stream_jsonl
+import httpx
+import pytest
+
+import middleware.file_ingest as file_ingest_module
+from middleware.file_ingest import (
+    CheckpointCommitter,
+    IngestCheckpoint,
+    PipelinedSender,
+    encode_signed_event,
+    iter_jsonl_mmap,
+    replay_events,
+    stream_jsonl,
+)
+from middleware.file_watch import PollingWaiter, build_waiter, inotify_available
 from middleware.security import compute_signature
 
 
@@ -43,3 +61,310 @@ def test_encode_signed_event_uses_compact_json_body_for_hmac() -> None:
 
     assert body == json.dumps(event, separators=(",", ":")).encode("utf-8")
     assert signature == compute_signature("secret", body)
+
+
+def test_stream_jsonl_waits_for_the_rest_of_a_partially_written_line() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text('{"event_type":"player_dam', encoding="utf-8")
+
+        def finish_line() -> None:
+            time.sleep(0.05)
+            with source.open("a", encoding="utf-8") as handle:
+                handle.write('aged"}\n')
+
+        writer = threading.Thread(target=finish_line)
+        writer.start()
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll")
+        event = next(generator)
+        writer.join()
+        assert event["event_type"] == "player_damaged"
+        generator.close()
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_polling_waiter_backs_off_and_resets() -> None:
+    waiter = PollingWaiter(max_interval_s=0.02, min_interval_s=0.005)
+    intervals = []
+    for _ in range(4):
+        intervals.append(waiter._interval_s)
+        waiter.wait()
+    waiter.reset()
+
+    assert intervals == [0.005, 0.01, 0.02, 0.02]
+    assert waiter._interval_s == 0.005
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify unavailable")
+def test_inotify_stream_picks_up_appends_without_poll_delay() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text("", encoding="utf-8")
+        appended_at: list[float] = []
+
+        def append() -> None:
+            time.sleep(0.1)
+            with source.open("a", encoding="utf-8") as handle:
+                appended_at.append(time.perf_counter())
+                handle.write('{"event_type":"player_healed"}\n')
+
+        writer = threading.Thread(target=append)
+        writer.start()
+        generator = stream_jsonl(source, poll_interval_s=5.0, watch="inotify")
+        event = next(generator)
+        received = time.perf_counter()
+        writer.join()
+        generator.close()
+
+        assert event["event_type"] == "player_healed"
+        assert received - appended_at[0] < 1.0
+        waiter = build_waiter(source, "auto")
+        assert waiter.mode == "inotify"
+        waiter.close()
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_pipelined_sender_keeps_session_order_within_window() -> None:
+    received: list[tuple[str, int]] = []
+    in_flight = 0
+    peak = 0
+    rng = random.Random(7)
+
+    async def stand_in(scope, receive, send) -> None:
+        nonlocal in_flight, peak
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        event = json.loads(body)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(rng.uniform(0, 0.004))
+        in_flight -= 1
+        received.append((event["session_id"], event["ts_ms"]))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    events = [{"event_type": "player_healed", "ts_ms": index, "session_id": f"s{index % 5}"} for index in range(60)]
+
+    async def run() -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+            sender = PipelinedSender(client, "/event", "secret", concurrency=3, on_response=lambda _resp: None)
+            for event in events:
+                await sender.submit(event)
+            assert sender.stats()["backlog"] > 0
+            await sender.join()
+            return sender.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats == {"backlog": 0, "in_flight": 0, "sessions": 0, "sent": 60, "failed": 0}
+    assert 1 < peak <= 3
+    for session_id in {f"s{index}" for index in range(5)}:
+        order = [ts_ms for received_session, ts_ms in received if received_session == session_id]
+        assert order == sorted(order) and len(order) == 12
+
+
+def _lines(*indexes: int) -> str:
+    return "".join(json.dumps({"index": index}) + "\n" for index in indexes)
+
+
+def test_checkpoint_resumes_after_restart_and_batches_writes() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text(_lines(*range(250)), encoding="utf-8")
+        checkpoint = IngestCheckpoint(base / "ingest.checkpoint", flush_every=100, flush_interval_s=3600)
+
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll", checkpoint=checkpoint)
+        assert [next(generator)["index"] for _ in range(250)] == list(range(250))
+        assert checkpoint.writes == 2
+        generator.close()
+
+        with source.open("a", encoding="utf-8") as handle:
+            handle.write(_lines(250))
+        resumed = IngestCheckpoint.load(base / "ingest.checkpoint")
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll", checkpoint=resumed, from_end=True)
+        assert next(generator)["index"] == 249
+        assert next(generator)["index"] == 250
+        generator.close()
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_pipelined_checkpoint_only_advances_past_sent_events_in_file_order() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text(
+            "".join(json.dumps({"index": index, "session_id": f"s{index % 2}"}) + "\n" for index in range(4)),
+            encoding="utf-8",
+        )
+        checkpoint = IngestCheckpoint(base / "ingest.checkpoint", flush_every=1)
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll", checkpoint=checkpoint, positions=True)
+        items = [next(generator) for _ in range(4)]
+        generator.close()
+        # The reader only reports positions; nothing is recorded until a send finishes.
+        assert checkpoint.offset == 0 and checkpoint.writes == 0
+        offsets = [offset for _event, _identity, offset in items]
+
+        release_s0 = asyncio.Event()
+
+        async def stand_in(scope, receive, send) -> None:
+            body = b""
+            while True:
+                message = await receive()
+                body += message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+            if json.loads(body)["session_id"] == "s0":
+                await release_s0.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        async def run() -> None:
+            committer = CheckpointCommitter(checkpoint)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+                sender = PipelinedSender(client, "/event", "secret", concurrency=4, on_response=lambda _resp: None)
+                for event, identity, offset in items:
+                    seq = committer.track(identity, offset)
+                    await sender.submit(event, on_done=lambda seq=seq: committer.complete(seq))
+                await asyncio.sleep(0.05)
+                # s1 events are sent, but s0's first event is still in flight.
+                assert checkpoint.offset == 0
+                release_s0.set()
+                await sender.join()
+
+        asyncio.run(run())
+
+        assert checkpoint.offset == offsets[-1]
+        assert json.loads((base / "ingest.checkpoint").read_text(encoding="utf-8"))["offset"] == offsets[-1]
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_pipelined_ingest_stops_when_the_reader_thread_fails(monkeypatch) -> None:
+    def broken_source(*_args, **_kwargs):
+        raise PermissionError("events.jsonl")
+        yield
+
+    monkeypatch.setattr(file_ingest_module, "_source_events", broken_source)
+    args = argparse.Namespace(
+        checkpoint="",
+        concurrency=2,
+        uds=None,
+        url="http://127.0.0.1:9/event",
+        secret="secret",
+        report_interval_s=0.1,
+    )
+
+    with pytest.raises(RuntimeError, match="file_ingest_reader_failed: PermissionError"):
+        asyncio.run(asyncio.wait_for(file_ingest_module._run_pipelined(args, Path("events.jsonl")), timeout=5))
+
+
+def test_from_end_skips_existing_lines() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text(_lines(0, 1), encoding="utf-8")
+
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll", from_end=True)
+        threading.Timer(0.05, lambda: source.open("a", encoding="utf-8").write(_lines(2))).start()
+        assert next(generator)["index"] == 2
+        generator.close()
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_stream_jsonl_follows_truncation_and_rotation() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text(_lines(0, 1), encoding="utf-8")
+        checkpoint = IngestCheckpoint(base / "ingest.checkpoint")
+
+        generator = stream_jsonl(source, poll_interval_s=0.01, watch="poll", checkpoint=checkpoint)
+        assert [next(generator)["index"] for _ in range(2)] == [0, 1]
+
+        source.write_text(_lines(10), encoding="utf-8")
+        assert next(generator)["index"] == 10
+
+        source.rename(base / "events.jsonl.1")
+        source.write_text(_lines(20, 21), encoding="utf-8")
+        assert [next(generator)["index"] for _ in range(2)] == [20, 21]
+        generator.close()
+
+        saved = json.loads((base / "ingest.checkpoint").read_text(encoding="utf-8"))
+        assert saved["inode"] == source.stat().st_ino
+        assert saved["offset"] == len(_lines(20))
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_iter_jsonl_mmap_reads_whole_file_once() -> None:
+    base = Path(".tmp_test_file_ingest") / str(uuid.uuid4())
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        source = base / "events.jsonl"
+        source.write_text('{"index":0}\n{"bad"\n\n{"index":1}', encoding="utf-8-sig")
+        empty = base / "empty.jsonl"
+        empty.write_bytes(b"")
+
+        assert [event["index"] for event in iter_jsonl_mmap(source)] == [0, 1]
+        assert list(iter_jsonl_mmap(empty)) == []
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def test_replay_events_keeps_recorded_spacing_scaled_by_speed() -> None:
+    received: list[int] = []
+
+    async def stand_in(scope, receive, send) -> None:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        received.append(json.loads(body)["ts_ms"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    # 200 ms of recorded play; ts 45 is out of order and must not pull the schedule back.
+    events = [{"event_type": "player_healed", "ts_ms": ts_ms, "session_id": "s1"} for ts_ms in range(0, 201, 20)]
+    events.insert(3, {"event_type": "player_healed", "ts_ms": 45, "session_id": "s1"})
+
+    async def run(speed: float) -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), base_url="http://test") as client:
+            sender = PipelinedSender(client, "/event", "secret", concurrency=2, on_response=lambda _resp: None)
+            return await replay_events(events, sender, speed=speed)
+
+    paced = asyncio.run(run(2.0))
+
+    assert received == [event["ts_ms"] for event in events]
+    assert paced["events"] == paced["sent"] == len(events)
+    assert paced["recorded_span_s"] == 0.2
+    assert paced["target_duration_s"] == 0.1
+    assert paced["elapsed_s"] >= 0.1
+    assert paced["target_rate_eps"] == 120.0
+    assert 0 <= paced["lag_p50_ms"] <= paced["lag_p95_ms"] <= paced["lag_p99_ms"] <= paced["lag_max_ms"]
+
+    received.clear()
+    flat_out = asyncio.run(run(0.0))
+
+    assert len(received) == len(events)
+    assert flat_out["speed"] == "max"
+    assert flat_out["target_rate_eps"] is None
+    assert flat_out["elapsed_s"] < 0.1
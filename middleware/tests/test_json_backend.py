@@ -0,0 +1,24 @@
+import importlib
+import json
+import sys
+
+import middleware.json_backend as json_backend
+
+
+def test_dumps_matches_stdlib_compact_output() -> None:
+    value = {"accepted": True, "reason": "ok", "dispatched": {"op": "vibrate", "intensity": 12}, "note": "café"}
+    assert json.loads(json_backend.dumps(value)) == value
+    assert json_backend.loads(json_backend.dumps(value)) == value
+    assert json_backend.FastJSONResponse(value).body == json_backend.dumps(value)
+
+
+def test_stdlib_fallback_when_orjson_is_missing(monkeypatch) -> None:
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    try:
+        fallback = importlib.reload(json_backend)
+        assert fallback.BACKEND == "json"
+        assert fallback.dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode()
+        assert fallback.loads(b'{"a": 1}') == {"a": 1}
+    finally:
+        monkeypatch.undo()
+        importlib.reload(json_backend)
@@ -1,6 +1,8 @@
 import asyncio
+import itertools
 import json
 import logging
+import queue
 import shutil
 import tempfile
 from pathlib import Path
@@ -10,10 +12,21 @@ from fastapi.testclient import TestClient
 
 import middleware.app as app_module
 from middleware.file_ingest import stream_jsonl
-from middleware.logging_config import configure_logging, redact_text
+from middleware.logging_config import (
+    BoundedQueueHandler,
+    SENSITIVE_KEYS,
+    RedactionFilter,
+    configure_logging,
+    log_fields,
+    logging_queue_stats,
+    read_json_logs,
+    redact_text,
+    shutdown_logging,
+)
 from middleware.pishock import BeepOnlyPiShockClient, DryRunPiShockClient
 from middleware.runtime_mode import RuntimeMode
-from middleware.security import compute_signature
+from middleware.security import ReplayCache, compute_signature
+from middleware.tests.reference_impls import REDACTION_SAMPLES, reference_redact_text
 
 
 class FakeOperateClient:
@@ -59,6 +72,86 @@ def test_redaction_filter_masks_secrets() -> None:
         assert leaked not in text
 
 
+def test_single_pass_redaction_matches_reference_implementation() -> None:
+    extra = (
+        "authorization: Bearer abc, other=1",
+        '"authorization": "Bearer abc"',
+        "X-Signature: sha256=abc]",
+        'Token = "abc def"',
+        "mytoken=not-a-key",
+    )
+    for sample in REDACTION_SAMPLES + extra:
+        assert redact_text(sample) == reference_redact_text(sample)
+
+
+def _assert_hides_what_reference_hides(sample: str, values: tuple[str, ...]) -> None:
+    current = redact_text(sample)
+    reference = reference_redact_text(sample)
+    for value in values:
+        if value not in reference:
+            assert value not in current, (sample, current)
+
+
+def test_single_pass_redaction_matches_reference_across_key_forms() -> None:
+    keys = SENSITIVE_KEYS + ("Authorization", "X-Signature")
+    spellings = [form for key in keys for form in (key, key.upper(), key.title(), key[:1].upper() + key[1:])]
+    templates = (
+        "{key}=v4lue-1",
+        "{key}: v4lue-1",
+        "{key} = v4lue-1,next=2",
+        '{key}="quoted v4lue"',
+        "{key}='single v4lue'",
+        '"{key}":"json-v4lue"',
+        '"{key}": "json v4lue", "other": 1',
+        "{{'{key}': 'repr-v4lue'}}",
+        '{{"{key}":1234}}',
+        "[{key}=bracket-v4lue]",
+        "x{key}=not-a-key",
+        "{key}_suffix=not-a-key",
+    )
+    for key, template in itertools.product(spellings, templates):
+        sample = template.format(key=key)
+        # The reference's trailing authorization/x-signature pass re-matches
+        # 'key="[REDACTED]"' and drops the quotes; the single pass keeps them.
+        if key.lower() in {"authorization", "x-signature"} and template in ('{key}="quoted v4lue"', "{key}='single v4lue'"):
+            _assert_hides_what_reference_hides(sample, ("quoted", "single", "v4lue"))
+            continue
+        assert redact_text(sample) == reference_redact_text(sample), sample
+
+    # Adjacent and overlapping keys ("secret" inside "hmac_secret", one key as
+    # another's value). The reference can leave "[REDACTED][REDACTED]" where
+    # one pass stops at an earlier replacement, so only compare what leaks.
+    for first, second in itertools.permutations(keys, 2):
+        for joiner in (" ", ",", "&", ";", ", "):
+            for sample in (
+                f"{first}=v4lue-a{joiner}{second}=v4lue-b",
+                f'"{first}":"v4lue-a"{joiner}"{second}":"v4lue-b"',
+                f"{first}={second}=v4lue-b",
+                f"{first}{second}=v4lue-b",
+            ):
+                _assert_hides_what_reference_hides(sample, ("v4lue-a", "v4lue-b"))
+
+
+def test_redaction_filter_runs_once_per_record(monkeypatch) -> None:
+    import middleware.logging_config as logging_config_module
+
+    calls: list[str] = []
+    original = logging_config_module.redact_text
+
+    def counting_redact(value: object) -> str:
+        calls.append(str(value))
+        return original(value)
+
+    monkeypatch.setattr(logging_config_module, "redact_text", counting_redact)
+    redaction_filter = RedactionFilter()
+    record = logging.LogRecord("middleware.tests", logging.INFO, __file__, 1, "api_key=%s", ("abc123",), None)
+
+    assert redaction_filter.filter(record)
+    assert redaction_filter.filter(record)
+    assert calls == ["api_key=abc123"]
+    assert record.getMessage() == "api_key=[REDACTED]"
+
+
 def test_logs_directory_and_file_creation_works() -> None:
     temp_dir, log_path = _temp_log_path()
     try:
@@ -71,6 +164,129 @@ def test_logs_directory_and_file_creation_works() -> None:
         temp_dir.cleanup()
 
 
+def test_queue_logging_writes_redacted_records_after_shutdown_flush() -> None:
+    temp_dir, log_path = _temp_log_path()
+    try:
+        configure_logging(log_path, force=True, use_queue=True, queue_size=100)
+        assert logging_queue_stats()["enabled"] is True
+
+        logging.getLogger("middleware.tests").info("queued message api_key=%s", "queued-secret")
+        shutdown_logging()
+
+        log_text = log_path.read_text(encoding="utf-8")
+        assert "queued message api_key=[REDACTED]" in log_text
+        assert "queued-secret" not in log_text
+        assert logging_queue_stats()["enabled"] is False
+
+        logging.getLogger("middleware.tests").info("after shutdown")
+        assert "after shutdown" in log_path.read_text(encoding="utf-8")
+    finally:
+        configure_logging(log_path, force=True)
+        temp_dir.cleanup()
+
+
+def test_bounded_queue_handler_drops_oldest_and_counts() -> None:
+    log_queue: queue.Queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue, overflow="drop_oldest")
+
+    for index in range(4):
+        handler.handle(logging.LogRecord("middleware.tests", logging.INFO, __file__, 1, f"m{index}", (), None))
+
+    assert handler.dropped == 2
+    assert [log_queue.get_nowait().getMessage() for _ in range(2)] == ["m2", "m3"]
+
+
+def test_bounded_queue_handler_drop_newest_keeps_queued_records() -> None:
+    log_queue: queue.Queue = queue.Queue(maxsize=1)
+    handler = BoundedQueueHandler(log_queue, overflow="drop_newest")
+
+    for index in range(3):
+        handler.handle(logging.LogRecord("middleware.tests", logging.INFO, __file__, 1, f"m{index}", (), None))
+
+    assert handler.dropped == 2
+    assert log_queue.get_nowait().getMessage() == "m0"
+
+
+def test_json_log_format_writes_typed_redacted_fields() -> None:
+    temp_dir, log_path = _temp_log_path()
+    try:
+        configure_logging(log_path, force=True, log_format="json")
+        logging.getLogger("middleware.tests").warning(
+            log_fields(
+                "event blocked",
+                event_type="player_damaged",
+                session_id="run-1",
+                intensity=7,
+                final_armed=False,
+                policy_ms=0.25,
+                api_key="json-field-secret",
+                error_detail="share_code=detail-secret",
+            )
+        )
+
+        records = [record for record in read_json_logs(log_path) if record["message"] == "event blocked"]
+        assert len(records) == 1
+        record = records[0]
+        assert record["level"] == "WARNING"
+        assert record["event_type"] == "player_damaged"
+        assert record["intensity"] == 7
+        assert record["final_armed"] is False
+        assert record["policy_ms"] == 0.25
+        assert record["api_key"] == "[REDACTED]"
+        assert record["error_detail"] == "share_code=[REDACTED]"
+        log_text = log_path.read_text(encoding="utf-8")
+        assert "json-field-secret" not in log_text
+        assert "detail-secret" not in log_text
+    finally:
+        configure_logging(log_path, force=True)
+        temp_dir.cleanup()
+
+
+def test_structured_fields_render_as_key_value_text() -> None:
+    temp_dir, log_path = _temp_log_path()
+    try:
+        configure_logging(log_path, force=True)
+        logging.getLogger("middleware.tests").info(log_fields("event parsed", session_id="run-1", final_armed=True))
+
+        assert "event parsed session_id=run-1 final_armed=true" in log_path.read_text(encoding="utf-8")
+    finally:
+        temp_dir.cleanup()
+
+
+def test_structured_fields_are_not_rendered_for_filtered_records() -> None:
+    rendered: list[str] = []
+
+    class Probe:
+        def __str__(self) -> str:
+            rendered.append("probe")
+            return "probe"
+
+    temp_dir, log_path = _temp_log_path()
+    try:
+        configure_logging(log_path, force=True, level="WARNING")
+        logging.getLogger("middleware.tests").info(log_fields("quiet", value=Probe()))
+
+        assert rendered == []
+    finally:
+        configure_logging(log_path, force=True)
+        temp_dir.cleanup()
+
+
+def test_read_json_logs_reads_rotated_files_oldest_first() -> None:
+    temp_dir, log_path = _temp_log_path()
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        log_path.with_name("middleware.log.2").write_text('{"message":"oldest"}\n', encoding="utf-8")
+        log_path.with_name("middleware.log.1").write_text(
+            'plain text line\n{"message":"middle"}\n{"broken"\n', encoding="utf-8"
+        )
+        log_path.write_text('{"message":"newest"}\n', encoding="utf-8")
+
+        assert [record["message"] for record in read_json_logs(log_path)] == ["oldest", "middle", "newest"]
+    finally:
+        temp_dir.cleanup()
+
+
 def test_startup_logging_does_not_expose_secrets(monkeypatch) -> None:
     temp_dir, log_path = _temp_log_path()
     try:
@@ -118,6 +334,35 @@ def test_event_rejection_logs_reason_without_signature_or_secret() -> None:
         temp_dir.cleanup()
 
 
+def test_event_correlation_id_tags_app_and_pishock_records_through_the_queue(monkeypatch) -> None:
+    temp_dir, log_path = _temp_log_path()
+    session_id = f"corr-{next(tempfile._get_candidate_names())}"
+    try:
+        configure_logging(log_path, force=True, use_queue=True, log_format="json")
+        monkeypatch.setitem(app_module._sessions_armed, session_id, True)
+        payload = {"event_type": "player_healed", "ts_ms": 1, "session_id": session_id, "armed": True}
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        sig = compute_signature(app_module._config.hmac_secret, body)
+
+        res = TestClient(app_module.app).post(
+            "/event",
+            content=body,
+            headers={"x-signature": sig, "content-type": "application/json", "x-correlation-id": "game-42"},
+        )
+        logging.getLogger("middleware.tests").info("outside any request %s", "plain")
+        shutdown_logging()
+
+        assert res.json()["accepted"] is True
+        assert res.headers["x-correlation-id"] == "game-42"
+        tagged = {record["message"]: record.get("correlation_id") for record in read_json_logs(log_path)}
+        for message in ("event request received", "policy allowed", "dry-run operation", "event accepted"):
+            assert tagged[message] == "game-42", message
+        assert tagged["outside any request plain"] is None
+    finally:
+        configure_logging(log_path, force=True)
+        temp_dir.cleanup()
+
+
 def test_event_policy_failure_response_does_not_expose_secret(monkeypatch) -> None:
     temp_dir, log_path = _temp_log_path()
     secret_value = "policy-secret-value"
@@ -174,6 +419,7 @@ def test_event_pishock_failure_response_does_not_expose_secret(monkeypatch) -> N
             raise RuntimeError(f"share_code={secret_value}")
 
         monkeypatch.setattr(app_module._client, "operate", fail_operate)
+        monkeypatch.setattr(app_module, "_replay_cache", ReplayCache())
         payload = {
             "event_type": "player_healed",
             "ts_ms": 1,
@@ -0,0 +1,28 @@
+from middleware.metrics import Counter, EventMetrics, Histogram
+
+
+def test_histogram_buckets_are_cumulative_when_rendered() -> None:
+    histogram = Histogram("stage_seconds", "Stage time.", "stage", buckets=(0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 0.5):
+        histogram.observe("policy", value)
+
+    lines = list(histogram.render())
+
+    assert lines[:2] == ["# HELP stage_seconds Stage time.", "# TYPE stage_seconds histogram"]
+    assert lines[2:] == [
+        'stage_seconds_bucket{stage="policy",le="0.001"} 2',
+        'stage_seconds_bucket{stage="policy",le="0.01"} 3',
+        'stage_seconds_bucket{stage="policy",le="+Inf"} 4',
+        'stage_seconds_sum{stage="policy"} 0.5065',
+        'stage_seconds_count{stage="policy"} 4',
+    ]
+
+
+def test_counter_escapes_label_values_and_render_appends_gauges() -> None:
+    counter = Counter("events_total", "Events.", ("reason",))
+    counter.inc('quote"and\\slash')
+    counter.inc('quote"and\\slash', amount=2)
+    assert list(counter.render())[-1] == 'events_total{reason="quote\\"and\\\\slash"} 3'
+
+    text = EventMetrics().render([("armed_sessions", "Armed.", (), [((), 2)])])
+    assert text.endswith("# TYPE armed_sessions gauge\narmed_sessions 2\n")
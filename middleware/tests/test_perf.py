@@ -0,0 +1,187 @@
+"""Latency budgets for the event hot path.
+
+Deselected by default; run with ``python -m pytest -m perf``. Each case is timed
+as the best of several rounds and compared with ``perf_baseline.json``: it fails
+when it is slower than its ``budget_us`` or, without one, than ``baseline_us``
+times the tolerance. ``PISHOCK_PERF_TOLERANCE`` overrides the file's tolerance
+and ``PISHOCK_PERF_UPDATE=1`` records the current timings as the new baseline
+instead of checking them.
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import pytest
+
+import middleware.app as app_module
+from middleware.config import load_config
+from middleware.dispatch import DispatchScheduler
+from middleware.logging_config import configure_logging, redact_text
+from middleware.metrics import EventMetrics
+from middleware.models import GameEvent
+from middleware.pishock import DryRunPiShockClient
+from middleware.policy import PolicyEngine
+from middleware.runtime_mode import RuntimeMode
+from middleware.security import ReplayCache, compute_signature, verify_signature
+from middleware.ttl_store import CooldownStore
+
+pytestmark = pytest.mark.perf
+
+BASELINE_PATH = Path(__file__).with_name("perf_baseline.json")
+TOLERANCE_ENV = "PISHOCK_PERF_TOLERANCE"
+UPDATE_ENV = "PISHOCK_PERF_UPDATE"
+ROUNDS = 5
+
+_EXAMPLE_CONFIG = Path(app_module.__file__).with_name("config.example.yaml")
+_EVENT = {
+    "event_type": "player_damaged",
+    "ts_ms": 1_700_000_000_000,
+    "session_id": "perf",
+    "armed": True,
+    "context": {"damage": 12, "max_hp": 400, "current_hp": 250},
+}
+_LOG_LINE = "policy allowed event_type=player_damaged session_id=perf op=vibrate intensity=12 api_key=hidden"
+
+
+def _best_us(func: Callable[[], object], iterations: int) -> float:
+    func()
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+
+def _policy_engine() -> PolicyEngine:
+    config = load_config(_EXAMPLE_CONFIG)
+    config.allow_shock = True
+    for mapping in config.event_mappings.values():
+        mapping.cooldown_ms = 0
+    config.enemy_scaling.min_tick_ms = 0
+    config.enemy_scaling.bonus_global_cooldown_ms = 0
+    return PolicyEngine(config)
+
+
+def case_policy_evaluate(_request) -> tuple[Callable[[], object], int]:
+    engine = _policy_engine()
+    return (lambda: engine.evaluate("perf", "player_damaged", armed=True, context={"damage": 12})), 5000
+
+
+def case_policy_evaluate_hard_mode(_request) -> tuple[Callable[[], object], int]:
+    engine = _policy_engine()
+    context = {"max_hp": 400, "current_hp": 250, "damage": 40, "enemy_count": 6, "in_combat": True}
+    return (lambda: engine.evaluate("perf", "player_hard_mode_tick", armed=True, context=context)), 5000
+
+
+def case_verify_signature(_request) -> tuple[Callable[[], object], int]:
+    body = json.dumps(_EVENT, separators=(",", ":")).encode()
+    signature = compute_signature("perf-secret", body)
+    return (lambda: verify_signature("perf-secret", body, signature)), 5000
+
+
+def case_redact_text(_request) -> tuple[Callable[[], object], int]:
+    return (lambda: redact_text(_LOG_LINE)), 5000
+
+
+def case_game_event_validate(_request) -> tuple[Callable[[], object], int]:
+    body = json.dumps(_EVENT).encode()
+    return (lambda: GameEvent.model_validate_json(body)), 5000
+
+
+def case_metrics_record(_request) -> tuple[Callable[[], object], int]:
+    metrics = EventMetrics()
+
+    def record() -> None:
+        # What one accepted /event adds: a decision and five stage timings.
+        metrics.record_event("player_damaged", True, "ok")
+        for stage, seconds in (("body_read", 2e-5), ("verify", 4e-6), ("parse", 1e-5), ("policy", 3e-6)):
+            metrics.observe_stage(stage, seconds)
+        metrics.observe_stage("dispatch_primary", 4e-4)
+
+    return record, 5000
+
+
+def case_event_round_trip(request) -> tuple[Callable[[], object], int]:
+    monkeypatch = request.getfixturevalue("monkeypatch")
+    config = load_config(_EXAMPLE_CONFIG)
+    config.event_mappings["player_damaged"].cooldown_ms = 0
+    monkeypatch.setattr(app_module, "_config", config)
+    monkeypatch.setattr(app_module, "_policy", PolicyEngine(config))
+    monkeypatch.setattr(app_module, "_client", DryRunPiShockClient())
+    monkeypatch.setattr(app_module, "_dry_run_client", DryRunPiShockClient())
+    monkeypatch.setattr(app_module, "_runtime_mode", RuntimeMode.TEST)
+    monkeypatch.setattr(app_module, "_scheduler", DispatchScheduler())
+    monkeypatch.setattr(app_module, "_sessions_armed", {"perf": True})
+    monkeypatch.setattr(app_module, "_emergency_stop", False)
+    monkeypatch.setattr(app_module, "_ws_nonces", CooldownStore())
+    monkeypatch.setattr(app_module, "_replay_cache", ReplayCache())
+    monkeypatch.setattr(app_module, "_metrics", EventMetrics())
+    # Thousands of requests would otherwise rotate the operator's logs/middleware.log.
+    configure_logging(request.getfixturevalue("tmp_path") / "perf.log", force=True)
+
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://perf")
+    sequence = iter(range(1, 1 << 62))
+
+    def post() -> None:
+        # A fresh ts_ms per request so every request takes the full path.
+        body = json.dumps({**_EVENT, "ts_ms": int(time.time() * 1000) + next(sequence)}, separators=(",", ":")).encode()
+        headers = {"content-type": "application/json", "x-signature": compute_signature(config.hmac_secret, body)}
+        resp = loop.run_until_complete(client.post("/event", content=body, headers=headers))
+        assert resp.status_code in (200, 202) and resp.json()["accepted"] is True, resp.text
+
+    def close() -> None:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+        configure_logging(force=True)
+
+    request.addfinalizer(close)
+    return post, 300
+
+
+CASES = {
+    "policy_evaluate": case_policy_evaluate,
+    "policy_evaluate_hard_mode": case_policy_evaluate_hard_mode,
+    "verify_signature": case_verify_signature,
+    "redact_text": case_redact_text,
+    "game_event_validate": case_game_event_validate,
+    "metrics_record": case_metrics_record,
+    "event_round_trip": case_event_round_trip,
+}
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    data = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    results: dict[str, float] = {}
+    yield data, results
+    if os.environ.get(UPDATE_ENV) == "1" and results:
+        for name, measured_us in results.items():
+            data["benchmarks"].setdefault(name, {})["baseline_us"] = round(measured_us, 3)
+        BASELINE_PATH.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_latency_within_budget(name: str, baseline, request) -> None:
+    data, results = baseline
+    func, iterations = CASES[name](request)
+    measured_us = _best_us(func, iterations)
+    results[name] = measured_us
+    if os.environ.get(UPDATE_ENV) == "1":
+        return
+
+    entry = data["benchmarks"].get(name)
+    assert entry is not None, f"{name} has no entry in {BASELINE_PATH.name}; run with {UPDATE_ENV}=1"
+    tolerance = float(os.environ.get(TOLERANCE_ENV) or data.get("tolerance", 3.0))
+    budget_us = entry.get("budget_us") or entry["baseline_us"] * tolerance
+    assert measured_us <= budget_us, (
+        f"{name} took {measured_us:.2f} us per call, over its {budget_us:.2f} us budget "
+        f"(baseline {entry['baseline_us']:.2f} us)"
+    )
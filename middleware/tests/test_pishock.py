@@ -82,6 +82,8 @@ def test_pishock_client_uses_shocker_library(monkeypatch):
     status, text = asyncio.run(client.operate(op=1, intensity=10, duration_s=1))
     assert status == 200
     assert "vibrate" in text
+    assert client.dispatch_stats()["completed"] == 1
+    client.close()
 
 
 def test_pishock_client_uses_pishock_api_and_beep_no_intensity(monkeypatch):
@@ -113,6 +115,90 @@ def test_pishock_client_uses_positional_fallback(monkeypatch):
     assert "shock" in text
 
 
+def test_pishock_client_reuses_cached_shocker_and_call_shape(monkeypatch):
+    constructed: list[dict] = []
+    beep_calls: list[dict] = []
+
+    class CountingShocker(FakeShockerBeepNoIntensity):
+        def __init__(self, **kwargs):
+            constructed.append(kwargs)
+            super().__init__(**kwargs)
+
+        def beep(self, **kwargs):
+            beep_calls.append(kwargs)
+            if "intensity" not in kwargs:
+                raise TypeError("intensity required")
+            return {"op": "beep", **kwargs}
+
+    monkeypatch.setitem(sys.modules, "pishock", types.SimpleNamespace(Shocker=CountingShocker))
+    client = PiShockClient({"username": "u", "api_key": "k", "share_code": "code", "name": "n"})
+
+    for _ in range(3):
+        status, _text = asyncio.run(client.operate(op=2, intensity=5, duration_s=1))
+        assert status == 200
+
+    assert len(constructed) == 1
+    # First call probes both shapes; later calls go straight to the resolved one.
+    assert beep_calls == [
+        {"duration": 1},
+        {"duration": 1, "intensity": 5},
+        {"duration": 1, "intensity": 5},
+        {"duration": 1, "intensity": 5},
+    ]
+    assert client.cache_stats() == {"cache_hits": 2, "shocker_builds": 1, "rebuilds": 0, "invalidations": 0}
+
+
+def test_pishock_client_rebuilds_shocker_after_failure(monkeypatch):
+    constructed: list[int] = []
+    failures = [RuntimeError("device offline")]
+
+    class FlakyShocker(FakeShocker):
+        def __init__(self, **kwargs):
+            constructed.append(1)
+            super().__init__(**kwargs)
+
+        def vibrate(self, duration: int, intensity: int):
+            if failures:
+                raise failures.pop()
+            return super().vibrate(duration=duration, intensity=intensity)
+
+    monkeypatch.setitem(sys.modules, "pishock", types.SimpleNamespace(Shocker=FlakyShocker))
+    client = PiShockClient({"username": "u", "api_key": "k", "share_code": "code", "name": "n"})
+
+    try:
+        asyncio.run(client.operate(op=1, intensity=5, duration_s=1))
+        raise AssertionError("expected runtime error")
+    except RuntimeError as exc:
+        assert str(exc) == "device offline"
+
+    status, text = asyncio.run(client.operate(op=1, intensity=5, duration_s=1))
+
+    assert status == 200
+    assert "vibrate" in text
+    assert len(constructed) == 2
+    assert client.cache_stats()["rebuilds"] == 1
+    assert client.cache_stats()["invalidations"] == 1
+
+
+def test_pishock_client_explicit_invalidation_rebuilds_with_resolved_constructor(monkeypatch):
+    api_inits: list[tuple] = []
+
+    class RecordingAPI(FakePiShockAPI):
+        def __init__(self, username: str, api_key: str):
+            api_inits.append((username, api_key))
+            super().__init__(username, api_key)
+
+    monkeypatch.setitem(sys.modules, "pishock", types.SimpleNamespace(PiShockAPI=RecordingAPI, Shocker=FakeShocker))
+    client = PiShockClient({"username": "u", "api_key": "k", "share_code": "code", "name": "n"})
+
+    asyncio.run(client.operate(op=2, intensity=1, duration_s=1))
+    client.invalidate()
+    asyncio.run(client.operate(op=2, intensity=1, duration_s=1))
+
+    assert api_inits == [("u", "k"), ("u", "k")]
+    assert client.cache_stats()["shocker_builds"] == 2
+
+
 def test_pishock_client_requires_credentials():
     try:
         PiShockClient({"username": "u", "api_key": "k", "share_code": ""})
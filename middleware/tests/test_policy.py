@@ -1,5 +1,10 @@
+import pytest
+
+import middleware.policy as policy_module
 from middleware.config import AppConfig, EnemyScalingConfig, EnemyTier, EventMapping
-from middleware.policy import PolicyEngine
+from middleware.policy import PolicyEngine, TierResolver, compile_policy_table
+from middleware.tests.reference_impls import ReferencePolicyEngine
+from middleware.ttl_store import CooldownStore
 
 
 def build_config(allow_shock: bool = False) -> AppConfig:
@@ -234,3 +239,191 @@ def test_invalid_mode_is_rejected() -> None:
     decision = engine.evaluate("s1", "bad_mode", armed=True)
     assert not decision.allowed
     assert decision.reason == "invalid_mode"
+
+
+def test_cooldown_store_evicts_expired_entries_in_deadline_order() -> None:
+    store = CooldownStore()
+
+    assert store.consume(("s1", "player_damaged"), 500, now=10.0)
+    assert store.consume(("s2", "player_damaged"), 1000, now=10.0)
+    assert store.consume(("s3", "player_damaged"), 2000, now=10.0)
+    assert not store.consume(("s1", "player_damaged"), 500, now=10.2)
+    assert len(store) == 3
+
+    assert store.prune(now=11.0) == 2
+    assert store.stats() == {"size": 1, "evictions": 2}
+    assert store.get(("s3", "player_damaged")) == 12.0
+
+    assert store.consume(("s1", "player_damaged"), 500, now=12.5)
+    assert store.stats() == {"size": 1, "evictions": 3}
+
+
+def test_cooldown_store_drops_entries_closest_to_expiry_over_capacity() -> None:
+    store = CooldownStore(max_entries=2)
+
+    assert store.consume(("s1", "player_damaged"), 3000, now=10.0)
+    assert store.consume(("s2", "player_damaged"), 1000, now=10.0)
+    assert store.consume(("s3", "player_damaged"), 2000, now=10.0)
+
+    assert store.stats() == {"size": 2, "evictions": 1}
+    assert store.get(("s2", "player_damaged")) == 0.0
+    assert store.get(("s1", "player_damaged")) == 13.0
+
+
+def test_apply_config_swaps_mappings_and_keeps_cooldowns() -> None:
+    engine = PolicyEngine(build_config())
+    assert engine.evaluate("abc", "player_near_miss", armed=True).allowed
+
+    cfg = build_config()
+    cfg.max_intensity = 5
+    cfg.event_mappings["player_death"] = EventMapping(mode="beep", intensity=1, duration_ms=500, cooldown_ms=0)
+    engine.apply_config(cfg)
+
+    assert engine.config is cfg
+    assert engine.evaluate("abc", "player_near_miss", armed=True).reason == "cooldown_active"
+    assert engine.evaluate("xyz", "player_near_miss", armed=True).intensity == 5
+    assert engine.evaluate("abc", "player_death", armed=True).allowed
+
+
+def test_policy_cooldowns_do_not_grow_with_expired_sessions() -> None:
+    cfg = build_config(allow_shock=True)
+    cfg.event_mappings["player_healed"].cooldown_ms = 0
+    engine = PolicyEngine(cfg)
+
+    for index in range(50):
+        assert engine.evaluate(f"session-{index}", "player_healed", armed=True).allowed
+
+    assert engine.cooldown_stats()["cooldowns"]["size"] <= 1
+    assert engine.cooldown_stats()["cooldowns"]["evictions"] >= 49
+
+
+def test_idle_hard_mode_state_expires_instead_of_resuming(monkeypatch) -> None:
+    clock = [100.0]
+    monkeypatch.setattr(policy_module, "monotonic", lambda: clock[0])
+    cfg = build_config(allow_shock=True)
+    cfg.hard_mode_idle_timeout_ms = 5000
+    engine = PolicyEngine(cfg)
+
+    engine.evaluate("session-hard", "player_hard_mode_tick", armed=True, context={"max_hp": 400, "current_hp": 100, "damage": 300})
+    assert engine.hard_mode_snapshot()["count"] == 1
+
+    clock[0] += 6.0
+    resumed = engine.evaluate(
+        "session-hard",
+        "player_hard_mode_tick",
+        armed=True,
+        context={"max_hp": 400, "current_hp": 200, "damage": 200},
+    )
+
+    assert resumed.reason == "hard_mode_started"
+    snapshot = engine.hard_mode_snapshot()
+    assert snapshot["expired"] == 1
+    assert snapshot["sessions"][0]["initial_missing_hp"] == 200
+
+
+def test_hard_mode_states_are_capped_with_lru_eviction(monkeypatch) -> None:
+    clock = [100.0]
+    monkeypatch.setattr(policy_module, "monotonic", lambda: clock[0])
+    cfg = build_config(allow_shock=True)
+    cfg.hard_mode_max_sessions = 2
+    engine = PolicyEngine(cfg)
+    start = {"max_hp": 100, "current_hp": 50, "damage": 50}
+
+    engine.evaluate("a", "player_hard_mode_tick", armed=True, context=start)
+    clock[0] += 1
+    engine.evaluate("b", "player_hard_mode_tick", armed=True, context=start)
+    clock[0] += 1
+    engine.evaluate("a", "player_hard_mode_tick", armed=True, context={"max_hp": 100, "current_hp": 60})
+    clock[0] += 1
+    engine.evaluate("c", "player_hard_mode_tick", armed=True, context=start)
+
+    snapshot = engine.hard_mode_snapshot()
+    assert [session["session_id"] for session in snapshot["sessions"]] == ["a", "c"]
+    assert snapshot["evicted"] == 1
+    assert snapshot["approx_bytes"] > 0
+
+
+def test_compiled_table_bakes_clamps_and_is_read_only() -> None:
+    cfg = build_config(allow_shock=True)
+    table = compile_policy_table(cfg)
+
+    entry = table["player_damaged"]
+    assert (entry.op, entry.intensity, entry.duration_ms, entry.duration_s) == (0, 20, 1500, 1)
+    assert entry.requires_shock
+    assert not table["player_healed"].requires_shock
+    with pytest.raises(TypeError):
+        table["player_damaged"] = entry  # type: ignore[index]
+
+
+def test_compiled_table_matches_mappings_added_after_startup() -> None:
+    cfg = build_config(allow_shock=False)
+    engine = PolicyEngine(cfg)
+    cfg.event_mappings["late_beep"] = EventMapping(mode="beep", intensity=3, duration_ms=500, cooldown_ms=0)
+
+    decision = engine.evaluate("s1", "late_beep", armed=True)
+
+    assert decision.allowed
+    assert (decision.op, decision.intensity) == (2, 3)
+    assert engine.evaluate("s1", "player_damaged", armed=True).reason == "shock_disabled"
+    cfg.allow_shock = True
+    assert engine.evaluate("s1", "player_damaged", armed=True).allowed
+
+
+def _hard_mode_variants() -> list[AppConfig]:
+    linear = build_config(allow_shock=True)
+    logarithmic = build_config(allow_shock=True)
+    logarithmic.enemy_scaling.use_logarithmic_intensity = True
+    disabled = build_config(allow_shock=True)
+    disabled.enemy_scaling.enabled = False
+    growing_tick = build_config(allow_shock=True)
+    growing_tick.enemy_scaling.tick_reduction_per_enemy_ms = -10
+    growing_tick.enemy_scaling.duration_per_enemy_ms = -30
+    growing_tick.enemy_scaling.tiers = [EnemyTier(min_enemies=4, max_enemies=9, extra_pulses=3)]
+    return [linear, logarithmic, disabled, growing_tick]
+
+
+@pytest.mark.parametrize("cfg", _hard_mode_variants())
+def test_hard_mode_table_matches_reference_math(cfg: AppConfig) -> None:
+    engine = PolicyEngine(cfg)
+    reference = ReferencePolicyEngine(cfg)
+    start = {"max_hp": 1000, "current_hp": 400, "damage": 600}
+
+    for enemy_count in [*range(0, 700), 4095, 4096, 10_000, 1_000_000]:
+        for in_combat in (False, True):
+            session_id = f"s-{enemy_count}-{in_combat}"
+            tick = {"max_hp": 1000, "current_hp": 733, "enemy_count": enemy_count, "in_combat": in_combat}
+            engine.evaluate(session_id, "player_hard_mode_tick", armed=True, context=start)
+            reference.evaluate(session_id, "player_hard_mode_tick", armed=True, context=start)
+
+            expected = reference.evaluate(session_id, "player_hard_mode_tick", armed=True, context=tick)
+            assert engine.evaluate(session_id, "player_hard_mode_tick", armed=True, context=tick) == expected
+
+        row = engine._table["player_hard_mode_tick"].hard_mode.row(enemy_count)
+        expected_cooldown_ms = 500
+        if cfg.enemy_scaling.enabled:
+            expected_cooldown_ms = max(250, 500 - cfg.enemy_scaling.tick_reduction_per_enemy_ms * enemy_count)
+        assert row.cooldown_ms == expected_cooldown_ms
+
+
+def test_hard_mode_table_saturates_and_keeps_scaling_multiplier() -> None:
+    table = compile_policy_table(build_config(allow_shock=True))["player_hard_mode_tick"].hard_mode
+
+    assert table.saturated
+    assert len(table.rows) < 64
+    far = table.row(10_000)
+    last = table.rows[-1]
+    assert (far.cooldown_ms, far.duration_s, far.bonus_pulses) == (last.cooldown_ms, last.duration_s, last.bonus_pulses)
+    assert far.multiplier == pytest.approx(1 + 0.1 * 10_000)
+
+
+def test_tier_resolver_matches_linear_scan() -> None:
+    tiers = [
+        EnemyTier(min_enemies=1, max_enemies=2, extra_pulses=1),
+        EnemyTier(min_enemies=2, max_enemies=6, extra_pulses=3),
+        EnemyTier(min_enemies=10, max_enemies=None, extra_pulses=2),
+        EnemyTier(min_enemies=12, max_enemies=14, extra_pulses=5),
+    ]
+    resolver = TierResolver(tiers)
+
+    for enemy_count in range(0, 30):
+        assert resolver(enemy_count) == ReferencePolicyEngine._tier_bonus_pulses(enemy_count, tiers)
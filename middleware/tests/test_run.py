@@ -0,0 +1,41 @@
+import socket
+import stat
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from middleware.run import bind_unix_socket
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets unavailable")
+
+
+def test_bind_unix_socket_applies_mode_and_replaces_stale_socket() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "middleware.sock"
+        bind_unix_socket(path).close()
+        assert stat.S_ISSOCK(path.lstat().st_mode)
+
+        sock = bind_unix_socket(path, 0o660)
+        try:
+            assert stat.S_IMODE(path.stat().st_mode) == 0o660
+        finally:
+            sock.close()
+
+
+def test_bind_unix_socket_refuses_live_socket_and_regular_files() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "middleware.sock"
+        live = bind_unix_socket(path)
+        live.listen()
+        try:
+            with pytest.raises(RuntimeError, match="uds_path_in_use"):
+                bind_unix_socket(path)
+        finally:
+            live.close()
+
+        regular = Path(tmp) / "notes.txt"
+        regular.write_text("keep me", encoding="utf-8")
+        with pytest.raises(RuntimeError, match="uds_path_not_a_socket"):
+            bind_unix_socket(regular)
+        assert regular.read_text(encoding="utf-8") == "keep me"
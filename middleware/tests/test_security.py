@@ -1,4 +1,13 @@
-from middleware.security import compute_signature, verify_signature
+from middleware.security import (
+    DUPLICATE_EVENT,
+    STALE_EVENT,
+    ReplayCache,
+    compute_signature,
+    open_websocket_frame,
+    verify_signature,
+    websocket_event_frame,
+    websocket_session_key,
+)
 
 
 def test_signature_roundtrip() -> None:
@@ -6,3 +15,40 @@ def test_signature_roundtrip() -> None:
     sig = compute_signature("secret", body)
     assert verify_signature("secret", body, sig)
     assert not verify_signature("wrong", body, sig)
+
+
+def test_websocket_frame_roundtrip_and_malformed_headers() -> None:
+    key = websocket_session_key("secret", "nonce", 1_000)
+    assert key != websocket_session_key("secret", "nonce", 1_001)
+    frame = websocket_event_frame(key, 7, b'{"event_type":"player_damaged"}')
+
+    assert open_websocket_frame(key, frame) == (7, b'{"event_type":"player_damaged"}')
+    assert open_websocket_frame(websocket_session_key("wrong", "nonce", 1_000), frame) is None
+    for malformed in (b"", b"7 abc", b"-7 abc\n{}", b"9" * 5000 + b" abc\n{}", frame.split(b" ", 1)[1], "\u00e9 x\n{}".encode()):
+        assert open_websocket_frame(key, malformed) is None
+
+
+def test_replay_cache_suppresses_remembered_events_and_stale_ones() -> None:
+    cache = ReplayCache(max_entries=2)
+
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=60_000) is None
+    # Only remembered events (allowed by policy) count as seen.
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=60_000) is None
+    cache.remember("abc", "player_damaged", 1_000, window_ms=60_000)
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=60_000) == DUPLICATE_EVENT
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=0) is None
+
+    cache.forget("abc", "player_damaged", 1_000)
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=60_000) is None
+
+    for ts_ms in (1_001, 1_002, 1_003):
+        cache.remember("abc", "player_damaged", ts_ms, window_ms=60_000)
+    # Over capacity: the key closest to expiry was dropped.
+    assert cache.check("abc", "player_damaged", 1_001, window_ms=60_000) is None
+    assert cache.check("abc", "player_damaged", 1_003, window_ms=60_000) == DUPLICATE_EVENT
+
+    assert cache.check("abc", "player_damaged", 1_000, window_ms=60_000, max_age_ms=500, now_ms=2_000) == STALE_EVENT
+    assert cache.check("abc", "player_damaged", 2_600, window_ms=60_000, max_age_ms=500, now_ms=2_000) == STALE_EVENT
+    assert cache.check("abc", "player_damaged", 1_800, window_ms=60_000, max_age_ms=500, now_ms=2_000) is None
+
+    assert cache.stats() == {"size": 2, "evictions": 1, "hits": 2, "stale": 2}
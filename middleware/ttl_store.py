@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import heapq
+from time import monotonic
+from typing import Hashable
+
+
+class CooldownStore:
+    """Deadlines keyed by any hashable (a (session_id, event_type) cooldown, a
+    handshake nonce, an event key) that expire on their own.
+
+    Lookups go through a dict; a min-heap ordered by deadline lets each call
+    drop every entry whose deadline has passed, so idle sessions do not
+    accumulate. With ``max_entries`` set, inserting past the cap drops the
+    entries closest to expiry first.
+    """
+
+    def __init__(self, max_entries: int = 0):
+        self.max_entries = max(0, max_entries)
+        self._deadlines: dict[Hashable, float] = {}
+        self._expiry_heap: list[tuple[float, Hashable]] = []
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def get(self, key: Hashable, default: float = 0.0) -> float:
+        return self._deadlines.get(key, default)
+
+    def forget(self, key: Hashable) -> None:
+        # The heap entry stays behind and is skipped once it no longer matches.
+        self._deadlines.pop(key, None)
+
+    def clear(self) -> None:
+        self._deadlines.clear()
+        self._expiry_heap.clear()
+
+    def prune(self, now: float | None = None) -> int:
+        now = monotonic() if now is None else now
+        evicted = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            # Skip heap entries superseded by a later deadline for the same key.
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def consume(self, key: Hashable, cooldown_ms: int, now: float | None = None) -> bool:
+        now = monotonic() if now is None else now
+        self.prune(now)
+        if now < self._deadlines.get(key, 0.0):
+            return False
+        deadline = now + (cooldown_ms / 1000)
+        self._deadlines[key] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, key))
+        if self.max_entries:
+            self._evict_over_capacity()
+        return True
+
+    def _evict_over_capacity(self) -> None:
+        heap = self._expiry_heap
+        while len(self._deadlines) > self.max_entries and heap:
+            deadline, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._deadlines), "evictions": self.evictions}